@@ -1,167 +1,382 @@
-import tkinter as tk
-import random
+import bisect
+import itertools
 import json
 import os
+import sys
+# The flashcards, storage and command line tool; none of it imports tkinter
+from flashcards import DeckCatalog, instrument, main, stats
 
-class Flashcard:
-    """Class represents a Flashcard with a question and answer."""  
-    def __init__(self, question, answer):
-         # Encapsulation: attributes are private to this class
-        self.__question = question
-        self.__answer = answer
+# Imported by load_tkinter() when a window is about to open, so the command line tool never loads it
+tk = None
 
-    def get_question(self):
-        """Getter method for question."""
-        return self.__question
-
-    def get_answer(self):
-        """Getter method for answer."""
-        return self.__answer
-    
-
-    def __str__(self):
-        """Returns Q and A string."""
-        # polymorphism, can be overidden in EditableFlashcard
-        return f"Q: {self.__question} | A: {self.__answer}"
-
-class Taggable:
-    """Class that adds tagging capability to flashcards."""
-    def __init__(self, tags=""):
-        self.tags = tags
-
-    def add_tag(self, tag):
-        """Add a tag to the tag string."""
-        self.tags = tag
-
-    def remove_tag(self, tag):
-        """Remove a tag from the flashcard."""
-        self.tag = ""
-
-    def get_tag(self):
-        """Return the tag."""
-        return self.tags
-
-# Inherits both Flashcard and Taggable classes (multiple inheritance)
-class EditableFlashcard(Flashcard, Taggable):
-    """Subclass of Flashcard and Taggable to allow editing and tagging."""
-    
-    def __init__(self, question, answer, tags):
-        Flashcard.__init__(self, question, answer)
-        Taggable.__init__(self, tags)
-
-    def edit(self, new_question, new_answer,new_tags):
-        # Method overiding
-        """This method overrides the preset flashcard question and answer."""
-        self._EditableFlashcard__question = new_question
-        self._EditableFlashcard__answer = new_answer
-        self.tags = new_tags
-
-    def __str__(self):
-        # Polymorphism
-        """Overrides the Flashcard's __str__ method to include tags."""
-
-        return f"Q: {self.get_question()} | A: {self.get_answer()} | Tags: {self.get_tag()}"
+def load_tkinter():
+    """Import tkinter the first time a window is needed."""
+    global tk
+    if tk is None:
+        import tkinter
+        tk = tkinter
+    return tk
 
 # Decorator for UI feedback
 def provide_feedback(success_message):
     def decorator(func):
         def wrapper(self, *args, **kwargs):
             result = func(self, *args, **kwargs)
-            self.status_label.config(text=success_message)
+            # Handlers return False when they have already shown an error
+            if result is not False:
+                self.status_label.config(text=success_message)
             return result
         return wrapper
     return decorator
 
-class FlashcardManager:
-    """Class to manage a collection of flashcards."""
-    
-    def __init__(self, filename='flashcards.json'):
-        # List to store flashcards
-        self.flashcards = [] 
-        # Filename for saving/loading
-        self.filename = filename  
-        # Load flashcards when manager is initialized
-        self.load_flashcards()
-
-    def add_flashcard(self, question, answer, tags):
-        """Add a tagged flashcard to the collection."""
-        flashcard = EditableFlashcard(question, answer, tags)
-        self.flashcards.append(flashcard)
-        self.save_flashcards()
-
-    def edit_flashcard(self, index, new_question, new_answer, new_tags):
-        """Edit a flashcard at a specified index."""
-        if 0 <= index < len(self.flashcards):
-            self.flashcards[index].edit(new_question, new_answer, new_tags) 
-            self.save_flashcards()
-
-    
-    def delete_flashcard(self, index):
-        """Delete a flashcard at a specified index."""
-        if 0 <= index < len(self.flashcards):
-            del self.flashcards[index]
-            self.save_flashcards()
-
-    def get_flashcard_list(self):
-        """Return a list of flashcards as strings."""
-        # Polymorphism 
-        return [str(flashcard) for flashcard in self.flashcards]
-
-    def get_random_flashcard(self):
-        """Return a random flashcard."""
-        if self.flashcards:
-            return random.choice(self.flashcards)
+class VirtualListView:
+    """Listbox that only creates rows for the flashcards in view, fetching them from the manager as it scrolls."""
+    # Rows kept ready above and below the visible ones
+    BUFFER = 20
+
+    def __init__(self, parent, manager, rows=20, width=50):
+        self.manager = manager
+        self.rows = rows
+        # Ids of every flashcard in the list, ascending; only the visible ones become rows
+        self.card_ids = []
+        # Position of the first visible row
+        self.top = 0
+        # Selected cards, including any scrolled out of view, and the one last clicked or moved to
+        self.selected_ids = set()
+        self.selected_id = None
+        # Formatted rows in and around the view, by card id
+        self.row_cache = {}
+        # Ctrl and Shift click add to the selection
+        self.listbox = tk.Listbox(parent, width=width, height=rows, font=('Arial', 12), exportselection=False,
+                                  selectmode=tk.EXTENDED)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        # The scrollbar stands for the whole list, not just the rows in the listbox
+        self.scrollbar = tk.Scrollbar(parent, command=self.scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.bind("<Button-1>", self.on_click)
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+        self.listbox.bind("<MouseWheel>", lambda event: self.scroll_to(self.top - 3 if event.delta > 0 else self.top + 3))
+        self.listbox.bind("<Button-4>", lambda event: self.scroll_to(self.top - 3))
+        self.listbox.bind("<Button-5>", lambda event: self.scroll_to(self.top + 3))
+        self.listbox.bind("<Up>", lambda event: self.move_selection(-1))
+        self.listbox.bind("<Down>", lambda event: self.move_selection(1))
+
+    def set_ids(self, card_ids):
+        """Show a new list of flashcards, from the top."""
+        self.card_ids = card_ids
+        self.top = 0
+        self.row_cache = {}
+        self.selected_ids = {card_id for card_id in self.selected_ids if self.row_position(card_id)}
+        if self.selected_id not in self.selected_ids:
+            self.selected_id = None
+        self.render()
+
+    def row_position(self, card_id):
+        """Return a range holding the position of a card in the list, empty if it is not there."""
+        index = bisect.bisect_left(self.card_ids, card_id) if card_id is not None else len(self.card_ids)
+        if index < len(self.card_ids) and self.card_ids[index] == card_id:
+            return range(index, index + 1)
+        return range(0)
+
+    def format_row(self, card_id):
+        """Return the text of a row, without its number."""
+        flashcard = self.manager.get_flashcard(card_id)
+        # Display question, answer, and tags
+        return f"{flashcard.get_question()}| Ans: {flashcard.get_answer()} | Tags: {flashcard.get_tag()}"
+
+    @instrument('ui.render_list')
+    def render(self):
+        """Fill the listbox with the rows in view, formatting only those not already cached."""
+        end = min(self.top + self.rows, len(self.card_ids))
+        # Fetch the rows in view plus the buffer, and forget the rest
+        nearby = self.card_ids[max(0, self.top - self.BUFFER):end + self.BUFFER]
+        self.row_cache = {card_id: self.row_cache.get(card_id) or self.format_row(card_id) for card_id in nearby}
+        self.listbox.delete(0, tk.END)
+        for row, card_id in enumerate(self.card_ids[self.top:end]):
+            self.listbox.insert(tk.END, f"Q{self.top + row + 1}: {self.row_cache[card_id]}")
+            if card_id in self.selected_ids:
+                self.listbox.selection_set(row)
+        total = len(self.card_ids)
+        if total:
+            self.scrollbar.set(self.top / total, end / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll(self, action, amount, unit=None):
+        """Handle the scrollbar being dragged or clicked."""
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.card_ids)))
+        elif unit == "pages":
+            self.scroll_to(self.top + int(amount) * self.rows)
+        else:
+            self.scroll_to(self.top + int(amount))
+
+    def scroll_to(self, top):
+        """Scroll so the row at position top is the first one shown."""
+        self.top = max(0, min(top, len(self.card_ids) - self.rows))
+        self.render()
+
+    def on_click(self, event):
+        """Start a new selection on a plain click, dropping rows selected out of view too."""
+        # Bit 0 of the event state is Shift, bit 2 is Control
+        if not event.state & 0x5:
+            self.selected_ids.clear()
+
+    def on_select(self, event):
+        """Remember the ids of the selected rows in view."""
+        selected = set(self.listbox.curselection())
+        for row, card_id in enumerate(self.card_ids[self.top:self.top + self.rows]):
+            if row in selected:
+                if card_id not in self.selected_ids:
+                    self.selected_id = card_id
+                self.selected_ids.add(card_id)
+            else:
+                self.selected_ids.discard(card_id)
+
+    def move_selection(self, step):
+        """Move the selection up or down, scrolling when it leaves the view."""
+        if not self.card_ids:
+            return "break"
+        position = self.row_position(self.selected_id)
+        index = position[0] + step if position else self.top
+        index = max(0, min(index, len(self.card_ids) - 1))
+        self.selected_id = self.card_ids[index]
+        self.selected_ids = {self.selected_id}
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + self.rows:
+            self.top = index - self.rows + 1
+        self.render()
+        return "break"
+
+    def get_selected_id(self):
+        """Return the id of the selected flashcard if exactly one is selected, or None."""
+        if len(self.selected_ids) == 1:
+            return self.selected_id
         return None
 
-
-    def save_flashcards(self):
-        """Save flashcards to file."""
-        with open(self.filename, 'w') as f:
-            json.dump([{
-                'question': fc.get_question(), 
-                'answer': fc.get_answer(), 
-                'tags': fc.get_tag()
-            } for fc in self.flashcards], f)
-    
-
-    def load_flashcards(self):
-        """Load flashcards from file."""
-        if os.path.exists(self.filename):
-            with open(self.filename, 'r') as f:
-                data = json.load(f)
-                self.flashcards = [
-                    EditableFlashcard(item['question'], item['answer'], item['tags']) 
-                    for item in data
-                ]
+    def get_selected_ids(self):
+        """Return the ids of every selected flashcard, ascending."""
+        return sorted(self.selected_ids)
+
+    def select_all(self):
+        """Select every flashcard in the list, including those out of view."""
+        self.selected_ids = set(self.card_ids)
+        self.render()
+
+    def remove_card(self, card_id):
+        """Take one flashcard out of the list without rebuilding it."""
+        for index in self.row_position(card_id):
+            del self.card_ids[index]
+        self.row_cache.pop(card_id, None)
+        self.selected_ids.discard(card_id)
+        if self.selected_id == card_id:
+            self.selected_id = None
+        self.scroll_to(self.top)
+
+    def update_cards(self, shown, hidden):
+        """Add or redraw the shown flashcards and drop the hidden ones, in one pass over the list and one redraw."""
+        hidden = set(hidden)
+        for card_id in itertools.chain(shown, hidden):
+            self.row_cache.pop(card_id, None)
+        new_ids = [card_id for card_id in shown if not self.row_position(card_id)]
+        if hidden:
+            self.card_ids = [card_id for card_id in self.card_ids if card_id not in hidden]
+            self.selected_ids -= hidden
+            if self.selected_id in hidden:
+                self.selected_id = None
+        if new_ids:
+            self.card_ids = sorted(self.card_ids + new_ids)
+        self.scroll_to(self.top)
+
+    def insert_card(self, card_id):
+        """Put one flashcard into the list in id order, or redraw its row if it is already there."""
+        self.row_cache.pop(card_id, None)
+        position = self.row_position(card_id)
+        if not position:
+            index = bisect.bisect_left(self.card_ids, card_id)
+            self.card_ids.insert(index, card_id)
+            position = range(index, index + 1)
+        # Rows further down are drawn when they are scrolled to
+        if position[0] < self.top + self.rows:
+            self.render()
 
 class FlashcardApp:
     """Main class for the Flashcard App."""
     
     def __init__(self, master):
+        load_tkinter()
         self.master = master
         self.master.title("Flashcard App")
         self.master.geometry("550x700")
-        self.manager = FlashcardManager()
-        self.current_flashcard = []
-        self.previous_flashcards = []
+        # Decks, each in its own line-per-card file; only the recently used ones stay open.
+        # Changes are saved in the background, so the window never waits on the disk
+        self.catalog = DeckCatalog('decks.json', save_delay=0.5)
+        if not self.catalog.decks:
+            # The deck from before there were several; an old flashcards.json is migrated on first open
+            self.catalog.add_deck("Default", 'flashcards.jsonl')
+        self.manager = None
+        self.session = None
+        self.stats_window = None
+        self.flashcard_list = None
+        # Screens are built the first time they are shown and kept, hidden, after that
+        self.screens = {}
+        self.current_screen = None
+        # Changes to the edit list held back during a bulk operation: card id -> False if deleted
+        self.list_updates = None
+        self.open_deck(self.catalog.current or self.catalog.list_decks()[0]['name'])
+
+        # Status bar (persistent): messages, and whether changes have been saved yet
+        self.status_frame = tk.Frame(self.master, bg="#F0F0F0")
+        self.status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_label = tk.Label(self.status_frame, text="", fg="red", bg="#F0F0F0", font=('Arial', 12))
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.save_label = tk.Label(self.status_frame, text="", fg="gray", bg="#F0F0F0", font=('Arial', 10))
+        self.save_label.pack(side=tk.RIGHT, padx=5)
+        self.check_save_state()
         self.setup_main_menu()
+        # Hidden latency statistics window, toggled with F12
+        stats.enabled = True
+        self.master.bind('<F12>', self.toggle_stats_panel)
+
+    def check_save_state(self):
+        """Show whether the background writer has saved the latest changes, and pick up changes from elsewhere."""
+        # The deck may be open in another window or changed by the import tool
+        if self.manager.sync():
+            self.status_label.config(text="Deck updated by another program.")
+        # Polled from the Tk loop, as widgets must not be touched from the writer thread
+        writer = self.manager.writer
+        if writer is not None and writer.error is not None:
+            self.save_label.config(text=f"Save failed: {writer.error}", fg="red")
+        elif self.manager.is_saving():
+            self.save_label.config(text="Saving...", fg="gray")
+        else:
+            self.save_label.config(text="All changes saved", fg="gray")
+        self.master.after(200, self.check_save_state)
+
+    def toggle_stats_panel(self, event=None):
+        """Show or hide the window of operation latencies."""
+        if self.stats_window is not None:
+            self.stats_window.destroy()
+            self.stats_window = None
+            return
+        self.stats_window = tk.Toplevel(self.master)
+        self.stats_window.title("Latency")
+        self.stats_window.protocol("WM_DELETE_WINDOW", self.toggle_stats_panel)
+        self.stats_text = tk.Text(self.stats_window, width=95, height=30, font=('Courier', 10))
+        self.stats_text.pack(fill=tk.BOTH, expand=True)
+        self.update_stats_panel()
+
+    def update_stats_panel(self):
+        """Refresh the latency window every second while it is open."""
+        if self.stats_window is None:
+            return
+        lines = [f"{'operation':<34}{'calls':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'> frame':>9}"]
+        for name, operation in stats.summary().items():
+            lines.append(f"{name:<34}{operation['calls']:>8}{operation['p50_ms']:>10.3f}{operation['p95_ms']:>10.3f}"
+                         f"{operation['max_ms']:>10.2f}{operation['over_frame_budget']:>9}")
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert("1.0", "\n".join(lines))
+        self.stats_text.config(state=tk.DISABLED)
+        self.stats_window.after(1000, self.update_stats_panel)
+
+    @instrument('ui.open_deck')
+    def open_deck(self, name):
+        """Switch to another deck, keeping the test session of the one being left."""
+        if self.manager is not None:
+            self.save_session()
+            self.manager.listeners.discard(self)
+        self.deck_name = name
+        self.manager = self.catalog.open_deck(name)
+        # Built while the user looks at the screen, so the first card added or search typed does not wait for them
+        self.manager.build_indexes()
+        # The lists on the screens follow the deck's changes through card_added and friends
+        self.manager.listeners.add(self)
+        self.current_flashcard = None
+        # Test session, kept so a test can be resumed
+        self.session_filename = self.manager.filename + '.session'
+        self.session = self.load_session()
+
+    def show_screen(self, name, build):
+        """Show a screen in place of the current one, building it the first time."""
+        frame = self.screens.get(name)
+        if frame is None:
+            frame = self.screens[name] = tk.Frame(self.master, bg="#A7C6ED")
+            build(frame)
+        if self.current_screen is not None and self.current_screen is not frame:
+            self.current_screen.pack_forget()
+        frame.pack(pady=20, padx=20, fill=tk.BOTH, expand=True)
+        self.current_screen = frame
+        return frame
+
+    def card_added(self, card_id, tags):
+        self.card_changed(card_id, tags)
+
+    def card_changed(self, card_id, tags):
+        """Add, redraw or drop a flashcard's row in the edit list after it changed."""
+        # The card on the test screen shows its new text too
+        if self.current_flashcard is not None and self.current_flashcard.card_id == card_id:
+            self.current_flashcard = self.manager.get_flashcard(card_id)
+            self.tag_label.config(text="Category: " + self.current_flashcard.get_tag())
+            self.question_label.config(text="Q:" + self.current_flashcard.get_question())
+        if self.flashcard_list is None or self.flashcard_list.manager is not self.manager:
+            return
+        if self.list_updates is not None:
+            self.list_updates[card_id] = True
+            return
+        query = self.search_var.get().strip()
+        if not query or self.manager.matches_search(card_id, query):
+            self.flashcard_list.insert_card(card_id)
+        else:
+            self.flashcard_list.remove_card(card_id)
 
-        # Status label (persistent)
-        self.status_label = tk.Label(self.master, text="", fg="red", bg="#F0F0F0", font=('Arial', 12))
-        self.status_label.pack(side=tk.BOTTOM, fill=tk.X)
-
+    def card_deleted(self, card_id):
+        # A deleted card is not left on the test screen; the next one is shown on return
+        if self.current_flashcard is not None and self.current_flashcard.card_id == card_id:
+            self.current_flashcard = None
+        if self.flashcard_list is None or self.flashcard_list.manager is not self.manager:
+            return
+        if self.list_updates is not None:
+            self.list_updates[card_id] = False
+            return
+        self.flashcard_list.remove_card(card_id)
+
+    def change_many(self, operation, *args):
+        """Run a bulk manager operation, then update the edit list once for every card it touched."""
+        self.list_updates = {}
+        try:
+            result = operation(*args)
+        finally:
+            updates, self.list_updates = self.list_updates, None
+        query = self.search_var.get().strip()
+        shown = [card_id for card_id, alive in updates.items()
+                 if alive and (not query or self.manager.matches_search(card_id, query))]
+        self.flashcard_list.update_cards(shown, updates.keys() - set(shown))
+        return result
+
+    def cards_reset(self):
+        """Fill the edit list again after the deck was rewritten by another program."""
+        if self.flashcard_list is not None and self.flashcard_list.manager is self.manager:
+            self.update_flashcard_listbox()
+
+    @instrument('ui.setup_main_menu')
     def setup_main_menu(self):
         """Set up the main menu UI."""
-        for widget in self.master.winfo_children():
-            if widget != self.status_label:
-                widget.destroy()
+        self.show_screen('menu', self.build_main_menu)
+        self.deck_label.config(text="Deck: " + self.deck_name)
 
-        self.menu_frame = tk.Frame(self.master, bg="#A7C6ED")
-        self.menu_frame.pack(pady=20, padx=20, fill=tk.BOTH, expand=True)
+    def build_main_menu(self, frame):
+        self.menu_frame = frame
         #Title:
         self.title_label = tk.Label(self.menu_frame, text="Flashcards", font=('Arial', 20), bg="#A7C6ED")
-        self.title_label.pack(pady=20)
+        self.title_label.pack(pady=(20, 0))
+        self.deck_label = tk.Label(self.menu_frame, text="", font=('Arial', 12), bg="#A7C6ED")
+        self.deck_label.pack(pady=(0, 10))
         # Main Menu Buttons
+        self.decks_button = tk.Button(self.menu_frame, text="Decks", command=self.setup_decks, width=20, height=2)
+        self.decks_button.pack(pady=10)
+
         self.create_flashcard_button = tk.Button(self.menu_frame, text="Create Flashcard", command=self.setup_create_flashcard, width=20, height=2)
         self.create_flashcard_button.pack(pady=10)
 
@@ -174,38 +389,98 @@ class FlashcardApp:
         self.exit_button = tk.Button(self.menu_frame, text="Exit", command=self.master.quit, width=20, height=2)
         self.exit_button.pack(pady=10)
 
+    @instrument('ui.setup_decks')
+    def setup_decks(self):
+        """Open the deck list, to switch deck or make a new one."""
+        self.show_screen('decks', self.build_decks)
+        # Names and card counts come from the catalog, so no deck is opened to list it
+        self.deck_names = []
+        self.decks_listbox.delete(0, tk.END)
+        for deck in self.catalog.list_decks():
+            self.deck_names.append(deck['name'])
+            self.decks_listbox.insert(tk.END, f"{deck['name']} ({deck['cards']} cards)")
+
+    def build_decks(self, frame):
+        self.decks_frame = frame
+        self.decks_title_label = tk.Label(self.decks_frame, text="Decks", font=('Arial', 14), bg="#A7C6ED")
+        self.decks_title_label.pack(pady=5)
+        self.decks_list_frame = tk.Frame(self.decks_frame)
+        self.decks_list_frame.pack(pady=5)
+        self.decks_listbox = tk.Listbox(self.decks_list_frame, width=50, height=15, font=('Arial', 12))
+        self.decks_scrollbar = tk.Scrollbar(self.decks_list_frame, command=self.decks_listbox.yview)
+        self.decks_listbox.config(yscrollcommand=self.decks_scrollbar.set)
+        self.decks_listbox.pack(side=tk.LEFT)
+        self.decks_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Buttons!
+        self.open_deck_button = tk.Button(self.decks_frame, text="Open Deck", command=self.open_selected_deck, width=20, height=2)
+        self.open_deck_button.pack(pady=5)
+        # New deck name box
+        self.new_deck_entry = tk.Entry(self.decks_frame, width=30, font=('Arial', 12))
+        self.new_deck_entry.pack(pady=5)
+        self.new_deck_button = tk.Button(self.decks_frame, text="New Deck", command=self.create_deck, width=20, height=2)
+        self.new_deck_button.pack(pady=5)
+
+        self.decks_back_button = tk.Button(self.decks_frame, text="Back to Menu", command=self.setup_main_menu, width=20, height=2)
+        self.decks_back_button.pack(pady=5)
+
+    @instrument('ui.open_selected_deck')
+    def open_selected_deck(self):
+        """Switch to the deck selected in the list."""
+        selection = self.decks_listbox.curselection()
+        # Error handling
+        if not selection:
+            self.status_label.config(text="Select a deck to open.")
+            return
+        self.open_deck(self.deck_names[selection[0]])
+        self.status_label.config(text=f"Opened deck: {self.deck_name}")
+        self.setup_main_menu()
+
+    @instrument('ui.create_deck')
+    def create_deck(self):
+        """Make a new, empty deck and switch to it."""
+        name = self.new_deck_entry.get().strip()
+        # Error handling
+        try:
+            self.catalog.add_deck(name)
+        except ValueError as error:
+            self.status_label.config(text=f"Error: {error}!")
+            return
+        self.new_deck_entry.delete(0, tk.END)
+        self.open_deck(name)
+        self.status_label.config(text=f"Created deck: {name}")
+        self.setup_main_menu()
+
+    @instrument('ui.setup_create_flashcard')
     def setup_create_flashcard(self):
         """Open the create flashcard window."""
-        # Clear previous widgets except for the status label
-        for widget in self.master.winfo_children():
-            if widget != self.status_label:
-                widget.destroy()
+        self.show_screen('create', self.build_create_flashcard)
 
-        self.frame = tk.Frame(self.master, bg="#A7C6ED")
-        self.frame.pack(pady=20, padx=20, fill=tk.BOTH, expand=True)
+    def build_create_flashcard(self, frame):
+        self.frame = frame
         # Question box
-        self.question_label = tk.Label(self.frame, text="Question:", bg="#A7C6ED", font=('Arial', 14))
-        self.question_label.pack(pady=5)
+        self.create_question_label = tk.Label(self.frame, text="Question:", bg="#A7C6ED", font=('Arial', 14))
+        self.create_question_label.pack(pady=5)
         self.question_text = tk.Text(self.frame, width=50, height=5, font=('Arial', 12))
         self.question_text.pack(pady=5)
         # Answer box
-        self.answer_label = tk.Label(self.frame, text="Answer:", bg="#A7C6ED", font=('Arial', 14))
-        self.answer_label.pack(pady=5)
+        self.create_answer_label = tk.Label(self.frame, text="Answer:", bg="#A7C6ED", font=('Arial', 14))
+        self.create_answer_label.pack(pady=5)
         self.answer_text = tk.Text(self.frame, width=50, height=5, font=('Arial', 12))
         self.answer_text.pack(pady=5)
         # Category box (tags)
-        self.tag_label = tk.Label(self.frame, text="Category:", bg="#A7C6ED", font=('Arial', 14))
-        self.tag_label.pack(pady=5)
+        self.create_tag_label = tk.Label(self.frame, text="Category:", bg="#A7C6ED", font=('Arial', 14))
+        self.create_tag_label.pack(pady=5)
         self.tag_text = tk.Text(self.frame, width=50, height=2, font=('Arial', 12))
         self.tag_text.pack(pady=5)
         # Buttons!
         self.add_button = tk.Button(self.frame, text="Add Flashcard", command=self.add_flashcard, width=20, height=2)
         self.add_button.pack(pady=5)
 
-        self.back_button = tk.Button(self.frame, text="Back to Menu", command=self.setup_main_menu, width=20, height=2)
-        self.back_button.pack(pady=5)
+        self.create_back_button = tk.Button(self.frame, text="Back to Menu", command=self.setup_main_menu, width=20, height=2)
+        self.create_back_button.pack(pady=5)
 
     @provide_feedback("Flashcard added successfully!")
+    @instrument('ui.add_flashcard')
     def add_flashcard(self):
         """Submit a new flashcard."""
         # Get question, answer, and tags
@@ -215,124 +490,204 @@ class FlashcardApp:
         # Error handling
         if not question or not answer:
             self.status_label.config(text="Error: Question and Answer fields cannot be blank!")
-            return
-        # Add flashcard using manager
-        self.manager.add_flashcard(question, answer, tags)
+            return False
+        # Add flashcard using manager, unless the deck already asks that question
+        if self.manager.add_flashcard(question, answer, tags) is None:
+            self.status_label.config(text="Error: A flashcard with that question already exists!")
+            return False
         self.question_text.delete("1.0", tk.END)
         self.answer_text.delete("1.0", tk.END)
         self.tag_text.delete("1.0", tk.END)
 
+    @instrument('ui.setup_edit_flashcards')
     def setup_edit_flashcards(self):
         """Open the edit flashcard window."""
-        # Clear previous widgets except for the status label
-        for widget in self.master.winfo_children():
-            if widget != self.status_label:
-                widget.destroy()
-        # Setup display
-        self.edit_frame = tk.Frame(self.master, bg="#A7C6ED")
-        self.edit_frame.pack(pady=20, padx=20, fill=tk.BOTH, expand=True)
-
+        self.show_screen('edit', self.build_edit_flashcards)
+        # The list is kept up to date while it is hidden, so it is only filled again for another deck
+        if self.flashcard_list.manager is not self.manager:
+            self.flashcard_list.manager = self.manager
+            self.update_flashcard_listbox()
+
+    def build_edit_flashcards(self, frame):
+        self.edit_frame = frame
         self.edit_title_label = tk.Label(self.edit_frame, text="Edit Flashcards", font=('Arial', 14), bg="#A7C6ED")
         self.edit_title_label.pack(pady=5)
+        # Search box, filters the list as you type
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(self.edit_frame, textvariable=self.search_var, width=50, font=('Arial', 12))
+        self.search_entry.pack(pady=5)
+        self.search_var.trace_add("write", lambda *args: self.update_flashcard_listbox())
 
         self.flashcard_frame = tk.Frame(self.edit_frame)
         self.flashcard_frame.pack(pady=5)
-        # Listbox
-        self.flashcard_listbox = tk.Listbox(self.flashcard_frame, width=50, height=20, font=('Arial', 12))
-        self.flashcard_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        self.scrollbar = tk.Scrollbar(self.flashcard_frame, command=self.flashcard_listbox.yview)
-        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        self.flashcard_listbox.config(yscrollcommand=self.scrollbar.set)
-        # Populate the listbox with flashcards
-        self.update_flashcard_listbox()
-        # Buttons!
-        self.delete_button = tk.Button(self.edit_frame, text="Delete Flashcard", command=self.delete_flashcard, width=20, height=2)
-        self.delete_button.pack(pady=10)
-
-        self.edit_button = tk.Button(self.edit_frame, text="Edit Flashcard", command=self.edit_flashcard, width=20, height=2)
-        self.edit_button.pack(pady=10)
-
-        self.back_button = tk.Button(self.edit_frame, text="Back to Menu", command=self.setup_main_menu, width=20, height=2)
-        self.back_button.pack(pady=10)
-
+        # List that only draws the rows in view; no deck yet, so setup_edit_flashcards fills it
+        self.flashcard_list = VirtualListView(self.flashcard_frame, None, rows=20, width=50)
+        # Buttons! Delete and the category buttons work on every selected flashcard
+        self.edit_buttons_frame = tk.Frame(self.edit_frame, bg="#A7C6ED")
+        self.edit_buttons_frame.pack(pady=5)
+        self.select_all_button = tk.Button(self.edit_buttons_frame, text="Select All", command=self.select_all_flashcards, width=12, height=2)
+        self.select_all_button.pack(side=tk.LEFT, padx=5)
+        self.edit_button = tk.Button(self.edit_buttons_frame, text="Edit Flashcard", command=self.edit_flashcard, width=12, height=2)
+        self.edit_button.pack(side=tk.LEFT, padx=5)
+        self.delete_button = tk.Button(self.edit_buttons_frame, text="Delete Selected", command=self.delete_flashcard, width=12, height=2)
+        self.delete_button.pack(side=tk.LEFT, padx=5)
+        # Category box for the selected flashcards
+        self.retag_frame = tk.Frame(self.edit_frame, bg="#A7C6ED")
+        self.retag_frame.pack(pady=5)
+        self.retag_label = tk.Label(self.retag_frame, text="Category:", bg="#A7C6ED", font=('Arial', 12))
+        self.retag_label.pack(side=tk.LEFT)
+        self.retag_entry = tk.Entry(self.retag_frame, width=15, font=('Arial', 12))
+        self.retag_entry.pack(side=tk.LEFT, padx=5)
+        self.add_tag_button = tk.Button(self.retag_frame, text="Add", command=lambda: self.retag_flashcards(True), width=7)
+        self.add_tag_button.pack(side=tk.LEFT, padx=2)
+        self.remove_tag_button = tk.Button(self.retag_frame, text="Remove", command=lambda: self.retag_flashcards(False), width=7)
+        self.remove_tag_button.pack(side=tk.LEFT, padx=2)
+
+        self.edit_back_button = tk.Button(self.edit_frame, text="Back to Menu", command=self.setup_main_menu, width=20, height=2)
+        self.edit_back_button.pack(pady=10)
+
+    @instrument('ui.update_flashcard_listbox')
     def update_flashcard_listbox(self):
         """Update the listbox to show current flashcards."""
-        self.flashcard_listbox.delete(0, tk.END)
-        for index, flashcard in enumerate(self.manager.flashcards):
-            # Display question, answer, and tags
-            self.flashcard_listbox.insert(tk.END, f"Q{index + 1}: {flashcard.get_question()}| Ans: {flashcard.get_answer()} | Tags: {flashcard.get_tag()}")
+        query = self.search_var.get().strip()
+        if query:
+            self.flashcard_list.set_ids(self.manager.search_flashcards(query))
+        else:
+            self.flashcard_list.set_ids(self.manager.get_flashcard_ids())
+
+    @instrument('ui.select_all_flashcards')
+    def select_all_flashcards(self):
+        """Select every flashcard in the list, such as every search result."""
+        self.flashcard_list.select_all()
+        self.status_label.config(text=f"Selected {len(self.flashcard_list.card_ids)} flashcards.")
 
-    @provide_feedback("Flashcard deleted successfully!")
+    @instrument('ui.delete_flashcard')
     def delete_flashcard(self):
-        """Delete the selected flashcard."""
-        selected_index = self.flashcard_listbox.curselection()
-        if selected_index:
-            self.manager.delete_flashcard(selected_index[0])
-            self.update_flashcard_listbox() 
+        """Delete the selected flashcards, saving once."""
+        selected_ids = self.flashcard_list.get_selected_ids()
+        # Error handling
+        if not selected_ids:
+            self.status_label.config(text="Select a flashcard to delete.")
+            return
+        deleted = self.change_many(self.manager.delete_many, selected_ids)
+        if len(deleted) == 1:
+            self.status_label.config(text="Flashcard deleted successfully!")
+        else:
+            self.status_label.config(text=f"Deleted {len(deleted)} flashcards.")
+
+    @instrument('ui.retag_flashcards')
+    def retag_flashcards(self, add):
+        """Add the category in the box to the selected flashcards, or remove it from them, saving once."""
+        selected_ids = self.flashcard_list.get_selected_ids()
+        tags = self.retag_entry.get().strip()
+        # Error handling
+        if not selected_ids or not tags:
+            self.status_label.config(text="Select flashcards and type a category.")
+            return
+        if add:
+            changed = self.change_many(self.manager.retag_many, selected_ids, tags)
+        else:
+            changed = self.change_many(self.manager.retag_many, selected_ids, '', tags)
+        self.status_label.config(text=f"Changed the category of {len(changed)} flashcards.")
 
+    @instrument('ui.edit_flashcard')
     def edit_flashcard(self):
         """Open the edit window for the selected flashcard."""
         # Get selected flashcard
-        selected_index = self.flashcard_listbox.curselection()
+        selected_id = self.flashcard_list.get_selected_id()
         # Error handling
-        if not selected_index:
-            self.status_label.config(text="Select a flashcard to edit.")
+        if selected_id is None:
+            self.status_label.config(text="Select one flashcard to edit.")
             return
-        self.selected_flashcard_index = selected_index[0]
-        self.selected_flashcard = self.manager.flashcards[self.selected_flashcard_index]
-        # Clear previous widgets for editing
-        for widget in self.edit_frame.winfo_children():
-            widget.destroy()
+        self.selected_flashcard_id = selected_id
+        self.selected_flashcard = self.manager.get_flashcard(self.selected_flashcard_id)
+        # The list keeps its scroll position while hidden
+        self.show_screen('edit_form', self.build_edit_form)
+        for text, value in ((self.edit_question_text, self.selected_flashcard.get_question()),
+                            (self.edit_answer_text, self.selected_flashcard.get_answer()),
+                            (self.edit_tag_text, self.selected_flashcard.get_tag())):
+            text.delete("1.0", tk.END)
+            text.insert("1.0", value)
+
+    def build_edit_form(self, frame):
+        self.edit_form_frame = frame
         # Edit question label and text box
-        self.edit_question_label = tk.Label(self.edit_frame, text="Edit Question:", bg="#A7C6ED", font=('Arial', 14))
+        self.edit_question_label = tk.Label(self.edit_form_frame, text="Edit Question:", bg="#A7C6ED", font=('Arial', 14))
         self.edit_question_label.pack()
-        self.edit_question_text = tk.Text(self.edit_frame, width=50, height=5, font=('Arial', 12))
+        self.edit_question_text = tk.Text(self.edit_form_frame, width=50, height=5, font=('Arial', 12))
         self.edit_question_text.pack()
-        self.edit_question_text.insert("1.0", self.selected_flashcard.get_question())
         # Edit answer label and text box
-        self.edit_answer_label = tk.Label(self.edit_frame, text="Edit Answer:", bg="#A7C6ED", font=('Arial', 14))
+        self.edit_answer_label = tk.Label(self.edit_form_frame, text="Edit Answer:", bg="#A7C6ED", font=('Arial', 14))
         self.edit_answer_label.pack()
-        self.edit_answer_text = tk.Text(self.edit_frame, width=50, height=5, font=('Arial', 12))
+        self.edit_answer_text = tk.Text(self.edit_form_frame, width=50, height=5, font=('Arial', 12))
         self.edit_answer_text.pack()
-        self.edit_answer_text.insert("1.0", self.selected_flashcard.get_answer())
         # Edit tag label and text box
-        self.edit_tag_label = tk.Label(self.edit_frame, text="Edit Category:", bg="#A7C6ED", font=('Arial', 14))
+        self.edit_tag_label = tk.Label(self.edit_form_frame, text="Edit Category:", bg="#A7C6ED", font=('Arial', 14))
         self.edit_tag_label.pack()
-        self.edit_tag_text = tk.Text(self.edit_frame, width=50, height=5, font=('Arial', 12))
+        self.edit_tag_text = tk.Text(self.edit_form_frame, width=50, height=5, font=('Arial', 12))
         self.edit_tag_text.pack()
-        self.edit_tag_text.insert("1.0", self.selected_flashcard.get_tag())
         # Buttons!
-        self.save_button = tk.Button(self.edit_frame, text="Save Changes", command=self.save_changes, width=20, height=2)
+        self.save_button = tk.Button(self.edit_form_frame, text="Save Changes", command=self.save_changes, width=20, height=2)
         self.save_button.pack(pady=5)
-        self.back_button = tk.Button(self.edit_frame, text="Back to Edit Menu", command=self.setup_edit_flashcards, width=20, height=2)
-        self.back_button.pack(pady=5)
+        self.edit_form_back_button = tk.Button(self.edit_form_frame, text="Back to Edit Menu", command=self.close_edit_form, width=20, height=2)
+        self.edit_form_back_button.pack(pady=5)
+
+    @instrument('ui.close_edit_form')
+    def close_edit_form(self):
+        """Close the edit form and show the flashcard list again."""
+        self.setup_edit_flashcards()
 
     @provide_feedback("Flashcard saved successfully!")
+    @instrument('ui.save_changes')
     def save_changes(self):
         """Save changes to the selected flashcard."""
         # Get new question and answer
-        new_question = self.edit_question_text.get("1.0", tk.END).strip() 
-        new_answer = self.edit_answer_text.get("1.0", tk.END).strip() 
+        new_question = self.edit_question_text.get("1.0", tk.END).strip()
+        new_answer = self.edit_answer_text.get("1.0", tk.END).strip()
         new_tags = self.edit_tag_text.get("1.0", tk.END).strip()
         # Error handling
         if not new_question or not new_answer:
             self.status_label.config(text="Error: Question and Answer fields cannot be blank!")
-            return
-        # Save changes and return to edit mode
-        self.manager.edit_flashcard(self.selected_flashcard_index, new_question, new_answer, new_tags)
-        self.setup_edit_flashcards()
+            return False
+        # Save changes and return to edit mode; the row is redrawn through card_changed
+        self.manager.edit_flashcard(self.selected_flashcard_id, new_question, new_answer, new_tags)
+        self.close_edit_form()
 
+    @instrument('ui.test_mode')
     def test_mode(self):
         """Set up the test mode UI."""
-        # Clear previous widgets except for the status label
-        for widget in self.master.winfo_children():
-            if widget != self.status_label:
-                widget.destroy()
-
-        self.test_frame = tk.Frame(self.master, bg="#A7C6ED")
-        self.test_frame.pack(pady=20, padx=20, fill=tk.BOTH, expand=True)
+        self.show_screen('test', self.build_test_mode)
+        # Carry on with the card on screen if there is one, as if the screen had never been left
+        if self.current_flashcard is not None:
+            return
+        self.category_entry.delete(0, tk.END)
+        # Resume an unfinished test, otherwise reset & load first flashcard
+        if self.session is not None and len(self.session):
+            self.category_entry.insert(0, ", ".join(self.session.tags or []))
+            self.match_all.set(self.session.match_all)
+            self.status_label.config(text=f"Resumed test: {len(self.session)} flashcards left.")
+            self.next_flashcard()
+        else:
+            self.start_test()
+
+    def build_test_mode(self, frame):
+        self.test_frame = frame
+        # Category filter
+        self.filter_frame = tk.Frame(self.test_frame, bg="#A7C6ED")
+        self.filter_frame.pack(pady=5)
+        self.category_label = tk.Label(self.filter_frame, text="Category:", bg="#A7C6ED", font=('Arial', 12))
+        self.category_label.pack(side=tk.LEFT)
+        self.category_entry = tk.Entry(self.filter_frame, width=20, font=('Arial', 12))
+        self.category_entry.pack(side=tk.LEFT, padx=5)
+        self.match_all = tk.BooleanVar(value=False)
+        self.match_all_check = tk.Checkbutton(self.filter_frame, text="Match all", variable=self.match_all, bg="#A7C6ED")
+        self.match_all_check.pack(side=tk.LEFT)
+        self.review_due = tk.BooleanVar(value=False)
+        self.review_due_check = tk.Checkbutton(self.filter_frame, text="Due cards", variable=self.review_due, bg="#A7C6ED",
+                                               command=self.change_mode)
+        self.review_due_check.pack(side=tk.LEFT)
+        self.start_button = tk.Button(self.filter_frame, text="Start", command=self.start_test, width=8)
+        self.start_button.pack(side=tk.LEFT, padx=5)
         # Tag display
         self.tag_label = tk.Label(self.test_frame, text="", font=('Arial', 18), bg="#A7C6ED", wraplength=500)
         self.tag_label.pack(pady=20)
@@ -345,48 +700,101 @@ class FlashcardApp:
         # Buttons!
         self.show_answer_button = tk.Button(self.test_frame, text="Show Answer", command=self.show_answer, width=20, height=2)
         self.show_answer_button.pack(pady=10)
+        # Right/wrong feedback for the spaced repetition schedule
+        self.grade_frame = tk.Frame(self.test_frame, bg="#A7C6ED")
+        self.grade_frame.pack(pady=5)
+        self.right_button = tk.Button(self.grade_frame, text="Right", command=lambda: self.grade_flashcard(True), width=9, height=2)
+        self.right_button.pack(side=tk.LEFT, padx=5)
+        self.wrong_button = tk.Button(self.grade_frame, text="Wrong", command=lambda: self.grade_flashcard(False), width=9, height=2)
+        self.wrong_button.pack(side=tk.LEFT, padx=5)
 
         self.next_button = tk.Button(self.test_frame, text="Next Card", command=self.next_flashcard, width=20, height=2)
         self.next_button.pack(pady=10)
 
-        self.back_button = tk.Button(self.test_frame, text="Back to Menu", command=self.setup_main_menu, width=20, height=2)
-        self.back_button.pack(pady=10)
-        # Reset & load first flashcard
-        self.previous_flashcards = []
+        self.test_back_button = tk.Button(self.test_frame, text="Back to Menu", command=self.setup_main_menu, width=20, height=2)
+        self.test_back_button.pack(pady=10)
+
+    @instrument('ui.start_test')
+    def start_test(self):
+        """Start a test over the chosen categories, or the whole deck if none are given."""
+        categories = self.category_entry.get().strip()
+        # Due cards come from the review schedule, which needs an answer before moving on
+        if self.review_due.get():
+            self.next_button.config(state=tk.DISABLED)
+            self.next_flashcard()
+            return
+        self.next_button.config(state=tk.NORMAL)
+        # Only the ids in the chosen categories, so the test costs nothing for the rest of the deck
+        self.session = self.manager.start_session(categories, self.match_all.get())
+        if categories:
+            self.status_label.config(text=f"Testing {len(self.session)} flashcards in: {categories}")
         self.next_flashcard()
 
+    def change_mode(self):
+        """Let Next Card move on again after switching between due cards and a normal test."""
+        self.next_button.config(state=tk.NORMAL)
+
+    @instrument('ui.next_flashcard')
     def next_flashcard(self):
         """Show a random flashcard that has not yet been displayed."""
+        if self.review_due.get():
+            flashcard = self.manager.get_next_due_flashcard()
+        elif self.session is None:
+            # Due cards never start a session and there may be none to resume, so start one now
+            self.start_test()
+            return
+        else:
+            flashcard = next(self.session, None)
+        self.current_flashcard = flashcard
         # Error handling
-        if len(self.previous_flashcards) == len(self.manager.flashcards):
+        if flashcard is None:
             self.status_label.config(text="No more flashcards available.")
             self.tag_label.config(text="")
             self.question_label.config(text="")
             self.answer_label.config(text="")
             return
 
-        while True:
-            flashcard = self.manager.get_random_flashcard()
-            if flashcard not in self.previous_flashcards:
-                # Record shown flashcards
-                self.previous_flashcards.append(flashcard)  
-                # Display tag
-                self.tag_label.config(text="Category: " + flashcard.get_tag())
-                # Display question
-                self.question_label.config(text="Q:" + flashcard.get_question())  
-                # Clear answer until 'Show Answer' is clicked
-                self.answer_label.config(text="Ans: ?")
-                break
+        # Display tag
+        self.tag_label.config(text="Category: " + flashcard.get_tag())
+        # Display question
+        self.question_label.config(text="Q:" + flashcard.get_question())  
+        # Clear answer until 'Show Answer' is clicked
+        self.answer_label.config(text="Ans: ?")
+
+    @instrument('ui.grade_flashcard')
+    def grade_flashcard(self, correct):
+        """Record whether the current flashcard was answered correctly, then move on."""
+        # Error handling
+        if self.current_flashcard is None:
+            self.status_label.config(text="No flashcard to mark.")
+            return
+        self.manager.review_flashcard(self.current_flashcard.card_id, correct)
+        self.next_flashcard()
 
+    def load_session(self):
+        """Load the test session saved on the last exit, if any."""
+        if not os.path.exists(self.session_filename):
+            return None
+        with open(self.session_filename, 'r') as f:
+            return self.manager.resume_session(json.load(f))
+
+    def save_session(self):
+        """Save the current test session so it can be resumed next time."""
+        if self.session is not None and len(self.session):
+            with open(self.session_filename, 'w') as f:
+                json.dump(self.session.get_state(), f)
+        elif os.path.exists(self.session_filename):
+            os.remove(self.session_filename)
+
+    @instrument('ui.show_answer')
     def show_answer(self):
         """Show the answer for the current flashcard."""
         # Error handling
-        if self.question_label.cget("text") == "":
+        if self.current_flashcard is None:
             self.status_label.config(text="No flashcard to show answer for.")
-        # Show answer
+        # Show answer, looked up by id so cards with the same question cannot be mixed up
         else:
-            current_question = self.question_label.cget("text").replace("Q:", "").strip()
-            current_flashcard = next((fc for fc in self.manager.flashcards if fc.get_question() == current_question), None)
+            current_flashcard = self.manager.get_flashcard(self.current_flashcard.card_id)
             
             if current_flashcard:
                 self.answer_label.config(text="Ans: " + current_flashcard.get_answer())
@@ -395,9 +803,18 @@ class FlashcardApp:
 
 # Execute
 if __name__ == "__main__":
-    root = tk.Tk()
+    # With arguments, run the command line tool; tkinter is never imported
+    if len(sys.argv) > 1:
+        sys.exit(main())
+    root = load_tkinter().Tk()
     app = FlashcardApp(root)
     root.mainloop()
+    app.save_session()
+    # Waits for the background writers to finish saving
+    app.catalog.close()
+    # Latency statistics for the session, if asked for
+    if os.environ.get('FLASHCARDS_STATS'):
+        stats.dump(os.environ['FLASHCARDS_STATS'])
 
 
 
@@ -1,5 +1,13 @@
+import itertools
 import pygame
 import random
+import time
+
+try:
+    import numpy
+except ImportError:
+    # Only the high-density wave mode needs NumPy; the normal game runs without it
+    numpy = None
 
 # Initialise Pygame
 pygame.init()
@@ -12,28 +20,129 @@ JUMP_HEIGHT = 20
 GRAVITY = 0.5 
 WHITE = (255, 255, 255) 
 BLACK = (0, 0, 0) 
-
-# Initialise
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("2D Hero game")
+CELL_SIZE = 128 # Size of the collision grid cells, a bit bigger than an enemy
+SMALL_GROUP = 64 # Groups smaller than this are kept in a single cell, which is quicker than sorting them into a grid
+CELL_ROWS = 1 << 16 # Cell keys are column * CELL_ROWS + row, so no tuple is made for each cell
+FULL_REDRAW_AREA = SCREEN_WIDTH * SCREEN_HEIGHT // 2 # Changed area above which the whole screen is redrawn instead
+STEP = 1 / 60 # Game time each step of the simulation moves on by, in seconds
+MAX_STEPS = 5 # Most steps caught up in one frame, so a slow frame cannot freeze the game
+WAVE_SIZE = 2000 # Enemies in each high-density wave
+WAVE_TIME = 60 # Steps between waves
+WAVES = 10 # Waves to survive to complete the high-density mode
+SPREAD = 9 # Projectiles fired side by side with each shot in the high-density mode
+
+# Window, opened by open_window() when the game is played; a headless simulation never opens one
+screen = None
 
 # Clock for frame rate
 clock = pygame.time.Clock()
 
 # Font
 font = pygame.font.SysFont("comic sans", 24)
-
-# Load your Hero, Enemy and final boss emblems
+TEXT_CACHE_SIZE = 256 # Most rendered strings kept at once
+
+# Opens the game window
+def open_window():
+    global screen
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("2D Hero game")
+    images.clear() # Loaded again in the window's pixel format, which is faster to draw
+    texts.clear()
+    return screen
+
+# Asset cache
+images = {} # (file name or colour, size) -> image, so each one is loaded, converted and scaled only once
+
+# Loads an image the first time it is needed, scaled to size if one is given
+def get_image(filename, size=None):
+    image = images.get((filename, size))
+    if image is None:
+        if size is None:
+            image = pygame.image.load(filename)
+            if pygame.display.get_surface() is not None: # Converting needs a window
+                image = image.convert_alpha()
+        else:
+            image = pygame.transform.scale(get_image(filename), size) # Scaled from the loaded image, not the file again
+        images[(filename, size)] = image
+    return image
+
+# Plain coloured square, made once for each colour and size
+def get_filled(colour, size):
+    image = images.get((colour, size))
+    if image is None:
+        image = pygame.Surface(size)
+        if pygame.display.get_surface() is not None:
+            image = image.convert()
+        image.fill(colour)
+        images[(colour, size)] = image
+    return image
+
+# Text cache
+texts = {} # String -> rendered text, so a value that comes back (like health 100) is not rendered again
+
+# Renders a line of black text, or reuses it if it was rendered before
+def render_text(text):
+    image = texts.get(text)
+    if image is None:
+        if len(texts) >= TEXT_CACHE_SIZE:
+            del texts[next(iter(texts))] # Forget the oldest string
+        image = font.render(text, True, BLACK)
+        if pygame.display.get_surface() is not None: # Quicker to draw in the window's pixel format
+            image = image.convert_alpha()
+        texts[text] = image
+    return image
+
+# Your Hero, Enemy and final boss emblems, loaded by get_image() when first needed
 # .png File location required for each
-HeroIm = pygame.image.load('army.png').convert_alpha()
-EnemyIm = pygame.image.load('elden.radahn.png').convert_alpha()
-BossIm = pygame.image.load('elden.boss.png').convert_alpha()
+HERO_IMAGE = 'army.png'
+ENEMY_IMAGE = 'elden.radahn.png'
+BOSS_IMAGE = 'elden.boss.png'
+
+# Object pools
+class Pool:
+    """Keeps killed sprites so they can be used again instead of making new ones."""
+    def __init__(self, kind):
+        self.kind = kind # Class of the sprites in this pool
+        self.free = [] # Killed sprites waiting to be used again
+        self.created = 0 # Sprites made new
+        self.reused = 0 # Sprites taken from the pool
+        kind.pool = self
+
+    # Gives back a sprite set up as if it was just made with these arguments
+    def get(self, *args):
+        if self.free:
+            sprite = self.free.pop()
+            sprite.reset(*args)
+            self.reused += 1
+        else:
+            sprite = self.kind(*args)
+            self.created += 1
+        return sprite
+
+# Sprite that goes back to its pool when it is killed
+class PooledSprite(pygame.sprite.Sprite):
+    pool = None # Set by Pool
+
+    def kill(self):
+        if self.alive(): # A projectile can be killed twice in one frame, but must only go back once
+            super().kill()
+            if self.pool is not None:
+                self.pool.free.append(self)
+
+# Buttons held down for one step
+class Controls:
+    """What the player does in one step, read from the keyboard or chosen by a headless playtest."""
+    def __init__(self, left=False, right=False, jump=False, shoot=0):
+        self.left = left # Move left
+        self.right = right # Move right
+        self.jump = jump # Jump
+        self.shoot = shoot # Number of shots fired
 
 # Player class
 class Player(pygame.sprite.Sprite):
     def __init__(self):
         super().__init__()
-        self.image = pygame.transform.scale(HeroIm, (80, 100)) # Scale hero image
+        self.image = get_image(HERO_IMAGE, (80, 100)) # Scaled hero image
         self.rect = self.image.get_rect() # Rectangle around emblem
         self.rect.center = (100, SCREEN_HEIGHT - 70) # Set starting position
         self.speed = PLAYER_SPEED # Set player movement speed
@@ -42,14 +151,15 @@ class Player(pygame.sprite.Sprite):
         self.on_ground = True # Set ground status
         self.health = 100 # Set inital health
         self.lives = 5 # Set inital lives
+        self.controls = Controls() # Set by the game before each step
 
     def update(self):
-        movement = pygame.key.get_pressed()
+        movement = self.controls
         
         # Horizontal movement
-        if movement[pygame.K_LEFT]:
+        if movement.left:
             self.rect.x -= self.speed
-        if movement[pygame.K_RIGHT]:
+        if movement.right:
             self.rect.x += self.speed
             
         # Prevent player from leaving the screen
@@ -59,7 +169,7 @@ class Player(pygame.sprite.Sprite):
             self.rect.right = SCREEN_WIDTH
 
         # Jumping
-        if movement[pygame.K_SPACE] and self.on_ground:
+        if movement.jump and self.on_ground:
             self.y_velocity = -self.jump_speed
             self.on_ground = False
         
@@ -75,7 +185,7 @@ class Player(pygame.sprite.Sprite):
 
     # Creates a new projectile        
     def shoot(self):
-        return Projectile(self.rect.right, self.rect.centery)
+        return projectile_pool.get(self.rect.right, self.rect.centery)
     
     # Makes sure player can take damage
     def take_damage(self, damage):
@@ -88,11 +198,14 @@ class Player(pygame.sprite.Sprite):
         return False  # Not Game Over
 
 # Projectile Class
-class Projectile(pygame.sprite.Sprite):
+class Projectile(PooledSprite):
     def __init__(self, x, y):
         super().__init__()
-        self.image = pygame.Surface((10, 5)) # Creates a surface for the projectile
-        self.image.fill((255, 0, 0))  # Fill the surface with red
+        self.reset(x, y)
+
+    # Sets up the projectile, also when it is reused from the pool
+    def reset(self, x, y):
+        self.image = get_filled((255, 0, 0), (10, 5)) # Red surface for the projectile
         self.rect = self.image.get_rect() # Rectangle around the surface
         self.rect.center = (x, y) # Sets projectile inital postion
         self.speed = 7 # Sets projectile speed 
@@ -104,10 +217,14 @@ class Projectile(pygame.sprite.Sprite):
             self.kill() # Removes projectile if it leaves the screen
 
 # Enemy Class
-class Enemy(pygame.sprite.Sprite):
+class Enemy(PooledSprite):
     def __init__(self, x, y=None, speed=2, health=50):
         super().__init__()
-        self.image = pygame.transform.scale(EnemyIm, (80, 100))  # Scale enemy image
+        self.reset(x, y, speed, health)
+
+    # Sets up the enemy, also when it is reused from the pool
+    def reset(self, x, y=None, speed=2, health=50):
+        self.image = get_image(ENEMY_IMAGE, (80, 100))  # Scaled enemy image
         self.rect = self.image.get_rect() # Rectangle around the image
         if y is None:
             y = SCREEN_HEIGHT - 100  # Spawn near the bottom of the screen
@@ -129,21 +246,28 @@ class Enemy(pygame.sprite.Sprite):
 
 # Boss Enemy Class (Enemy class with a few adjustments)
 class BossEnemy(Enemy):
+    pool = None # Only one boss per game, so it is not pooled
+
     def __init__(self, x, y=None):
         if y is None:
             y = SCREEN_HEIGHT - 100  # Spawn near the bottom of the screen
         super().__init__(x, y, speed=3, health=300) # Set inital position, speed and healh
-        self.image = pygame.transform.scale(BossIm, (80, 120))  # Scale the Boss
+        self.image = get_image(BOSS_IMAGE, (80, 120))  # Scaled Boss image
 
 # Collectible Class
-class Collectible(pygame.sprite.Sprite):
+class Collectible(PooledSprite):
     def __init__(self, x, y=None, kind="health"):
         super().__init__()
-        self.image = pygame.Surface((20, 20)) # Creates a surface
+        self.reset(x, y, kind)
+
+    # Sets up the collectable, also when it is reused from the pool
+    def reset(self, x, y=None, kind="health"):
         if kind == "health":
-            self.image.fill((0, 255, 0))  # Fills the surface green for health
+            self.image = get_filled((0, 255, 0), (20, 20))  # Green surface for health
         elif kind == "life":
-            self.image.fill((255, 255, 0))  # Fills the surface yellow for an extra life
+            self.image = get_filled((255, 255, 0), (20, 20))  # Yellow surface for an extra life
+        else:
+            self.image = get_filled((0, 0, 0), (20, 20)) # Unknown kinds stay black, like a new surface
         self.rect = self.image.get_rect()
         if y is None:
             y = SCREEN_HEIGHT - 100  # Spawns the collectable near the bottom of the screen
@@ -158,11 +282,212 @@ class Collectible(pygame.sprite.Sprite):
             player.lives += 1 # Increase life
         self.kill() # Removes collectable after being collected
 
+# Pools for the sprites spawned during the game
+projectile_pool = Pool(Projectile)
+enemy_pool = Pool(Enemy)
+collectible_pool = Pool(Collectible)
+
+# Spatial hash for collision checks
+class SpatialHash:
+    """Uniform grid over a sprite group, so a collision check only tests the sprites in nearby cells."""
+    def __init__(self, group, cell_size=CELL_SIZE):
+        self.group = group # Group the grid is built from
+        self.has = group.has_internal # Sprites killed since the grid was built are no longer in the group
+        self.cell_size = cell_size
+        self.cells = {} # Cell key -> (sprites overlapping that cell, their rects)
+        self.order = {} # Sprite -> position in the group, so results come back in group order
+        self.size = 0 # Sprites in the grid; while the group has as many, none of them has been killed
+        self.small = True # Too few sprites for a grid to pay off, so they all go in one cell
+
+    # Builds the grid again from the group; done once a frame after the sprites move
+    def rebuild(self):
+        self.cells = {}
+        self.order = {}
+        self.size = 0
+        self.small = len(self.group) < SMALL_GROUP
+        for sprite in self.group:
+            self.add(sprite)
+
+    # Adds a sprite that joined the group after the grid was built
+    def add(self, sprite):
+        self.order[sprite] = self.size
+        self.size += 1
+        rect = sprite.rect
+        cells = self.cells
+        if self.small:
+            keys = (0,)
+        else:
+            size = self.cell_size
+            keys = [column * CELL_ROWS + row
+                    for column in range(rect.left // size, (rect.right - 1) // size + 1)
+                    for row in range(rect.top // size, (rect.bottom - 1) // size + 1)]
+        for key in keys:
+            entry = cells.get(key)
+            if entry is None:
+                entry = cells[key] = ([], [])
+            entry[0].append(sprite)
+            entry[1].append(rect)
+
+    # Same result as pygame.sprite.spritecollide(sprite, group, False), without testing every sprite
+    def collide(self, sprite):
+        rect = sprite.rect
+        # Only needs checking once a sprite in the grid has been killed
+        has = self.has if len(self.group) != self.size else None
+        if self.small:
+            entry = self.cells.get(0)
+        else:
+            size = self.cell_size
+            column, row = rect.left // size, rect.top // size
+            if (rect.right - 1) // size == column and (rect.bottom - 1) // size == row:
+                entry = self.cells.get(column * CELL_ROWS + row)
+            else:
+                hits = set()
+                for column in range(column, (rect.right - 1) // size + 1):
+                    for row in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                        entry = self.cells.get(column * CELL_ROWS + row)
+                        if entry is not None:
+                            sprites = entry[0]
+                            hits.update(sprites[index] for index in rect.collidelistall(entry[1]))
+                if has is not None:
+                    hits = [other for other in hits if has(other)]
+                # A sprite over two cells can be found twice, so the set is put back into group order
+                return sorted(hits, key=self.order.get)
+        # Most sprites fit in one cell, whose sprites are already in group order
+        if entry is None:
+            return []
+        hits = rect.collidelistall(entry[1]) # Rect tests done by pygame in C
+        if not hits:
+            return hits
+        sprites = entry[0]
+        if has is None:
+            return [sprites[index] for index in hits]
+        return [sprites[index] for index in hits if has(sprites[index])]
+
+# Entity kinds in a Swarm
+SWARM_ENEMY = 0
+SWARM_PROJECTILE = 1
+SWARM_HEALTH = 2
+SWARM_LIFE = 3
+SWARM_SIZES = [(12, 15), (10, 5), (20, 20), (20, 20)] # Width and height of each kind
+
+# Struct-of-arrays entity engine
+class Swarm:
+    """Many enemies, projectiles and collectibles kept as NumPy arrays, so they are moved, culled and collided all at once."""
+    def __init__(self):
+        if numpy is None:
+            raise ImportError("the high-density wave mode needs NumPy")
+        self.x = numpy.zeros(0) # Top left corner of each entity
+        self.y = numpy.zeros(0)
+        self.vx = numpy.zeros(0) # Velocity, in pixels per step
+        self.vy = numpy.zeros(0)
+        self.health = numpy.zeros(0) # Entities with no health left are removed on the next move
+        self.kind = numpy.zeros(0, dtype=numpy.int8) # SWARM_ENEMY, SWARM_PROJECTILE, ...
+        sizes = numpy.array(SWARM_SIZES, dtype=float)
+        self.widths = sizes[:, 0] # Size of each kind, looked up with self.kind
+        self.heights = sizes[:, 1]
+
+    def __len__(self):
+        return len(self.kind)
+
+    # Number of entities of one kind
+    def count(self, kind):
+        return int(numpy.count_nonzero(self.kind == kind))
+
+    # Adds entities of one kind; each argument is one number for all of them or one for each
+    def add(self, kind, x, y, vx=0, vy=0, health=1):
+        count = max(numpy.size(x), numpy.size(y))
+        new = [numpy.broadcast_to(numpy.asarray(value, dtype=float), count) for value in (x, y, vx, vy, health)]
+        self.x, self.y, self.vx, self.vy, self.health = [
+            numpy.concatenate((old, added)) for old, added in zip((self.x, self.y, self.vx, self.vy, self.health), new)]
+        self.kind = numpy.concatenate((self.kind, numpy.full(count, kind, dtype=numpy.int8)))
+
+    # Keeps only the entities where keep is True
+    def keep(self, keep):
+        self.x, self.y, self.vx, self.vy = self.x[keep], self.y[keep], self.vx[keep], self.vy[keep]
+        self.health, self.kind = self.health[keep], self.kind[keep]
+
+    # Moves everything, and removes what left the screen or has no health left
+    def move(self):
+        self.x += self.vx
+        self.y += self.vy
+        gone = ((self.vx < 0) & (self.x + self.widths[self.kind] < 0)) | ((self.vx > 0) & (self.x > SCREEN_WIDTH))
+        gone |= (self.y + self.heights[self.kind] < 0) | (self.y > SCREEN_HEIGHT)
+        self.keep(~gone & (self.health > 0))
+
+    # Projectiles that touch an enemy are used up and each one takes damage off the enemy; returns (hits, enemies killed)
+    def collide(self, damage):
+        enemies = numpy.flatnonzero(self.kind == SWARM_ENEMY)
+        shots = numpy.flatnonzero(self.kind == SWARM_PROJECTILE)
+        if len(enemies) == 0 or len(shots) == 0:
+            return 0, 0
+        shot_width, shot_height = SWARM_SIZES[SWARM_PROJECTILE]
+        enemy_width, enemy_height = SWARM_SIZES[SWARM_ENEMY]
+        ex, ey = self.x[enemies], self.y[enemies]
+        sx, sy = self.x[shots], self.y[shots]
+
+        # A projectile touches an enemy when its top left corner is inside the enemy grown by the projectile's size.
+        # Enemies go in every grid cell of that grown area, so each projectile only looks in the cell of its corner.
+        columns = numpy.floor((ex - shot_width) / CELL_SIZE).astype(numpy.int64)
+        rows = numpy.floor((ey - shot_height) / CELL_SIZE).astype(numpy.int64)
+        last_columns = numpy.floor((ex + enemy_width) / CELL_SIZE).astype(numpy.int64)
+        last_rows = numpy.floor((ey + enemy_height) / CELL_SIZE).astype(numpy.int64)
+        keys, owners = [], []
+        for column_step in range(-(-(enemy_width + shot_width) // CELL_SIZE) + 1):
+            for row_step in range(-(-(enemy_height + shot_height) // CELL_SIZE) + 1):
+                inside = (columns + column_step <= last_columns) & (rows + row_step <= last_rows)
+                keys.append(cell_keys(columns[inside] + column_step, rows[inside] + row_step))
+                owners.append(numpy.flatnonzero(inside))
+        keys, owners = numpy.concatenate(keys), numpy.concatenate(owners)
+        order = numpy.argsort(keys)
+        keys, owners = keys[order], owners[order]
+
+        # Every (projectile, enemy) pair sharing a cell
+        shot_keys = cell_keys(numpy.floor(sx / CELL_SIZE).astype(numpy.int64), numpy.floor(sy / CELL_SIZE).astype(numpy.int64))
+        starts = numpy.searchsorted(keys, shot_keys, "left")
+        counts = numpy.searchsorted(keys, shot_keys, "right") - starts
+        total = int(counts.sum())
+        if total == 0:
+            return 0, 0
+        pair_shots = numpy.repeat(numpy.arange(len(shots)), counts)
+        offsets = numpy.arange(total) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        pair_enemies = owners[numpy.repeat(starts, counts) + offsets]
+
+        # Same test as pygame.Rect.colliderect on each pair
+        px, py = sx[pair_shots], sy[pair_shots]
+        qx, qy = ex[pair_enemies], ey[pair_enemies]
+        hit = (px < qx + enemy_width) & (px + shot_width > qx) & (py < qy + enemy_height) & (py + shot_height > qy)
+        if not hit.any():
+            return 0, 0
+        self.health[shots[pair_shots[hit]]] = 0 # Projectiles are used up
+        was_alive = self.health[enemies] > 0
+        self.health[enemies] -= damage * numpy.bincount(pair_enemies[hit], minlength=len(enemies))
+        killed = int(numpy.count_nonzero(was_alive & (self.health[enemies] <= 0)))
+        return int(hit.sum()), killed
+
+    # Entities of one kind touching a rectangle, like the player
+    def touching(self, rect, kind):
+        width, height = SWARM_SIZES[kind]
+        return numpy.flatnonzero((self.kind == kind) & (self.health > 0)
+                                 & (self.x < rect.right) & (self.x + width > rect.left)
+                                 & (self.y < rect.bottom) & (self.y + height > rect.top))
+
+    # Draws everything, one batch of blits for each kind
+    def draw(self, surface, images):
+        for kind, image in enumerate(images):
+            mine = (self.kind == kind) & (self.x < SCREEN_WIDTH) # Waves wait off the right of the screen
+            if mine.any():
+                positions = zip(self.x[mine].astype(int).tolist(), self.y[mine].astype(int).tolist())
+                surface.blits(zip(itertools.repeat(image), positions), doreturn=False)
+
+# Number for each grid cell, so cells can be sorted and searched; columns and rows just off the screen are fine too
+def cell_keys(columns, rows):
+    return (columns + 1) * (SCREEN_HEIGHT // CELL_SIZE + 3) + (rows + 1)
+
 # Display the "Game Over" screen
 def game_over():
     screen.fill(WHITE) # Makes screen white
-    game_over_text = font.render("GAME OVER", True, BLACK) # Produces game over text
-    restart_text = font.render("Press SPACE to Restart", True, BLACK) # Produces restart insrutctions
+    game_over_text = render_text("GAME OVER") # Produces game over text
+    restart_text = render_text("Press SPACE to Restart") # Produces restart insrutctions
     screen.blit(game_over_text, (SCREEN_WIDTH//2 - game_over_text.get_width()//2, SCREEN_HEIGHT//2 - 50)) # Center text
     screen.blit(restart_text, (SCREEN_WIDTH//2 - restart_text.get_width()//2, SCREEN_HEIGHT//2 + 50)) # Center tect
     pygame.display.flip() # Updates the display
@@ -180,8 +505,11 @@ def game_over():
 # Add the instruction screen function
 def instructions():
     screen.fill(WHITE)  # Clear the screen
-    instructions_text = font.render("Use Z to shoot, arrow keys to move and space to jump!!", True, BLACK)
-    press_key_text = font.render("Press Enter to Start", True, BLACK)
+    instructions_text = render_text("Use Z to shoot, arrow keys to move and space to jump!!")
+    if numpy is not None:
+        press_key_text = render_text("Press Enter to Start, or W for high-density waves")
+    else:
+        press_key_text = render_text("Press Enter to Start")
     
     # Draw the instructions at the center of the screen
     screen.blit(instructions_text, (SCREEN_WIDTH // 2 - instructions_text.get_width() // 2, SCREEN_HEIGHT // 2 - 50))
@@ -189,22 +517,23 @@ def instructions():
     
     pygame.display.update()  # Update the screen to display the text
     
-    # Wait for the player to press Enter to start the game
-    waiting = True
-    while waiting:
+    # Wait for the player to press Enter to start the game; returns True for the high-density wave mode
+    while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 quit()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_RETURN:  # Start the game on Enter press
-                    waiting = False
+                    return False
+                if event.key == pygame.K_w and numpy is not None: # Start the high-density waves on W press
+                    return True
 
 # Display the "Game Complete" screen
 def game_complete(): 
     screen.fill(WHITE) # Fills with white colour 
-    game_complete_text = font.render("GAME COMPLETE", True, BLACK) # Produces game complete text
-    restart_text = font.render("Press SPACE to Restart", True, BLACK) # Produces restart text 
+    game_complete_text = render_text("GAME COMPLETE") # Produces game complete text
+    restart_text = render_text("Press SPACE to Restart") # Produces restart text 
     screen.blit(game_complete_text, (SCREEN_WIDTH//2 - game_complete_text.get_width()//2, SCREEN_HEIGHT//2 - 50)) # Center text
     screen.blit(restart_text, (SCREEN_WIDTH//2 - restart_text.get_width()//2, SCREEN_HEIGHT//2 + 50)) # Center text
     pygame.display.flip() # Updates the display
@@ -219,122 +548,374 @@ def game_complete():
             if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
                 restart = True # Restarts 
 
-# Main game loop
-def game():
-    instructions()
-
-    player = Player() # Creates player instance 
-    all_sprites = pygame.sprite.Group() # Group for all sprites
-    projectiles = pygame.sprite.Group() # Group for all projectiles
-    enemies = pygame.sprite.Group() # Group for all enemies
-    collectibles = pygame.sprite.Group() # Group for all collectables 
-
-    all_sprites.add(player) # Add player to the all sprites group 
-
-    score = 0 # Initalise score
-    enemy_timer = 0 # Timer for enemies
-    collectible_timer = 0 # Timer for collectables
-    level = 1 # Initalise game level
-    enemy_count = 0 # Initalise enemy count
-    enemies_to_next_level = 10  # Number of enemies to defeat to progress to the next level
-
-    boss_fight = False # Flag to indicate if its a boss fight
-
-    # Main game loop
-    running = True # Game is running 
-    while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False # Exits game if the window is closed 
-
-            # Creates projectiles 
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_z:  # Shoot
-                    projectile = player.shoot()
-                    all_sprites.add(projectile) 
-                    projectiles.add(projectile)
+# Heads-up display
+class HudText:
+    """One line of the HUD, rendered again only when its value changes."""
+    def __init__(self, label, position):
+        self.label = label # Text before the value
+        self.position = position # Top left corner on the screen
+        self.value = None # Value last rendered
+        self.image = None
+        self.rect = pygame.Rect(position, (0, 0)) # Area the text covers on the screen
+
+    # Renders the line again if the value changed; returns the area covered by the old and new text, or None
+    def update(self, value):
+        if value == self.value:
+            return None
+        self.value = value
+        self.image = render_text(f"{self.label}: {value}")
+        old_rect = self.rect
+        self.rect = self.image.get_rect(topleft=self.position)
+        return self.rect.union(old_rect)
+
+    # Draws the line, rendering it only if the value is different from last time
+    def draw(self, surface, value):
+        self.update(value)
+        surface.blit(self.image, self.position)
+
+class Hud:
+    """Score and player health/lives/level in the top left corner."""
+    def __init__(self):
+        self.lines = [HudText("Score", (10, 10)), HudText("Health", (10, 40)),
+                      HudText("Lives", (10, 70)), HudText("Level", (10, 100))]
+
+    # Values shown on each line, in order
+    def values(self, state):
+        return (state.score, state.player.health, state.player.lives, state.level)
+
+    # Draws every line for the current state of the game
+    def draw(self, surface, state):
+        for line, value in zip(self.lines, self.values(state)):
+            line.draw(surface, value)
+
+# Game simulation
+class GameState:
+    """Everything in one game, moved on one fixed step at a time; drawing is kept separate so it can run without a window."""
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed) # Own random numbers, so a game with the same seed always plays out the same
+
+        self.player = Player() # Creates player instance 
+        self.all_sprites = pygame.sprite.RenderUpdates() # Group for all sprites, which remembers where each was drawn
+        self.projectiles = pygame.sprite.Group() # Group for all projectiles
+        self.enemies = pygame.sprite.Group() # Group for all enemies
+        self.collectibles = pygame.sprite.Group() # Group for all collectables 
+
+        self.all_sprites.add(self.player) # Add player to the all sprites group 
+        self.enemy_grid = SpatialHash(self.enemies) # Collision grids, rebuilt every step
+        self.collectible_grid = SpatialHash(self.collectibles)
+
+        self.score = 0 # Initalise score
+        self.enemy_timer = 0 # Timer for enemies
+        self.collectible_timer = 0 # Timer for collectables
+        self.level = 1 # Initalise game level
+        self.enemy_count = 0 # Initalise enemy count
+        self.enemies_to_next_level = 10  # Number of enemies to defeat to progress to the next level
+
+        self.boss_fight = False # Flag to indicate if its a boss fight
+        self.boss = None
+        self.steps = 0 # Steps played so far
+        self.result = None # "over" or "complete" once the game has ended
+
+    # Moves the game on by one step of STEP seconds
+    def step(self, controls):
+        player = self.player
+        player.controls = controls
+
+        # Creates projectiles 
+        for _ in range(controls.shoot):
+            projectile = player.shoot()
+            self.all_sprites.add(projectile) 
+            self.projectiles.add(projectile)
 
         # Spawning enemies periodically
-        if not boss_fight:
-            enemy_timer += 1
-            if enemy_timer >= 60:  # Every second
-                enemy_timer = 0
+        if not self.boss_fight:
+            self.enemy_timer += 1
+            if self.enemy_timer >= 60:  # Every second
+                self.enemy_timer = 0
                 # Spawn an enemy on the right side of the screen in the bottom half
-                enemy_speed = 2 + level  # Increase speed with level
-                enemy_health = 50 + (level - 1) * 25  # Increase health with level
-                y_position = random.randint(SCREEN_HEIGHT // 2, SCREEN_HEIGHT - 100)  # Bottom half of the screen
-                enemy = Enemy(SCREEN_WIDTH + 40, y_position, enemy_speed, enemy_health)
-                all_sprites.add(enemy)
-                enemies.add(enemy)
+                enemy_speed = 2 + self.level  # Increase speed with level
+                enemy_health = 50 + (self.level - 1) * 25  # Increase health with level
+                y_position = self.rng.randint(SCREEN_HEIGHT // 2, SCREEN_HEIGHT - 100)  # Bottom half of the screen
+                enemy = enemy_pool.get(SCREEN_WIDTH + 40, y_position, enemy_speed, enemy_health)
+                self.all_sprites.add(enemy)
+                self.enemies.add(enemy)
 
         # Spawning collectibles periodically
-        collectible_timer += 1
-        if collectible_timer >= 300:  # Every 5 seconds
-            collectible_timer = 0
-            kind = random.choice(["health", "life"])  # Randomly choose type of collectible
-            collectible = Collectible(random.randint(100, SCREEN_WIDTH - 100), SCREEN_HEIGHT - 100, kind)
-            all_sprites.add(collectible)
-            collectibles.add(collectible)
+        self.collectible_timer += 1
+        if self.collectible_timer >= 300:  # Every 5 seconds
+            self.collectible_timer = 0
+            kind = self.rng.choice(["health", "life"])  # Randomly choose type of collectible
+            collectible = collectible_pool.get(self.rng.randint(100, SCREEN_WIDTH - 100), SCREEN_HEIGHT - 100, kind)
+            self.all_sprites.add(collectible)
+            self.collectibles.add(collectible)
 
         # Update
-        all_sprites.update()
+        self.all_sprites.update()
+        self.enemy_grid.rebuild()
+        self.collectible_grid.rebuild()
+        self.steps += 1
 
         # Check for collisions
-        for projectile in projectiles:
-            enemy_hit = pygame.sprite.spritecollide(projectile, enemies, False) # Checks if projectile hits enemies
+        for projectile in self.projectiles:
+            enemy_hit = self.enemy_grid.collide(projectile) # Checks if projectile hits enemies
             for enemy in enemy_hit:
                 enemy.take_damage(25) # Enemy takes damage
                 projectile.kill() # Remove sprojectile after hits enemy
-                score += 10 # Increases score 
+                self.score += 10 # Increases score 
                 if not enemy.alive():
-                    enemy_count += 1 # Increases enemy count if an enemy is killed
-                    if enemy_count >= enemies_to_next_level and level < 3:
-                        level += 1 # Progress to the next level
-                        enemy_count = 0 # Resets enemy count 
+                    self.enemy_count += 1 # Increases enemy count if an enemy is killed
+                    if self.enemy_count >= self.enemies_to_next_level and self.level < 3:
+                        self.level += 1 # Progress to the next level
+                        self.enemy_count = 0 # Resets enemy count 
                     # Boss fight
-                    elif level == 3 and enemy_count >= enemies_to_next_level and not boss_fight:
-                        boss_fight = True # Starts boss fight if level 3 is reached
-                        boss = BossEnemy(SCREEN_WIDTH + 80)  # The boss will spawn near the bottom of the screen
-                        all_sprites.add(boss)
-                        enemies.add(boss)
+                    elif self.level == 3 and self.enemy_count >= self.enemies_to_next_level and not self.boss_fight:
+                        self.boss_fight = True # Starts boss fight if level 3 is reached
+                        self.boss = BossEnemy(SCREEN_WIDTH + 80)  # The boss will spawn near the bottom of the screen
+                        self.all_sprites.add(self.boss)
+                        self.enemies.add(self.boss)
+                        self.enemy_grid.add(self.boss) # Later projectiles this step can hit the boss too
 
         # Player collides with enemies
-        if pygame.sprite.spritecollide(player, enemies, False):
+        if self.enemy_grid.collide(player):
             if player.take_damage(2): # Player takes damage
-                game_over() # Displays game over screen
-                return game()  # Restart the game
+                self.result = "over" # Game over
+                return
 
         # Player collects collectibles
-        for collectible in pygame.sprite.spritecollide(player, collectibles, False):
+        for collectible in self.collectible_grid.collide(player):
             collectible.apply(player) # Apply collectible effect onto the player
 
         # If boss is defeated, the game is complete
-        if boss_fight and not boss.alive():
-            game_complete() # Display game complete screen
-            return game()  # Restart the game
+        if self.boss_fight and not self.boss.alive():
+            self.result = "complete"
 
-        # Drawing
-        screen.fill(WHITE) 
+    # Draws the whole game as it is now; returns where sprites were and are now
+    def draw(self, surface, hud):
+        surface.fill(WHITE) 
 
         # Draw all sprites
-        all_sprites.draw(screen)
+        rects = self.all_sprites.draw(surface)
 
         # Score and player health/lives
-        score_text = font.render(f"Score: {score}", True, BLACK)
-        health_text = font.render(f"Health: {player.health}", True, BLACK)
-        lives_text = font.render(f"Lives: {player.lives}", True, BLACK)
-        level_text = font.render(f"Level: {level}", True, BLACK)
-        screen.blit(score_text, (10, 10))
-        screen.blit(health_text, (10, 40))
-        screen.blit(lives_text, (10, 70))
-        screen.blit(level_text, (10, 100))
-
-        # Update the display
-        pygame.display.flip()
+        hud.draw(surface, self)
+        return rects
+
+# High-density wave mode
+class WaveState(GameState):
+    """Game where thousands of small enemies come in waves, kept in a Swarm instead of one sprite each."""
+    def __init__(self, seed=None, wave_size=WAVE_SIZE):
+        super().__init__(seed)
+        self.swarm = Swarm()
+        self.wave_rng = numpy.random.default_rng(self.rng.getrandbits(64)) # Whole waves at once, from the game's seed
+        self.wave_size = wave_size
+        self.wave_timer = WAVE_TIME - 1 # First wave comes straight away
+        self.waves = 0 # Waves sent so far
+        self.level = 0
+        # Image for each kind, in the same order as SWARM_SIZES
+        self.images = [get_image(ENEMY_IMAGE, SWARM_SIZES[SWARM_ENEMY]),
+                       get_filled((255, 0, 0), SWARM_SIZES[SWARM_PROJECTILE]),
+                       get_filled((0, 255, 0), SWARM_SIZES[SWARM_HEALTH]),
+                       get_filled((255, 255, 0), SWARM_SIZES[SWARM_LIFE])]
+
+    # Moves the game on by one step of STEP seconds
+    def step(self, controls):
+        player = self.player
+        player.controls = controls
+        swarm = self.swarm
+        rng = self.rng
+
+        # Each shot fires a fan of projectiles
+        fan = numpy.arange(SPREAD) - SPREAD // 2
+        for _ in range(controls.shoot):
+            swarm.add(SWARM_PROJECTILE, player.rect.right, player.rect.centery + fan * 6, vx=7, vy=fan * 0.5)
+
+        # Sends a wave of enemies every WAVE_TIME steps
+        self.wave_timer += 1
+        if self.wave_timer >= WAVE_TIME and self.waves < WAVES:
+            self.wave_timer = 0
+            self.waves += 1
+            self.level = self.waves # Level shows the wave
+            x = SCREEN_WIDTH + self.wave_rng.uniform(0, 400, self.wave_size)
+            y = self.wave_rng.integers(SCREEN_HEIGHT // 2, SCREEN_HEIGHT - 80, self.wave_size, endpoint=True) # Bottom half
+            speed = -(2 + self.waves * 0.2 + self.wave_rng.uniform(0, 2, self.wave_size)) # Faster every wave
+            swarm.add(SWARM_ENEMY, x, y, vx=speed, health=25 + self.waves * 5)
+
+        # Spawning collectibles periodically
+        self.collectible_timer += 1
+        if self.collectible_timer >= 300:  # Every 5 seconds
+            self.collectible_timer = 0
+            kind = rng.choice([SWARM_HEALTH, SWARM_LIFE])  # Randomly choose type of collectible
+            swarm.add(kind, rng.randint(100, SCREEN_WIDTH - 100), SCREEN_HEIGHT - 110)
+
+        # Update
+        player.update()
+        swarm.move()
+        self.steps += 1
+
+        # Check for collisions
+        hits, killed = swarm.collide(25)
+        self.score += hits * 10
+        self.enemy_count += killed
+
+        # Player collides with enemies
+        if len(swarm.touching(player.rect, SWARM_ENEMY)):
+            if player.take_damage(2): # Player takes damage
+                self.result = "over" # Game over
+                return
+
+        # Player collects collectibles
+        health = swarm.touching(player.rect, SWARM_HEALTH)
+        lives = swarm.touching(player.rect, SWARM_LIFE)
+        player.health = min(100, player.health + 20 * len(health)) # Increase health
+        player.lives += len(lives) # Increase life
+        swarm.health[health] = 0 # Removes collectables after being collected
+        swarm.health[lives] = 0
+
+        # Every wave has come and none of it is left
+        if self.waves == WAVES and swarm.count(SWARM_ENEMY) == 0:
+            self.result = "complete"
+
+    # Draws the whole game; everything can move, so it is always all of the screen
+    def draw(self, surface, hud):
+        surface.fill(WHITE)
+        self.swarm.draw(surface, self.images)
+        self.all_sprites.draw(surface)
+        hud.draw(surface, self)
+        return [surface.get_rect()]
+
+# Rendering
+class Renderer:
+    """Draws a game onto the window, only where something changed when few things move on the screen."""
+    def __init__(self, surface, dirty=True):
+        self.surface = surface
+        self.background = pygame.Surface(surface.get_size()) # Plain background, used to rub out sprites that moved
+        if pygame.display.get_surface() is not None:
+            self.background = self.background.convert()
+        self.background.fill(WHITE)
+        self.hud = Hud()
+        self.dirty = dirty # False always redraws the whole screen
+        self.full_redraw = True # The first frame draws everything
+        # Measurements, for comparing the two ways of drawing
+        self.frames = 0
+        self.full_frames = 0 # Frames where the whole screen was redrawn
+        self.pixels = 0 # Pixels drawn and sent to the display, added up over every frame
+
+    # Draws the game; returns the rectangles that changed, or None if the whole screen did
+    def draw(self, state):
+        self.frames += 1
+        if not self.dirty or self.full_redraw:
+            rects = state.draw(self.surface, self.hud)
+            # Keeps redrawing everything while most of the screen is changing
+            self.full_redraw = sum(rect.width * rect.height for rect in rects) > FULL_REDRAW_AREA
+            self.full_frames += 1
+            self.pixels += self.surface.get_width() * self.surface.get_height()
+            return None
+
+        surface = self.surface
+        sprites = state.all_sprites
+        sprites.clear(surface, self.background) # Rubs out every sprite where it was last drawn
+        # Rubs out HUD text whose value changed
+        changed = []
+        for line, value in zip(self.hud.lines, self.hud.values(state)):
+            area = line.update(value)
+            if area is not None:
+                surface.blit(self.background, area, area)
+                changed.append(area)
+        rects = sprites.draw(surface) # Old and new places of every sprite, and of sprites that were removed
+        # HUD text goes on top again wherever a sprite was drawn or rubbed out under it; lines that overlap
+        # one being redrawn are redrawn too, since rubbing one out would rub out part of the other
+        redraw = [line for line in self.hud.lines
+                  if line.rect.collidelist(changed) != -1 or line.rect.collidelist(rects) != -1]
+        grown = True
+        while grown:
+            grown = False
+            for line in self.hud.lines:
+                if line not in redraw and line.rect.collidelist([other.rect for other in redraw]) != -1:
+                    redraw.append(line)
+                    grown = True
+        # The text is see-through at the edges, so what is under it is put back before it is drawn again
+        for line in redraw:
+            surface.set_clip(line.rect)
+            surface.blit(self.background, line.rect, line.rect)
+            for sprite in sprites:
+                if sprite.rect.colliderect(line.rect):
+                    surface.blit(sprite.image, sprite.rect)
+            surface.set_clip(None)
+            rects.append(line.rect)
+        for line in self.hud.lines:
+            if line in redraw:
+                surface.blit(line.image, line.rect)
+        rects.extend(changed)
+
+        area = sum(rect.width * rect.height for rect in rects)
+        if area > FULL_REDRAW_AREA:
+            # Most of the screen changed, so the next frame is quicker drawn whole and this one is sent whole
+            self.full_redraw = True
+            self.pixels += surface.get_width() * surface.get_height()
+            return None
+        self.pixels += area
+        return rects
+
+# Runs a game without a window, as fast as possible; policy(state) chooses the Controls for each step,
+# and waves=True plays the high-density wave mode
+def simulate(steps, seed=None, policy=None, waves=False):
+    state = WaveState(seed) if waves else GameState(seed)
+    while state.steps < steps and state.result is None:
+        state.step(policy(state) if policy else Controls())
+    return state
+
+# Plays one game in the window; returns "over", "complete", or None if the window is closed
+def play(state):
+    lag = 0 # Real time that has not been simulated yet
+    previous = time.perf_counter()
+    shots = 0 # Shots fired since the last step
+    renderer = Renderer(screen)
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return None # Exits game if the window is closed 
+
+            # Shoot
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_z:
+                shots += 1
+
+        # Steps the game by fixed amounts to catch up with real time, whatever the frame rate
+        now = time.perf_counter()
+        lag = min(lag + now - previous, MAX_STEPS * STEP)
+        previous = now
+        while lag >= STEP:
+            keys = pygame.key.get_pressed()
+            state.step(Controls(keys[pygame.K_LEFT], keys[pygame.K_RIGHT], keys[pygame.K_SPACE], shots))
+            shots = 0
+            lag -= STEP
+            if state.result is not None:
+                return state.result
+
+        # Drawing
+        rects = renderer.draw(state)
+
+        # Update the display, only where it changed
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
 
         # Set frame rate
         clock.tick(60)
 
+# Main game loop
+def game():
+    open_window()
+    while True:
+        waves = instructions()
+        result = play(WaveState() if waves else GameState())
+        if result == "over":
+            game_over() # Displays game over screen, then restarts the game
+        elif result == "complete":
+            game_complete() # Display game complete screen, then restarts the game
+        else:
+            break
+
     pygame.quit()
 
 if __name__ == "__main__":
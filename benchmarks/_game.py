@@ -0,0 +1,30 @@
+"""Shared setup for the benchmarks of Question-2.py.
+
+The game file's name is not a valid module name, so it is loaded from its
+path. SDL's dummy video and audio drivers are used unless others are set,
+so the benchmarks run without a screen or sound card.
+"""
+import importlib.util
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+
+FRAME_BUDGET_MS = 1000 / 60
+
+
+def load_game():
+    """Return Question-2.py as a module, loading it the first time."""
+    if "question2" in sys.modules:
+        return sys.modules["question2"]
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    # The game loads its images from the working directory
+    os.chdir(ROOT)
+    spec = importlib.util.spec_from_file_location("question2", os.path.join(ROOT, "Question-2.py"))
+    question2 = importlib.util.module_from_spec(spec)
+    # Registered before it runs, so benchmarks that import each other share one copy of the game
+    sys.modules["question2"] = question2
+    spec.loader.exec_module(question2)
+    return question2
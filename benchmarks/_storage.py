@@ -0,0 +1,9 @@
+"""Storage backends the flashcard benchmarks can run against."""
+
+# File extension, and whether to journal, for each storage backend
+STORAGE = {
+    'jsonl': ('.jsonl', False),
+    'json': ('.json', False),
+    'journal': ('.json', True),
+    'sqlite': ('.db', False),
+}
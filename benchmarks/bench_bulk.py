@@ -0,0 +1,106 @@
+"""Benchmark bulk edits and deletes against the same changes made one card at a time.
+
+For each count, a fresh deck has that many cards retagged, then deleted,
+first one call per card and then with retag_many / delete_many. The number
+of times each way reached the disk is counted from the latency statistics;
+the bulk operations should stay at about one however many cards they touch.
+Single-card runs on the rewrite-everything JSON backend get slow quickly, so
+above --single-limit cards only that many are timed and the rest estimated.
+
+Usage:
+    python benchmarks/bench_bulk.py [--size 10000] [--counts 10 100 1000 10000]
+        [--storage jsonl json journal sqlite] [--single-limit 1000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+import flashcards
+from _storage import STORAGE
+
+# Statistic recorded each time a change is made durable, for each storage backend
+WRITE_STAT = {
+    'jsonl': 'io.fsync',
+    'json': 'io.write',
+    'journal': 'io.write',
+    'sqlite': 'io.commit',
+}
+
+
+def make_deck(directory, storage, size):
+    """Write a deck of the given size and return its filename."""
+    extension, journal = STORAGE[storage]
+    filename = os.path.join(directory, "flashcards" + extension)
+    manager = flashcards.FlashcardManager(filename, journal=journal)
+    manager.add_flashcards((f"Question {i}?", f"Answer {i}", f"tag{i % 20}") for i in range(size))
+    manager.save_flashcards()
+    manager.close()
+    return filename
+
+
+def writes(storage):
+    """Return how many times the deck has been made durable since the statistics were reset."""
+    operation = flashcards.stats.summary().get(WRITE_STAT[storage])
+    return operation['calls'] if operation else 0
+
+
+def measure(storage, size, count, single_limit):
+    """Return {name: (milliseconds, writes, estimated)} for each way of changing count cards."""
+    _, journal = STORAGE[storage]
+    results = {}
+    for way in ('single', 'bulk'):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = make_deck(directory, storage, size)
+            manager = flashcards.FlashcardManager(filename, journal=journal)
+            card_ids = manager.get_flashcard_ids()[:count]
+            timed_ids = card_ids[:single_limit] if way == 'single' else card_ids
+            for name in ('retag', 'delete'):
+                flashcards.stats.reset()
+                start = time.perf_counter()
+                if way == 'bulk' and name == 'retag':
+                    manager.retag_many(timed_ids, add="bulk")
+                elif way == 'bulk':
+                    manager.delete_many(timed_ids)
+                elif name == 'retag':
+                    for card_id in timed_ids:
+                        manager.retag_many([card_id], add="bulk")
+                else:
+                    for card_id in timed_ids:
+                        manager.delete_flashcard(card_id)
+                elapsed = (time.perf_counter() - start) * 1000
+                scale = count / len(timed_ids)
+                results[f"{name} {way}"] = (elapsed * scale, round(writes(storage) * scale), scale != 1)
+            manager.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk edits and deletes.")
+    parser.add_argument('--size', type=int, default=10000, help="cards in each deck")
+    parser.add_argument('--counts', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--storage', choices=sorted(STORAGE), nargs='+', default=['jsonl', 'json', 'sqlite'])
+    parser.add_argument('--single-limit', type=int, default=1000, help="most cards changed one at a time")
+    args = parser.parse_args()
+    flashcards.stats.enabled = True
+
+    names = ('retag single', 'retag bulk', 'delete single', 'delete bulk')
+    print(f"{'':>16}" + "".join(f"{name:>25}" for name in names))
+    for storage in args.storage:
+        for count in args.counts:
+            count = min(count, args.size)
+            results = measure(storage, args.size, count, args.single_limit)
+            line = f"{storage + '/' + str(count):>16}"
+            for name in names:
+                elapsed, total, estimated = results[name]
+                # ~ marks figures estimated from the first --single-limit cards
+                line += f"{elapsed:>12,.1f} ms{'~' if estimated else ' '}{total:>6} wr"
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Stress test collision checks in Question-2.py with thousands of moving sprites.
+
+Every frame the sprites move, then each projectile is checked against the
+enemies and the player against the enemies and collectibles, once by
+testing every pair (pygame.sprite.spritecollide) and once through the
+SpatialHash grid. Both must find exactly the same hits. Projectiles that
+hit an enemy start again from the left edge, as in the game. Reported times are
+per frame, for moving the sprites and checking collisions; the budget at
+60 FPS is 16.7 ms. With fewer than SMALL_GROUP enemies (below 6400 sprites
+here) SpatialHash keeps them all in one cell instead of a grid, as testing
+them all in C is quicker than sorting them into cells.
+
+Runs without a window, on SDL's dummy video driver.
+
+Usage: python benchmarks/bench_collisions.py [--counts 500 1000 2000 5000 10000] [--frames 120]
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from _game import FRAME_BUDGET_MS, load_game
+
+question2 = load_game()
+pygame = question2.pygame
+
+
+class Scene:
+    """Sprites spread over the screen; whatever leaves it comes back on the other side, so the count stays the same."""
+
+    def __init__(self, count, seed):
+        rng = random.Random(seed)
+        width, height = question2.SCREEN_WIDTH, question2.SCREEN_HEIGHT
+        self.player = question2.Player()
+        self.enemies = pygame.sprite.Group()
+        self.projectiles = pygame.sprite.Group()
+        self.collectibles = pygame.sprite.Group()
+        # Rapid fire: mostly projectiles, with one enemy and one collectible for every hundred sprites
+        # (an 80x100 enemy covers almost 1% of the screen, so more would pile up on top of each other)
+        for _ in range(count // 100):
+            self.enemies.add(question2.Enemy(rng.randint(0, width), rng.randint(0, height), rng.randint(1, 4)))
+        for _ in range(count - 2 * (count // 100)):
+            self.projectiles.add(question2.Projectile(rng.randint(0, width), rng.randint(0, height)))
+        for _ in range(count // 100):
+            self.collectibles.add(question2.Collectible(rng.randint(0, width), rng.randint(0, height)))
+
+    def move(self):
+        width = question2.SCREEN_WIDTH
+        for enemy in self.enemies:
+            enemy.rect.x -= enemy.speed
+            if enemy.rect.right < 0:
+                enemy.rect.left = width
+        for projectile in self.projectiles:
+            projectile.rect.x += projectile.speed
+            if projectile.rect.x > width:
+                projectile.rect.right = 0
+
+    def fire_again(self, hits):
+        """Send projectiles that hit something back to the left edge, as the game kills them and fires new ones."""
+        for projectile, enemies in zip(self.projectiles, hits):
+            if enemies:
+                projectile.rect.right = 0
+
+
+def brute_force(scene):
+    """Return every hit, testing every pair as the game used to."""
+    hits = [pygame.sprite.spritecollide(projectile, scene.enemies, False) for projectile in scene.projectiles]
+    hits.append(pygame.sprite.spritecollide(scene.player, scene.enemies, False))
+    hits.append(pygame.sprite.spritecollide(scene.player, scene.collectibles, False))
+    return hits
+
+
+def with_grid(scene, enemy_grid, collectible_grid):
+    """Return every hit, through the grids as the game does now."""
+    enemy_grid.rebuild()
+    collectible_grid.rebuild()
+    hits = [enemy_grid.collide(projectile) for projectile in scene.projectiles]
+    hits.append(enemy_grid.collide(scene.player))
+    hits.append(collectible_grid.collide(scene.player))
+    return hits
+
+
+def run(count, frames, seed):
+    """Return (brute force ms per frame, grid ms per frame, hits per frame) for one sprite count."""
+    scene = Scene(count, seed)
+    enemy_grid = question2.SpatialHash(scene.enemies)
+    collectible_grid = question2.SpatialHash(scene.collectibles)
+    brute_times, grid_times, hit_counts = [], [], []
+    for _ in range(frames):
+        start = time.perf_counter()
+        scene.move()
+        moved = time.perf_counter()
+        expected = brute_force(scene)
+        checked = time.perf_counter()
+        found = with_grid(scene, enemy_grid, collectible_grid)
+        done = time.perf_counter()
+        if found != expected:
+            raise AssertionError(f"grid and brute force disagree with {count} sprites")
+        move_ms = (moved - start) * 1000
+        brute_times.append(move_ms + (checked - moved) * 1000)
+        grid_times.append(move_ms + (done - checked) * 1000)
+        hit_counts.append(sum(map(len, found)))
+        scene.fire_again(found)
+    return statistics.median(brute_times), statistics.median(grid_times), statistics.mean(hit_counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test collision checks with many sprites.")
+    parser.add_argument('--counts', type=int, nargs='+', default=[500, 1000, 2000, 5000, 10000])
+    parser.add_argument('--frames', type=int, default=120)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'sprites':>8}{'brute ms':>11}{'grid ms':>10}{'speed-up':>10}{'hits':>8}  grid at 60 FPS")
+    for count in args.counts:
+        brute_ms, grid_ms, hits = run(count, args.frames, args.seed)
+        verdict = "ok" if grid_ms < FRAME_BUDGET_MS else "over budget"
+        print(f"{count:>8}{brute_ms:>11.2f}{grid_ms:>10.2f}{brute_ms / grid_ms:>9.1f}x{hits:>8.0f}  {verdict}")
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
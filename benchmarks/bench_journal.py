@@ -0,0 +1,65 @@
+"""Benchmark add/edit latency of FlashcardManager with and without the journal.
+
+Usage: python benchmarks/bench_journal.py [max_cards]
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+import flashcards
+
+SIZES = [1000, 10000, 100000, 1000000]
+OPERATIONS = 200
+# Full rewrites get very slow, so only time them on the smaller decks
+REWRITE_LIMIT = 10000
+
+
+def write_deck(filename, size):
+    """Write a deck of synthetic flashcards straight to disk."""
+    with open(filename, 'w') as f:
+        json.dump([{'question': f"Question {i}?", 'answer': f"Answer {i}", 'tags': f"tag{i % 50}"}
+                   for i in range(size)], f)
+
+
+def time_operations(manager, size):
+    """Return per-operation latencies in milliseconds for adds and edits."""
+    adds, edits = [], []
+    for i in range(OPERATIONS):
+        start = time.perf_counter()
+        manager.add_flashcard(f"New question {i}?", f"New answer {i}", "bench")
+        adds.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        manager.edit_flashcard(i * 7 % size + 1, f"Edited {i}?", f"Edited answer {i}", "bench")
+        edits.append((time.perf_counter() - start) * 1000)
+    return adds, edits
+
+
+def summary(latencies):
+    """Format the median and 99th percentile of a list of latencies."""
+    p99 = sorted(latencies)[int(len(latencies) * 0.99) - 1]
+    return f"median {statistics.median(latencies):8.3f} ms  p99 {p99:8.3f} ms"
+
+
+def main():
+    max_cards = int(sys.argv[1]) if len(sys.argv) > 1 else SIZES[-1]
+    for size in [s for s in SIZES if s <= max_cards]:
+        for journal in (True, False):
+            if not journal and size > REWRITE_LIMIT:
+                continue
+            with tempfile.TemporaryDirectory() as tmp:
+                filename = os.path.join(tmp, 'flashcards.json')
+                write_deck(filename, size)
+                manager = flashcards.FlashcardManager(filename, journal=journal)
+                adds, edits = time_operations(manager, size)
+                manager.close()
+            mode = "journal" if journal else "rewrite"
+            print(f"{size:>8} cards {mode:>8}  add: {summary(adds)}  edit: {summary(edits)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Benchmark FlashcardManager operations on synthetic decks from 1k to 1M cards.
+
+Each deck size runs in its own process, so peak memory is per size. Results
+are written as JSON, and can be saved as a baseline and compared against it
+later; any timing more than --threshold slower than the baseline is reported
+as a regression and the exit status is 1.
+
+Usage:
+    python benchmarks/bench_manager.py [--sizes 1000 10000] [--storage jsonl]
+        [--output results.json] [--save-baseline baseline.json] [--baseline baseline.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is then left out
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+import flashcards
+from _storage import STORAGE
+
+SIZES = [1000, 10000, 100000, 1000000]
+OPERATIONS = 100
+SYLLABLES = ["ka", "lo", "mi", "ne", "su", "ta", "ri", "po", "an", "el", "or", "is", "um", "ve", "dra", "sho", "qui", "bre"]
+
+
+class DeckGenerator:
+    """Makes cards with a Zipf-like spread of words and categories, like a real deck."""
+
+    def __init__(self, seed, words=5000, tags=200):
+        self.rng = random.Random(seed)
+        self.words = [self.make_word() for _ in range(words)]
+        # Cumulative weights, so random.choices does not add them up on every call
+        self.word_weights = list(itertools.accumulate(1 / rank for rank in range(1, words + 1)))
+        self.tags = [f"{self.make_word()}{i}" for i in range(tags)]
+        self.tag_weights = list(itertools.accumulate(1 / rank for rank in range(1, tags + 1)))
+
+    def make_word(self):
+        return "".join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(1, 4)))
+
+    def text(self, low, high):
+        return " ".join(self.rng.choices(self.words, cum_weights=self.word_weights, k=self.rng.randint(low, high)))
+
+    def card(self):
+        """Return (question, answer, tags) for one card."""
+        question = self.text(4, 14).capitalize() + "?"
+        answer = self.text(1, 30)
+        tags = ", ".join(set(self.rng.choices(self.tags, cum_weights=self.tag_weights, k=self.rng.randint(1, 3))))
+        return question, answer, tags
+
+    def cards(self, count):
+        for _ in range(count):
+            yield self.card()
+
+
+def latencies(operation, arguments):
+    """Call the operation once for each argument and return the times in milliseconds."""
+    times = []
+    for argument in arguments:
+        start = time.perf_counter()
+        operation(argument)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def record(results, name, times):
+    """Store the median and 95th percentile of a list of latencies."""
+    times = sorted(times)
+    results[f"{name}_ms_median"] = statistics.median(times)
+    results[f"{name}_ms_p95"] = times[max(0, int(len(times) * 0.95) - 1)]
+
+
+def timed(function):
+    """Call the function and return (its result, the time taken in milliseconds)."""
+    start = time.perf_counter()
+    result = function()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def run_size(storage, size, operations, seed):
+    """Time every operation on one deck and return the results."""
+    extension, journal = STORAGE[storage]
+    generator = DeckGenerator(seed)
+    rng = random.Random(seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "flashcards" + extension)
+        manager = flashcards.FlashcardManager(filename, journal=journal)
+        # Generated in batches, the way the import tool does it
+        start = time.perf_counter()
+        for done in range(0, size, 50000):
+            manager.add_flashcards(generator.cards(min(50000, size - done)))
+        manager.save_flashcards()
+        results['generate_ms'] = (time.perf_counter() - start) * 1000
+        manager.close()
+
+        manager, results['load_ms'] = timed(lambda: flashcards.FlashcardManager(filename, journal=journal))
+        card_ids = manager.get_flashcard_ids()
+        # Different cards are edited and deleted, so no edit lands on a deleted card
+        chosen = rng.sample(card_ids, operations * 2)
+        edit_ids, delete_ids = chosen[:operations], chosen[operations:]
+
+        record(results, 'add', latencies(lambda card: manager.add_flashcard(*card), generator.cards(operations)))
+        record(results, 'edit', latencies(lambda card_id: manager.edit_flashcard(card_id, *generator.card()), edit_ids))
+        record(results, 'delete', latencies(manager.delete_flashcard, delete_ids))
+        record(results, 'random', latencies(lambda _: manager.get_random_flashcard(), range(operations)))
+        # The test-mode loop: start a session over the whole deck, then draw cards from it
+        session, results['session_start_ms'] = timed(manager.start_session)
+        record(results, 'draw', latencies(lambda _: next(session), range(operations)))
+        _, results['list_ms'] = timed(manager.get_flashcard_list)
+        manager.close()
+    results['peak_memory_mb'] = peak_memory_mb()
+    return results
+
+
+def run_child(storage, size, operations, seed):
+    """Run one deck size in a fresh interpreter and return its results."""
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", storage, str(size), str(operations), str(seed)],
+        check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Return (key, metric, old, new) for every timing that is slower than the baseline allows."""
+    regressions = []
+    for key, metrics in results.items():
+        for metric, new in metrics.items():
+            old = baseline.get(key, {}).get(metric)
+            # Memory is reported but not compared, it depends too much on the machine's allocator
+            if old is None or new is None or not (metric.endswith('_ms') or '_ms_' in metric):
+                continue
+            # Sub-millisecond timings jitter by more than the threshold, so small differences are ignored
+            if new > old * (1 + threshold) and new - old > min_delta:
+                regressions.append((key, metric, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FlashcardManager operations at scale.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--storage', choices=sorted(STORAGE), nargs='+', default=['jsonl'])
+    parser.add_argument('--operations', type=int, default=OPERATIONS, help="timed calls per operation")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against the results in this JSON file")
+    parser.add_argument('--save-baseline', help="write the results to this JSON file as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.2, help="slowdown reported as a regression (0.2 = 20%%)")
+    parser.add_argument('--min-delta', type=float, default=0.1, help="smallest slowdown in ms reported as a regression")
+    args = parser.parse_args()
+
+    results = {}
+    for storage in args.storage:
+        for size in args.sizes:
+            key = f"{storage}/{size}"
+            results[key] = run_child(storage, size, min(args.operations, size // 4), args.seed)
+            metrics = results[key]
+            print(f"{key:>16}  load {metrics['load_ms']:9.1f} ms  add {metrics['add_ms_median']:7.3f}"
+                  f"  edit {metrics['edit_ms_median']:7.3f}  delete {metrics['delete_ms_median']:7.3f}"
+                  f"  random {metrics['random_ms_median']:7.3f}  draw {metrics['draw_ms_median']:7.3f}"
+                  f"  list {metrics['list_ms']:9.1f} ms  peak {metrics['peak_memory_mb'] or 0:7.1f} MB")
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'results': results,
+    }
+    for filename in (args.output, args.save_baseline):
+        if filename:
+            with open(filename, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        for key, metric, old, new in regressions:
+            print(f"REGRESSION {key} {metric}: {old:.3f} -> {new:.3f} ({new / old - 1:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        storage, size, operations, seed = sys.argv[2], *map(int, sys.argv[3:6])
+        print(json.dumps(run_size(storage, size, operations, seed)))
+    else:
+        sys.exit(main())
@@ -0,0 +1,88 @@
+"""Report the memory used per flashcard, before and after the compact representation.
+
+"Before" is a copy of the original dict-based classes; "after" is the current
+EditableFlashcard, alone and held by JsonStorage.
+
+Usage: python benchmarks/bench_memory.py [cards]
+"""
+import os
+import random
+import sys
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+import flashcards
+
+WORDS = [''.join(random.Random(i).choices('abcdefghijklmnopqrstuvwxyz', k=random.Random(i).randint(3, 9)))
+         for i in range(5000)]
+TAGS = ["maths", "science", "history", "geography", "french", "biology, exam", "chemistry, exam"]
+
+
+class LegacyFlashcard:
+    """The original Flashcard, with a __dict__ per instance."""
+    def __init__(self, question, answer):
+        self.__question = question
+        self.__answer = answer
+
+
+class LegacyTaggable:
+    def __init__(self, tags=""):
+        self.tags = tags
+
+
+class LegacyEditableFlashcard(LegacyFlashcard, LegacyTaggable):
+    def __init__(self, question, answer, tags):
+        LegacyFlashcard.__init__(self, question, answer)
+        LegacyTaggable.__init__(self, tags)
+
+
+def card_text(rng):
+    """Return a random (question, answer, tags) triple."""
+    question = ' '.join(rng.choices(WORDS, k=rng.randint(5, 12))) + '?'
+    answer = ' '.join(rng.choices(WORDS, k=rng.randint(1, 6)))
+    # Tags arrive as fresh strings, as they do when read from a file
+    tags = ''.join(list(rng.choice(TAGS)))
+    return question, answer, tags
+
+
+def measure(build, count):
+    """Return the bytes allocated per card by build(count)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build(count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / count
+
+
+def legacy_cards(count):
+    rng = random.Random(0)
+    return [LegacyEditableFlashcard(*card_text(rng)) for _ in range(count)]
+
+
+def compact_cards(count):
+    rng = random.Random(0)
+    return [flashcards.EditableFlashcard(*card_text(rng), card_id) for card_id in range(1, count + 1)]
+
+
+def compact_storage(count):
+    rng = random.Random(0)
+    storage = flashcards.JsonStorage(os.devnull)
+    for card_id in range(1, count + 1):
+        storage.insert(flashcards.EditableFlashcard(*card_text(rng), card_id))
+    return storage
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{count} cards")
+    for name, build in [("before: dict-based cards", legacy_cards),
+                        ("after: slotted cards", compact_cards),
+                        ("after: cards in JsonStorage", compact_storage)]:
+        print(f"{name:<30} {measure(build, count):8.0f} bytes/card")
+
+
+if __name__ == "__main__":
+    main()
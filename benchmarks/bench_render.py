@@ -0,0 +1,145 @@
+"""Profile drawing frames of Question-2.py.
+
+A seeded game is played by the same bot as bench_simulation.py, drawing
+every step onto SDL's dummy display.
+
+The HUD (score, health, lives and level) is drawn two ways on the same
+frames: rendering all four lines with the font every frame, as the game used
+to, and through Hud, which renders a line only when its value changes. The
+HUD cost is reported separately for frames where a value changed and frames
+where nothing did.
+
+Then the same game is drawn by a Renderer that redraws the whole screen
+every frame and by one that redraws only the dirty rectangles, each playing
+its own copy of the seeded game. Every frame must come out identical. The
+time to draw a frame, the pixels drawn and sent to the display per frame,
+and how many frames fell back to a full redraw are reported. --shots fires
+more projectiles each step, though projectiles are small and even 40 a shot
+rarely change half the screen. Two last runs add to the game: one sends a
+stream of projectiles straight through the HUD, where the text has to be
+drawn again over whatever moved under it, and one sends an enemy across the
+top half of the screen every step. Enemies are big, so once a few dozen are
+moving, more than FULL_REDRAW_AREA changes each frame and the dirty renderer
+falls back to redrawing the whole screen.
+
+Usage: python benchmarks/bench_render.py [--steps 3000] [--seed 1] [--shots 1 40]
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from _game import load_game
+from bench_simulation import make_bot
+
+question2 = load_game()
+pygame = question2.pygame
+
+
+def draw_hud_every_frame(surface, state):
+    """Draw the HUD as game() used to, rendering every line every frame."""
+    font = question2.font
+    black = question2.BLACK
+    surface.blit(font.render(f"Score: {state.score}", True, black), (10, 10))
+    surface.blit(font.render(f"Health: {state.player.health}", True, black), (10, 40))
+    surface.blit(font.render(f"Lives: {state.player.lives}", True, black), (10, 70))
+    surface.blit(font.render(f"Level: {state.level}", True, black), (10, 100))
+
+
+def hud_values(state):
+    return state.score, state.player.health, state.player.lives, state.level
+
+
+def run(steps, seed):
+    """Return {name: [µs per frame]} for the HUD each way, split by whether a value changed."""
+    screen = question2.open_window()
+    state = question2.GameState(seed)
+    bot = make_bot(6, 120)
+    hud = question2.Hud()
+    times = {'every frame': [], 'hud changed': [], 'hud unchanged': []}
+    previous = None
+    while state.steps < steps and state.result is None:
+        state.step(bot(state))
+        screen.fill(question2.WHITE)
+        state.all_sprites.draw(screen)
+
+        start = time.perf_counter()
+        draw_hud_every_frame(screen, state)
+        rendered = time.perf_counter()
+        hud.draw(screen, state)
+        cached = time.perf_counter()
+
+        values = hud_values(state)
+        times['every frame'].append((rendered - start) * 1e6)
+        times['hud changed' if values != previous else 'hud unchanged'].append((cached - rendered) * 1e6)
+        previous = values
+    return times
+
+
+def compare_renderers(steps, seed, shots, extra=None):
+    """Return {name: (ms per frame, pixels per frame, full redraws, frames)}, checking both draw the same frames.
+
+    With extra='hud', a projectile is also fired across the HUD every step; with extra='crowd', an enemy
+    is sent across the top half of the screen.
+    """
+    size = (question2.SCREEN_WIDTH, question2.SCREEN_HEIGHT)
+    question2.open_window()
+    bot = make_bot(6, 120)
+    games = {}
+    for name, dirty in (('full', False), ('dirty', True)):
+        surface = pygame.Surface(size).convert()
+        games[name] = (question2.GameState(seed), question2.Renderer(surface, dirty), surface, [])
+    for step in range(steps):
+        for state, renderer, surface, times in games.values():
+            controls = bot(state)
+            controls.shoot *= shots
+            state.step(controls)
+            if extra == 'hud':
+                projectile = question2.projectile_pool.get(0, 15 + step * 7 % 110)
+                state.all_sprites.add(projectile)
+                state.projectiles.add(projectile)
+            elif extra == 'crowd':
+                # Above the player, so the crowd does not end the game
+                enemy = question2.enemy_pool.get(question2.SCREEN_WIDTH + 40, 60 + step * 37 % 400)
+                state.all_sprites.add(enemy)
+                state.enemies.add(enemy)
+            start = time.perf_counter()
+            renderer.draw(state)
+            times.append((time.perf_counter() - start) * 1000)
+        frames = [pygame.image.tobytes(surface, "RGB") for _, _, surface, _ in games.values()]
+        if frames[0] != frames[1]:
+            raise AssertionError(f"dirty rectangles drew a different frame at step {step}")
+        if any(state.result is not None for state, _, _, _ in games.values()):
+            break
+    return {name: (statistics.median(times), renderer.pixels / renderer.frames, renderer.full_frames, renderer.frames)
+            for name, (_, renderer, _, times) in games.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile drawing the game's frames.")
+    parser.add_argument('--steps', type=int, default=3000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--shots', type=int, nargs='+', default=[1, 40], help="projectiles fired with each shot")
+    args = parser.parse_args()
+
+    times = run(args.steps, args.seed)
+    print(f"{'HUD':>14}{'frames':>8}{'median µs':>11}{'mean µs':>10}")
+    for name, values in times.items():
+        if values:
+            print(f"{name:>14}{len(values):>8}{statistics.median(values):>11.1f}{statistics.mean(values):>10.1f}")
+    print()
+    print(f"{'shots':>8}{'renderer':>10}{'median ms':>11}{'pixels':>11}{'fill rate':>11}{'full redraws':>14}")
+    runs = [(shots, None) for shots in args.shots] + [(1, 'hud'), (1, 'crowd')]
+    for shots, extra in runs:
+        results = compare_renderers(args.steps, args.seed, shots, extra)
+        full_pixels = results['full'][1]
+        label = f"{shots}+{extra}" if extra else str(shots)
+        for name, (frame_ms, pixels, full_frames, frames) in results.items():
+            print(f"{label:>8}{name:>10}{frame_ms:>11.3f}{pixels:>11,.0f}{pixels / full_pixels:>10.1%}"
+                  f"{full_frames:>8} of {frames}")
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
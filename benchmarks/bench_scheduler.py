@@ -0,0 +1,65 @@
+"""Benchmark the spaced repetition scheduler with simulated review streams.
+
+Usage: python benchmarks/bench_scheduler.py [max_cards]
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+import flashcards
+
+SIZES = [1000, 10000, 100000, 1000000]
+# Share of the deck that has been reviewed before the simulation starts
+REVIEWED_SHARE = 0.3
+DAYS = 30
+REVIEWS_PER_DAY = 500
+# Chance of answering a card correctly
+RECALL = 0.85
+
+
+def write_history(filename, size, now):
+    """Write review states for part of the deck, due over the coming month."""
+    day = flashcards.ReviewScheduler.DAY
+    with open(filename, 'w') as f:
+        for card_id in random.sample(range(1, size + 1), int(size * REVIEWED_SHARE)):
+            interval = random.choice([1, 6, 15, 38])
+            due = now + random.uniform(-2, interval) * day
+            f.write(json.dumps([card_id, random.uniform(1.3, 2.8), interval, random.randint(1, 5), due]) + '\n')
+
+
+def main():
+    max_cards = int(sys.argv[1]) if len(sys.argv) > 1 else SIZES[-1]
+    random.seed(1)
+    for size in [s for s in SIZES if s <= max_cards]:
+        with tempfile.TemporaryDirectory() as tmp:
+            now = time.time()
+            filename = os.path.join(tmp, 'flashcards.json.schedule')
+            write_history(filename, size, now)
+            scheduler = flashcards.ReviewScheduler(filename)
+            start = time.perf_counter()
+            scheduler.load(range(1, size + 1))
+            load_time = time.perf_counter() - start
+            latencies = []
+            for day in range(DAYS):
+                now += scheduler.DAY
+                for _ in range(REVIEWS_PER_DAY):
+                    start = time.perf_counter()
+                    card_id = scheduler.next_due(now)
+                    if card_id is None:
+                        break
+                    scheduler.review(card_id, random.random() < RECALL, now)
+                    latencies.append((time.perf_counter() - start) * 1000)
+            scheduler.close()
+        p99 = sorted(latencies)[int(len(latencies) * 0.99) - 1]
+        print(f"{size:>8} cards  load {load_time * 1000:9.1f} ms  "
+              f"next due + review: median {statistics.median(latencies):.3f} ms  p99 {p99:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Run headless playtests of Question-2.py as fast as the CPU allows.
+
+Each game is simulated with simulate(), without opening a window, by a
+simple bot that fires every few steps and jumps when an enemy gets close.
+Every seed is played twice to check that a seeded game always plays out the
+same way. The results show how the game balances for that bot (how often
+it wins, at what score) and how many steps are simulated per second.
+
+Usage:
+    python benchmarks/bench_simulation.py [--seeds 10] [--steps 20000]
+        [--fire-every 3 6 12] [--jump-distance 120]
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from _game import load_game
+
+question2 = load_game()
+
+
+def make_bot(fire_every, jump_distance):
+    """Return a policy that fires every fire_every steps and jumps over enemies within jump_distance."""
+    def bot(state):
+        player = state.player
+        near = any(0 < enemy.rect.left - player.rect.right < jump_distance for enemy in state.enemies)
+        return question2.Controls(jump=near, shoot=1 if state.steps % fire_every == 0 else 0)
+    return bot
+
+
+def play(seed, steps, bot):
+    """Return ((result, steps, score, level, lives), seconds) for one headless game."""
+    start = time.perf_counter()
+    state = question2.simulate(steps, seed, bot)
+    elapsed = time.perf_counter() - start
+    return (state.result, state.steps, state.score, state.level, state.player.lives), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run headless playtests of the game.")
+    parser.add_argument('--seeds', type=int, default=10)
+    parser.add_argument('--steps', type=int, default=20000, help="most steps in one game")
+    parser.add_argument('--fire-every', type=int, nargs='+', default=[3, 6, 12], help="steps between shots")
+    parser.add_argument('--jump-distance', type=int, default=120)
+    args = parser.parse_args()
+
+    print(f"{'fire every':>10}{'won':>6}{'lost':>6}{'unfinished':>12}{'score':>8}{'steps':>8}{'steps/s':>10}")
+    failed = False
+    for fire_every in args.fire_every:
+        bot = make_bot(fire_every, args.jump_distance)
+        outcomes, total_steps, total_time = [], 0, 0
+        for seed in range(args.seeds):
+            outcome, elapsed = play(seed, args.steps, bot)
+            again, _ = play(seed, args.steps, bot)
+            if again != outcome:
+                print(f"seed {seed} played out differently: {outcome} then {again}")
+                failed = True
+            outcomes.append(outcome)
+            total_steps += outcome[1]
+            total_time += elapsed
+        results = [outcome[0] for outcome in outcomes]
+        print(f"{fire_every:>10}{results.count('complete'):>6}{results.count('over'):>6}{results.count(None):>12}"
+              f"{statistics.mean(outcome[2] for outcome in outcomes):>8.0f}"
+              f"{statistics.mean(outcome[1] for outcome in outcomes):>8.0f}{total_steps / total_time:>10.0f}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
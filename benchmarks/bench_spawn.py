@@ -0,0 +1,142 @@
+"""Benchmark spawning sprites in Question-2.py under sustained fire.
+
+Every frame the player fires a burst of projectiles, and enemies and
+collectibles appear every few frames; everything moves until it leaves the
+screen and is killed. This runs three ways:
+
+    before  each spawn allocates a new surface, and enemies scale the full-size image
+    cached  each spawn makes a new sprite, but shares images from the asset cache
+    pooled  sprites come from the pools, as the game does now
+
+For each way the time spent spawning, the time per frame (spawning and
+moving), how many sprites were made new and how many garbage collections ran
+are reported. Runs without a window, on SDL's dummy video driver.
+
+Usage: python benchmarks/bench_spawn.py [--frames 2000] [--burst 10]
+"""
+import argparse
+import gc
+import statistics
+import sys
+import time
+
+from _game import load_game
+
+question2 = load_game()
+pygame = question2.pygame
+
+
+# The sprites as they were made before the asset cache and pools
+class OldProjectile(question2.Projectile):
+    pool = None
+
+    def reset(self, x, y):
+        super().reset(x, y)
+        self.image = pygame.Surface((10, 5))
+        self.image.fill((255, 0, 0))
+
+
+class OldEnemy(question2.Enemy):
+    pool = None
+
+    def reset(self, *args):
+        super().reset(*args)
+        self.image = pygame.transform.scale(question2.get_image(question2.ENEMY_IMAGE), (80, 100))
+
+
+class OldCollectible(question2.Collectible):
+    pool = None
+
+    def reset(self, *args):
+        super().reset(*args)
+        self.image = pygame.Surface((20, 20))
+        self.image.fill((0, 255, 0))
+
+
+# The cached images, without the pools
+class CachedProjectile(question2.Projectile):
+    pool = None
+
+
+class CachedEnemy(question2.Enemy):
+    pool = None
+
+
+class CachedCollectible(question2.Collectible):
+    pool = None
+
+
+WAYS = {
+    'before': (OldProjectile, OldEnemy, OldCollectible),
+    'cached': (CachedProjectile, CachedEnemy, CachedCollectible),
+    'pooled': (question2.projectile_pool.get, question2.enemy_pool.get, question2.collectible_pool.get),
+}
+
+
+def run(way, frames, burst):
+    """Return (spawn µs per sprite, median frame ms, sprites made new, sprites spawned, gc collections)."""
+    make_projectile, make_enemy, make_collectible = WAYS[way]
+    for pool in (question2.projectile_pool, question2.enemy_pool, question2.collectible_pool):
+        pool.free.clear()
+        pool.created = pool.reused = 0
+    all_sprites = pygame.sprite.Group()
+    collections = [0]
+
+    def count_collections(phase, info):
+        if phase == "start":
+            collections[0] += 1
+
+    gc.collect()
+    gc.callbacks.append(count_collections)
+    spawn_time = 0
+    spawned = 0
+    frame_times = []
+    try:
+        for frame in range(frames):
+            start = time.perf_counter()
+            for shot in range(burst):
+                all_sprites.add(make_projectile(100, 400 + shot * 40))
+            spawned += burst
+            if frame % 5 == 0:
+                # Fast enemies, so they leave the screen about as often as they are shot down in the game
+                all_sprites.add(make_enemy(question2.SCREEN_WIDTH + 40, 700, 8, 50))
+                spawned += 1
+            if frame % 30 == 0:
+                all_sprites.add(make_collectible(500, 900, "health"))
+                spawned += 1
+            spawned_at = time.perf_counter()
+            all_sprites.update()
+            for sprite in all_sprites:
+                # Collectibles do not move, so they are picked up after a while
+                if isinstance(sprite, question2.Collectible) and frame % 30 == 29:
+                    sprite.kill()
+            done = time.perf_counter()
+            spawn_time += spawned_at - start
+            frame_times.append((done - start) * 1000)
+    finally:
+        gc.callbacks.remove(count_collections)
+    if way == 'pooled':
+        created = sum(pool.created for pool in (question2.projectile_pool, question2.enemy_pool,
+                                                question2.collectible_pool))
+    else:
+        created = spawned
+    return spawn_time / spawned * 1e6, statistics.median(frame_times), created, spawned, collections[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark spawning sprites under sustained fire.")
+    parser.add_argument('--frames', type=int, default=2000)
+    parser.add_argument('--burst', type=int, default=10, help="projectiles fired each frame")
+    parser.add_argument('--ways', choices=sorted(WAYS), nargs='+', default=['before', 'cached', 'pooled'])
+    args = parser.parse_args()
+
+    print(f"{'':>8}{'spawn µs':>10}{'frame ms':>10}{'made new':>10}{'spawned':>9}{'gc runs':>9}")
+    for way in args.ways:
+        spawn_us, frame_ms, created, spawned, collections = run(way, args.frames, args.burst)
+        print(f"{way:>8}{spawn_us:>10.2f}{frame_ms:>10.3f}{created:>10}{spawned:>9}{collections:>9}")
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
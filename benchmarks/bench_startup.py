@@ -0,0 +1,97 @@
+"""Benchmark start-up: cold import of the core and the app, and time until the first window is drawn.
+
+Each measurement runs in a fresh interpreter, so nothing is already imported or cached.
+Time-to-first-window needs a display and is skipped without one.
+
+Usage: python benchmarks/bench_startup.py [deck_size]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+sys.path.insert(0, ROOT)
+import flashcards
+
+RUNS = 7
+
+IMPORTS = {
+    'python only': "pass",
+    'flashcards (core)': "import flashcards",
+    'Question-1.py (app)': (
+        "import importlib.util\n"
+        "spec = importlib.util.spec_from_file_location('question1', 'Question-1.py')\n"
+        "spec.loader.exec_module(importlib.util.module_from_spec(spec))"),
+}
+
+
+# Opens the app on the deck in the working directory and stops once the first frame is drawn
+FIRST_WINDOW = (
+    "import importlib.util, os, sys, time\n"
+    "sys.path.insert(0, {root!r})\n"
+    "spec = importlib.util.spec_from_file_location('question1', os.path.join({root!r}, 'Question-1.py'))\n"
+    "question1 = importlib.util.module_from_spec(spec)\n"
+    "spec.loader.exec_module(question1)\n"
+    "try:\n"
+    "    root = question1.load_tkinter().Tk()\n"
+    "except question1.tk.TclError:\n"
+    "    sys.exit(3)\n"
+    "app = question1.FlashcardApp(root)\n"
+    "root.update()\n"
+    "print('drawn', flush=True)\n"
+    "root.destroy()\n"
+    "app.catalog.close()\n")
+
+
+def run(code, cwd=ROOT):
+    """Return the wall time to start python, run the code and exit, or None if it failed."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True)
+    elapsed = time.perf_counter() - start
+    return elapsed if result.returncode == 0 else None
+
+
+def median_ms(code, cwd=ROOT):
+    times = [run(code, cwd) for _ in range(RUNS)]
+    if None in times:
+        return None
+    return statistics.median(times) * 1000
+
+
+def make_deck(directory, size):
+    """Write a deck of the given size in the directory, in the format the app opens."""
+    cards_filename = os.path.join(directory, "cards.jsonl")
+    with open(cards_filename, "w") as f:
+        for i in range(size):
+            f.write(f'{{"question": "Question {i}?", "answer": "Answer {i}", "tags": "tag{i % 20}"}}\n')
+    manager = flashcards.FlashcardManager(os.path.join(directory, "flashcards.jsonl"))
+    flashcards.import_cards(manager, cards_filename)
+    manager.save_flashcards()
+    manager.close()
+
+
+def main():
+    deck_size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{'cold import':<28}{'median ms':>10}")
+    for name, code in IMPORTS.items():
+        print(f"{name:<28}{median_ms(code):>10.1f}")
+
+    print(f"\n{'first window':<28}{'median ms':>10}")
+    for size in (0, deck_size):
+        with tempfile.TemporaryDirectory() as directory:
+            if size:
+                make_deck(directory, size)
+            elapsed = median_ms(FIRST_WINDOW.format(root=os.path.abspath(ROOT)), directory)
+        label = f"{size} cards"
+        if elapsed is None:
+            print(f"{label:<28}{'skipped (no display)':>10}")
+        else:
+            print(f"{label:<28}{elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark the high-density wave mode of Question-2.py.
+
+A seeded WaveState is played on SDL's dummy display by a bot that keeps
+firing. The player is given more lives than the waves can take, so the
+screen fills up and stays full. Each step is simulated and the whole frame
+drawn, as play() does.
+
+For each wave size the following are reported:
+- entities alive (enemies waiting off screen included);
+- median and 95th percentile frame times (step plus draw);
+- whether the median holds 60 FPS.
+For comparison, the same number of enemies is also timed as sprites: one
+Enemy each, with the same small image, moved with Group.update() and drawn
+with Group.draw(), with no collision checks at all.
+
+Usage: python benchmarks/bench_waves.py [--wave-sizes 500 1000 2000 3000] [--steps 600] [--shots 2]
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from _game import FRAME_BUDGET_MS, load_game
+
+question2 = load_game()
+pygame = question2.pygame
+
+
+def run(wave_size, steps, shots, seed):
+    """Return (entity counts, frame ms) for each step of one game."""
+    screen = question2.open_window()
+    state = question2.WaveState(seed, wave_size)
+    state.player.lives = 10 ** 6 # Survives every wave, so the screen stays full
+    hud = question2.Hud()
+    counts, frame_times = [], []
+    while state.steps < steps and state.result is None:
+        start = time.perf_counter()
+        state.step(question2.Controls(shoot=shots))
+        state.draw(screen, hud)
+        frame_times.append((time.perf_counter() - start) * 1000)
+        counts.append(len(state.swarm))
+    return counts, frame_times
+
+
+def sprite_frame_ms(count, frames=20):
+    """Return the median ms to move and draw count enemy sprites the usual way, without checking collisions."""
+    screen = question2.open_window()
+    image = question2.get_image(question2.ENEMY_IMAGE, question2.SWARM_SIZES[question2.SWARM_ENEMY])
+    sprites = pygame.sprite.Group()
+    for index in range(count):
+        enemy = question2.Enemy(index * 37 % question2.SCREEN_WIDTH, index * 53 % question2.SCREEN_HEIGHT)
+        enemy.image = image
+        enemy.rect = image.get_rect(center=enemy.rect.center)
+        sprites.add(enemy)
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        sprites.update()
+        screen.fill(question2.WHITE)
+        sprites.draw(screen)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    if question2.numpy is None:
+        print("the high-density wave mode needs NumPy")
+        return 1
+    parser = argparse.ArgumentParser(description="Benchmark the high-density wave mode.")
+    parser.add_argument('--wave-sizes', type=int, nargs='+', default=[500, 1000, 2000, 3000])
+    parser.add_argument('--steps', type=int, default=600)
+    parser.add_argument('--shots', type=int, default=2, help="shots fired each step")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'wave':>6}{'entities':>10}{'peak':>8}{'median ms':>11}{'p95 ms':>9}{'sprites ms':>12}  60 FPS")
+    for wave_size in args.wave_sizes:
+        counts, frame_times = run(wave_size, args.steps, args.shots, args.seed)
+        # Only the full part of the game, once the first waves have reached the player
+        counts, frame_times = counts[len(counts) // 3:], frame_times[len(frame_times) // 3:]
+        median_ms = statistics.median(frame_times)
+        p95_ms = statistics.quantiles(frame_times, n=20)[-1]
+        entities = int(statistics.median(counts))
+        verdict = "ok" if median_ms < FRAME_BUDGET_MS else "over budget"
+        print(f"{wave_size:>6}{entities:>10}{max(counts):>8}{median_ms:>11.2f}{p95_ms:>9.2f}"
+              f"{sprite_frame_ms(entities):>12.2f}  {verdict}")
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""Stress test several processes adding, editing and deleting cards in one deck at the same time.
+
+Each worker process works on its own cards (tagged with its number) and
+reports what they should end up as. Once every worker has finished, the deck
+is opened again and checked: every card a worker kept must be there with its
+last text, no deleted card may come back, and no two cards may share an id.
+The exit status is 1 if anything was lost.
+
+Usage:
+    python benchmarks/stress_concurrency.py [--processes 8] [--operations 200]
+        [--storage jsonl json journal sqlite] [--save-delay 0.05]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+import flashcards
+from _storage import STORAGE
+
+
+def run_worker(filename, journal, worker, operations, save_delay, seed):
+    """Make random changes to this worker's cards and return {card id: [question, answer] or None}."""
+    rng = random.Random(seed * 1000 + worker)
+    manager = flashcards.FlashcardManager(filename, journal=journal, save_delay=save_delay)
+    tag = f"worker{worker}"
+    expected = {}
+    alive = []
+    for step in range(operations):
+        action = rng.random()
+        if not alive or action < 0.5:
+            question = f"Worker {worker} card {step}?"
+            card_id = manager.add_flashcard(question, f"answer {step}", tag)
+            expected[card_id] = [question, f"answer {step}"]
+            alive.append(card_id)
+        elif action < 0.8:
+            card_id = rng.choice(alive)
+            question = f"Worker {worker} edit {step}?"
+            manager.edit_flashcard(card_id, question, f"edited {step}", tag)
+            expected[card_id] = [question, f"edited {step}"]
+        else:
+            card_id = alive.pop(rng.randrange(len(alive)))
+            manager.delete_flashcard(card_id)
+            expected[card_id] = None
+        # Pick up what the other workers did, as the app does while it is open
+        manager.sync()
+    manager.flush()
+    manager.close()
+    return expected
+
+
+def check(filename, journal, results):
+    """Return a list of problems with the deck, given what each worker expected."""
+    problems = []
+    manager = flashcards.FlashcardManager(filename, journal=journal)
+    cards = {}
+    for flashcard in manager.get_flashcards():
+        if flashcard.card_id in cards:
+            problems.append(f"card id {flashcard.card_id} is used twice")
+        cards[flashcard.card_id] = flashcard
+    manager.close()
+    owners = {}
+    for worker, expected in enumerate(results):
+        for card_id, texts in expected.items():
+            card_id = int(card_id)
+            if card_id in owners:
+                problems.append(f"card id {card_id} was handed to workers {owners[card_id]} and {worker}")
+            owners[card_id] = worker
+            flashcard = cards.get(card_id)
+            if texts is None:
+                if flashcard is not None:
+                    problems.append(f"card {card_id} of worker {worker} was deleted but is back")
+            elif flashcard is None:
+                problems.append(f"card {card_id} of worker {worker} was lost")
+            elif [flashcard.get_question(), flashcard.get_answer()] != texts:
+                problems.append(f"card {card_id} of worker {worker} is {flashcard.get_question()!r}, not {texts[0]!r}")
+    alive = sum(texts is not None for expected in results for texts in expected.values())
+    if len(cards) != alive:
+        problems.append(f"deck has {len(cards)} cards, the workers kept {alive}")
+    return problems
+
+
+def run(storage, processes, operations, save_delay, seed):
+    """Run the workers against a fresh deck and return (problems, seconds taken)."""
+    extension, journal = STORAGE[storage]
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "flashcards" + extension)
+        # Created up front, so the workers do not race to create it
+        flashcards.FlashcardManager(filename, journal=journal).close()
+        start = time.perf_counter()
+        children = [subprocess.Popen(
+            [sys.executable, __file__, "--child", filename, str(int(journal)), str(worker),
+             str(operations), str(save_delay), str(seed)], stdout=subprocess.PIPE, text=True)
+            for worker in range(processes)]
+        results = []
+        for child in children:
+            output, _ = child.communicate()
+            if child.returncode != 0:
+                return [f"a worker failed with exit status {child.returncode}"], 0
+            results.append(json.loads(output))
+        elapsed = time.perf_counter() - start
+        return check(filename, journal, results), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test concurrent writers to one deck.")
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--operations', type=int, default=200, help="changes made by each process")
+    parser.add_argument('--storage', choices=sorted(STORAGE), nargs='+', default=sorted(STORAGE))
+    parser.add_argument('--save-delay', type=float, default=0.0,
+                        help="seconds each process waits before writing its changes (0 = write straight away)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    failed = False
+    for storage in args.storage:
+        problems, elapsed = run(storage, args.processes, args.operations, args.save_delay, args.seed)
+        changes = args.processes * args.operations
+        if problems:
+            failed = True
+            print(f"{storage:>8}  FAILED with {len(problems)} problems")
+            for problem in problems[:20]:
+                print(f"          {problem}")
+        else:
+            print(f"{storage:>8}  ok  {changes} changes from {args.processes} processes in {elapsed:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        filename, journal, worker, operations, save_delay, seed = sys.argv[2:8]
+        expected = run_worker(filename, journal == "1", int(worker), int(operations),
+                              float(save_delay) or None, int(seed))
+        print(json.dumps(expected))
+    else:
+        sys.exit(main())
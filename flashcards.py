@@ -0,0 +1,2482 @@
+"""Flashcards, their storage, indexes and review schedule, without any user interface.
+
+Question-1.py builds the Tk app on top of this module; scripts and the
+command line tool (python flashcards.py import/export ...) use it directly.
+"""
+import random
+import json
+import os
+import time
+import heapq
+import collections
+import bisect
+import re
+import sqlite3
+import mmap
+import array
+import weakref
+import threading
+import contextlib
+import csv
+import itertools
+import argparse
+import functools
+import sys
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no fcntl; msvcrt locks a byte of the file instead
+    fcntl = None
+    import msvcrt
+
+class Flashcard:
+    """Class represents a Flashcard with a question and answer."""  
+    # Slots instead of a per-instance __dict__ keep big decks small in memory
+    __slots__ = ('__question', '__answer')
+
+    def __init__(self, question, answer):
+         # Encapsulation: attributes are private to this class
+        self.__question = question
+        self.__answer = answer
+
+    def get_question(self):
+        """Getter method for question."""
+        return self.__question
+
+    def get_answer(self):
+        """Getter method for answer."""
+        return self.__answer
+    
+
+    def __str__(self):
+        """Returns Q and A string."""
+        # polymorphism, can be overidden in EditableFlashcard
+        return f"Q: {self.__question} | A: {self.__answer}"
+
+def split_tags(tags):
+    """Split a category string into normalised tags (comma separated, case-insensitive)."""
+    result = []
+    for tag in tags.split(','):
+        tag = tag.strip().lower()
+        if tag and tag not in result:
+            result.append(tag)
+    return result
+
+def normalize_tags(tags):
+    """Return the normalised tags to look up, from a category string or a list of tags."""
+    if isinstance(tags, str):
+        return split_tags(tags)
+    # dict keeps the order while dropping repeats
+    return list(dict.fromkeys(tag.strip().lower() for tag in tags))
+
+class Taggable:
+    """Class that adds tagging capability to flashcards."""
+    # A mixin: the class using it provides the 'tags' slot, since two bases with slots cannot be combined
+    __slots__ = ()
+
+    def __new__(cls, *args, **kwargs):
+        # Used on its own, a Taggable is made as TagList, which has the slot to keep the tags in
+        return super().__new__(TagList if cls is Taggable else cls)
+
+    def __init__(self, tags=""):
+        # Many cards share the same tags, so keep one copy of each tag string
+        self.tags = sys.intern(tags)
+
+    def add_tag(self, tag):
+        """Add a tag to the comma separated tag string."""
+        if tag.strip().lower() not in split_tags(self.tags):
+            self.tags = sys.intern(f"{self.tags}, {tag.strip()}" if self.tags.strip() else tag.strip())
+
+    def remove_tag(self, tag):
+        """Remove a tag from the flashcard."""
+        tag = tag.strip().lower()
+        self.tags = sys.intern(", ".join(t.strip() for t in self.tags.split(',') if t.strip() and t.strip().lower() != tag))
+
+    def get_tag(self):
+        """Return the tag."""
+        return self.tags
+
+    def get_tags(self):
+        """Return the tags as a list."""
+        return split_tags(self.tags)
+
+class TagList(Taggable):
+    """A Taggable on its own, without a flashcard."""
+    __slots__ = ('tags',)
+
+# Inherits both Flashcard and Taggable classes (multiple inheritance)
+class EditableFlashcard(Flashcard, Taggable):
+    """Subclass of Flashcard and Taggable to allow editing and tagging."""
+    __slots__ = ('tags', 'card_id')
+
+    def __init__(self, question, answer, tags, card_id=None):
+        Flashcard.__init__(self, question, answer)
+        Taggable.__init__(self, tags)
+        # Stable id given by the storage backend
+        self.card_id = card_id
+
+    def edit(self, new_question, new_answer,new_tags):
+        # Method overiding
+        """This method overrides the preset flashcard question and answer."""
+        # Private attributes are name-mangled with the class that defined them
+        self._Flashcard__question = new_question
+        self._Flashcard__answer = new_answer
+        self.tags = sys.intern(new_tags)
+
+    def __str__(self):
+        # Polymorphism
+        """Overrides the Flashcard's __str__ method to include tags."""
+
+        return f"Q: {self.get_question()} | A: {self.get_answer()} | Tags: {self.get_tag()}"
+
+class LatencyStats:
+    """Latency histograms for named operations, for finding what is slow on big decks."""
+    # Bucket i counts calls taking between 2**i and 2**(i+1) microseconds; the last one takes everything slower
+    BUCKETS = 26
+    # Calls slower than one frame at 60 fps make the window stutter
+    FRAME_BUDGET = 1 / 60
+
+    def __init__(self):
+        # Off by default, so library users and scripts pay (almost) nothing
+        self.enabled = False
+        # The background writer records from its own thread
+        self.lock = threading.Lock()
+        # Dictionary of operation name -> [calls, total seconds, slowest, calls over the frame budget, histogram]
+        self.operations = {}
+
+    def record(self, name, seconds):
+        """Add one call of an operation."""
+        bucket = min(self.BUCKETS - 1, max(0, int(seconds * 1e6)).bit_length() - 1) if seconds >= 1e-6 else 0
+        with self.lock:
+            operation = self.operations.get(name)
+            if operation is None:
+                operation = self.operations[name] = [0, 0.0, 0.0, 0, [0] * self.BUCKETS]
+            operation[0] += 1
+            operation[1] += seconds
+            operation[2] = max(operation[2], seconds)
+            if seconds > self.FRAME_BUDGET:
+                operation[3] += 1
+            operation[4][bucket] += 1
+
+    def measure(self, name):
+        """Return a context manager that records how long its block takes."""
+        return Measurement(self, name)
+
+    def percentile(self, histogram, calls, fraction):
+        """Estimate a percentile in milliseconds, as the upper edge of the bucket it falls in."""
+        wanted = fraction * calls
+        seen = 0
+        for bucket, count in enumerate(histogram):
+            seen += count
+            if seen >= wanted:
+                return 2 ** (bucket + 1) / 1000
+        return 2 ** self.BUCKETS / 1000
+
+    def summary(self):
+        """Return the statistics for every operation, slowest total first, ready to be saved as JSON."""
+        with self.lock:
+            operations = {name: (calls, total, slowest, over, list(histogram))
+                          for name, (calls, total, slowest, over, histogram) in self.operations.items()}
+        result = {}
+        for name, (calls, total, slowest, over, histogram) in sorted(operations.items(), key=lambda item: -item[1][1]):
+            result[name] = {
+                'calls': calls,
+                'total_ms': total * 1000,
+                'mean_ms': total * 1000 / calls,
+                # Bucket edges can overshoot, but no percentile is above the slowest call
+                'p50_ms': min(self.percentile(histogram, calls, 0.5), slowest * 1000),
+                'p95_ms': min(self.percentile(histogram, calls, 0.95), slowest * 1000),
+                'p99_ms': min(self.percentile(histogram, calls, 0.99), slowest * 1000),
+                'max_ms': slowest * 1000,
+                'over_frame_budget': over,
+                # Upper edge of each bucket in milliseconds -> calls, leaving out empty buckets
+                'histogram': {f"{2 ** (bucket + 1) / 1000:g}": count for bucket, count in enumerate(histogram) if count},
+            }
+        return result
+
+    def dump(self, filename):
+        """Save the statistics to a JSON file."""
+        write_atomic(filename, {'frame_budget_ms': self.FRAME_BUDGET * 1000, 'operations': self.summary()})
+
+    def reset(self):
+        with self.lock:
+            self.operations = {}
+
+class Measurement:
+    """Times a with block for LatencyStats.measure."""
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter() if self.stats.enabled else None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            self.stats.record(self.name, time.perf_counter() - self.start)
+        return False
+
+# Shared by the whole program; the app turns it on, scripts can too
+stats = LatencyStats()
+
+def instrument(name):
+    """Decorator recording how long each call takes in the shared stats, when they are enabled."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not stats.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def write_atomic(filename, data):
+    """Write JSON data to a temporary file and swap it in, so the old file survives a crash."""
+    temp_filename = filename + '.tmp'
+    with stats.measure('serialize'):
+        text = json.dumps(data)
+    with stats.measure('io.write'):
+        with open(temp_filename, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, filename)
+
+def append_log(log_file, *records):
+    """Append JSON records to a log file and force them to disk."""
+    # One record per line, so a crash loses at most the record being written
+    with stats.measure('serialize'):
+        text = ''.join(json.dumps(record) + '\n' for record in records)
+    with stats.measure('io.write'):
+        log_file.write(text)
+        log_file.flush()
+        os.fsync(log_file.fileno())
+
+def read_log(filename, offset=0):
+    """Yield the records of a log file from an offset, dropping a partial record left by a crash."""
+    if not os.path.exists(filename):
+        return
+    good_size = offset
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            # A crash mid-write leaves a partial last line, which is discarded
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b'\n'):
+                break
+            good_size += len(line)
+            yield record
+    # Cut off any partial record so new records start on a clean line
+    if good_size != os.path.getsize(filename):
+        with open(filename, 'r+b') as f:
+            f.truncate(good_size)
+
+class FileLock:
+    """Advisory lock shared by every process using a deck, held on a file next to it.
+
+    The lock file also keeps the next free card id, so processes adding cards
+    at the same time never hand out the same id. Ids are reserved a block at
+    a time, so most adds do not touch the file at all.
+    """
+    BLOCK = 64
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+        # The lock is per process, so threads of this one share it through an ordinary lock
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        # Ids reserved by this process and not handed out yet
+        self.reserved = range(0)
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if self.depth == 0:
+            if self.file is None:
+                self.file = open(self.filename, 'a+b')
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self.depth -= 1
+        if self.depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.thread_lock.release()
+        return False
+
+    def allocate_id(self, minimum):
+        """Return a card id no process has used, and at least minimum."""
+        if not self.reserved or self.reserved[0] < minimum:
+            with self:
+                self.file.seek(0)
+                start = max(int(self.file.read() or 0), minimum)
+                self.file.seek(0)
+                self.file.truncate()
+                self.file.write(str(start + self.BLOCK).encode('ascii'))
+                self.file.flush()
+            self.reserved = range(start, start + self.BLOCK)
+        card_id = self.reserved[0]
+        self.reserved = self.reserved[1:]
+        return card_id
+
+    def close(self):
+        # Waits for other threads to let go of the lock first. Called from inside a with block,
+        # the file is left open: __exit__ still has to unlock it, and the next load uses it again
+        with self.thread_lock:
+            if self.file is not None and self.depth == 0:
+                self.file.close()
+                self.file = None
+
+def card_changes(old_cards, new_cards):
+    """Return (card id, old card, new card) for every card that differs between two id -> card maps."""
+    changes = []
+    for card_id in old_cards.keys() | new_cards.keys():
+        old = old_cards.get(card_id)
+        new = new_cards.get(card_id)
+        if old is None and new is None:
+            continue
+        if old is None or new is None or str(old) != str(new):
+            changes.append((card_id, old, new))
+    return changes
+
+class FlashcardStorage:
+    """Base class for the places flashcards can be kept."""
+    # Polymorphism: FlashcardManager works with any subclass through these methods
+    # True if find_question is answered from an index of the storage's own, so the manager
+    # does not have to read every card into one of its own
+    has_question_index = False
+    # True if find_tags and get_tags are answered by the storage, so the manager keeps no tag index
+    has_tag_index = False
+
+    def __init__(self):
+        # Guards the storage while a BackgroundWriter saves it from another thread
+        self.lock = threading.RLock()
+        # Changes waiting for the background writer or the end of a batch
+        self.pending = []
+        self.writer = None
+        self.batching = 0
+
+    def changed(self, change):
+        """Pass a change on to be written, straight away or by the background writer."""
+        if self.writer is None and not self.batching:
+            self.write_changes([change])
+            return
+        self.pending.append(change)
+        if self.writer is not None and not self.batching:
+            self.writer.notify()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Hold back writes until the end of the block, then write them all at once, or hand them to the background writer."""
+        # The lock is not held inside the block: the manager's callbacks run there, and may wait
+        # on a thread that needs the storage
+        with self.lock:
+            self.batching += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.batching -= 1
+                # With a background writer the whole batch is left to it, like any other change
+                if not self.batching and self.writer is not None:
+                    if self.pending:
+                        self.writer.notify()
+                elif not self.batching:
+                    self.flush()
+
+    def flush(self):
+        """Write any changes still waiting for the background writer."""
+        with self.lock:
+            changes, self.pending = self.pending, []
+            if changes:
+                self.write_changes(changes)
+
+    def write_changes(self, changes):
+        """Make a batch of changes durable on disk."""
+        raise NotImplementedError
+
+    def refresh(self):
+        """Pick up changes other processes have saved.
+
+        Returns (card id, old card, new card) for each changed card, with None
+        for a card that was added or deleted, or None if the file was rewritten
+        and anything may have changed.
+        """
+        return []
+
+    def load(self):
+        """Read existing flashcards, if any."""
+        raise NotImplementedError
+
+    def add(self, question, answer, tags):
+        """Store a new flashcard and return it with its id set."""
+        raise NotImplementedError
+
+    def update(self, card_id, question, answer, tags):
+        """Change a flashcard. Returns False if there is no such card."""
+        raise NotImplementedError
+
+    def delete(self, card_id):
+        """Remove a flashcard. Returns False if there is no such card."""
+        raise NotImplementedError
+
+    def get(self, card_id):
+        """Return the flashcard with the given id, or None."""
+        raise NotImplementedError
+
+    def iter_tags(self):
+        """Yield a (card id, tag) pair for every tag on every flashcard."""
+        raise NotImplementedError
+
+    def find_question(self, question):
+        """Return the ids of the flashcards asking the same question, ignoring case and spacing.
+
+        Only backends with has_question_index set need to provide this.
+        """
+        raise NotImplementedError
+
+    def find_tags(self, tags, match_all=False):
+        """Return the ids of flashcards with any (or all) of the given normalised tags.
+
+        Only backends with has_tag_index set need to provide this.
+        """
+        raise NotImplementedError
+
+    def get_tags(self):
+        """Return every tag in use, sorted. Only backends with has_tag_index set need to provide this."""
+        raise NotImplementedError
+
+    def random(self):
+        """Return a random flashcard, or None if there are none."""
+        raise NotImplementedError
+
+    def count(self):
+        """Return the number of flashcards."""
+        raise NotImplementedError
+
+    def iter_ids(self):
+        """Iterate over the ids of all flashcards."""
+        raise NotImplementedError
+
+    def __iter__(self):
+        """Iterate over all flashcards in the order they were added."""
+        raise NotImplementedError
+
+    def save(self):
+        """Write everything to disk."""
+
+    def close(self):
+        """Release any open files or connections."""
+
+class JsonStorage(FlashcardStorage):
+    """Keeps every flashcard in memory and rewrites a JSON file on each change."""
+
+    def __init__(self, filename='flashcards.json'):
+        super().__init__()
+        self.filename = filename
+        # Flashcards by id, for constant time lookups; kept in the order they were added
+        self.by_id = {}
+        # Card ids at 8 bytes each, for random picks. Deleted ids are skipped rather than
+        # removed, and the array is rebuilt once they make up half of it
+        self.ids = array.array('q')
+        # Ids are never reused, even after a card is deleted
+        self.next_id = 1
+        # Other programs may have the same file open; saves and new ids go through this lock
+        self.file_lock = FileLock(filename + '.lock')
+        # What the file looked like when last read or written, to notice saves by other processes
+        self.seen = None
+        # Changes by other processes found while saving, waiting to be handed out by refresh()
+        self.external = []
+
+    def load(self):
+        with self.lock, self.file_lock:
+            self.read_file()
+
+    def read_file(self):
+        """Read the file, replacing the in-memory flashcards."""
+        self.seen = self.signature()
+        data = {'flashcards': []}
+        if os.path.exists(self.filename):
+            with stats.measure('io.read'):
+                with open(self.filename, 'r') as f:
+                    text = f.read()
+            with stats.measure('deserialize'):
+                data = json.loads(text)
+            # Older files are just a list of cards without ids
+            if isinstance(data, list):
+                data = {'flashcards': data}
+        self.read_snapshot(data)
+
+    def signature(self):
+        """Return something that changes whenever the file is saved: its inode, mtime and size."""
+        try:
+            info = os.stat(self.filename)
+        except OSError:
+            return None
+        return (info.st_ino, info.st_mtime_ns, info.st_size)
+
+    def merge(self, unsaved):
+        """If another process has saved the file, reload it and put our unsaved changes back on top."""
+        if self.signature() == self.seen:
+            return
+        old_cards = dict(self.by_id)
+        next_id = self.next_id
+        self.read_file()
+        self.next_id = max(self.next_id, next_id)
+        for change in unsaved:
+            self.apply_change(change)
+        self.external.extend(card_changes(old_cards, self.by_id))
+
+    def refresh(self):
+        with self.lock:
+            # Checking the file's signature is enough when nobody else has saved
+            if self.signature() != self.seen:
+                with self.file_lock:
+                    self.merge(self.pending)
+            changes, self.external = self.external, []
+        return changes
+
+    def read_snapshot(self, data):
+        """Build the in-memory flashcards from loaded JSON data."""
+        self.by_id = {}
+        self.ids = array.array('q')
+        for item in data['flashcards']:
+            card_id = item.get('id', self.next_id)
+            self.insert(EditableFlashcard(item['question'], item['answer'], item['tags'], card_id))
+            self.next_id = max(self.next_id, card_id + 1)
+        self.next_id = max(self.next_id, data.get('next_id', 1))
+
+    def snapshot(self):
+        """Return all flashcards as JSON-ready data."""
+        return {'next_id': self.next_id, 'flashcards': [{
+            'id': fc.card_id,
+            'question': fc.get_question(), 
+            'answer': fc.get_answer(), 
+            'tags': fc.get_tag()
+        } for fc in self.by_id.values()]}
+
+    def insert(self, flashcard):
+        """Add a flashcard to the in-memory collection."""
+        # The id goes in first, so random never sees a card without one
+        self.ids.append(flashcard.card_id)
+        self.by_id[flashcard.card_id] = flashcard
+
+    def remove(self, card_id):
+        """Remove a flashcard from the in-memory collection."""
+        flashcard = self.by_id.pop(card_id, None)
+        if flashcard is None:
+            return False
+        # Halving the dead ids each time keeps the rebuilds to a constant cost per delete
+        if len(self.ids) >= 2 * len(self.by_id):
+            self.ids = array.array('q', self.by_id)
+        return True
+
+    def apply_change(self, change):
+        """Apply a change record to the in-memory flashcards. Applying one twice does no harm."""
+        card_id = change['id']
+        if change['op'] == 'delete':
+            self.remove(card_id)
+            return
+        self.next_id = max(self.next_id, card_id + 1)
+        flashcard = self.get(card_id)
+        if flashcard is not None:
+            flashcard.edit(change['question'], change['answer'], change['tags'])
+        # An edit to a card another process has deleted stays deleted
+        elif change['op'] == 'add':
+            self.insert(EditableFlashcard(change['question'], change['answer'], change['tags'], card_id))
+
+    def write_changes(self, changes):
+        # Plain JSON storage simply saves everything, however many changes there were
+        with self.lock:
+            self.pending[:0] = changes
+            self.save()
+
+    def add(self, question, answer, tags, card_id=None):
+        with self.lock:
+            if card_id is None:
+                card_id = self.file_lock.allocate_id(self.next_id)
+            self.next_id = max(self.next_id, card_id + 1)
+            flashcard = EditableFlashcard(question, answer, tags, card_id)
+            self.insert(flashcard)
+            self.changed({'op': 'add', 'id': card_id, 'question': question, 'answer': answer, 'tags': tags})
+        return flashcard
+
+    def update(self, card_id, question, answer, tags):
+        with self.lock:
+            flashcard = self.get(card_id)
+            if flashcard is None:
+                return False
+            flashcard.edit(question, answer, tags)
+            self.changed({'op': 'edit', 'id': card_id, 'question': question, 'answer': answer, 'tags': tags})
+        return True
+
+    def delete(self, card_id):
+        with self.lock:
+            if not self.remove(card_id):
+                return False
+            self.changed({'op': 'delete', 'id': card_id})
+        return True
+
+    def get(self, card_id):
+        return self.by_id.get(card_id)
+
+    def iter_tags(self):
+        for flashcard in list(self.by_id.values()):
+            for tag in flashcard.get_tags():
+                yield flashcard.card_id, tag
+
+    def random(self):
+        # At least half of the ids belong to cards, so this takes two tries on average
+        while self.by_id:
+            flashcard = self.by_id.get(random.choice(self.ids))
+            if flashcard is not None:
+                return flashcard
+        return None
+
+    def count(self):
+        return len(self.by_id)
+
+    def iter_ids(self):
+        return iter(list(self.by_id))
+
+    def __iter__(self):
+        return iter(list(self.by_id.values()))
+
+    def save(self):
+        with self.lock, self.file_lock:
+            # Merge by card rather than overwrite what other processes have saved
+            self.merge(self.pending)
+            write_atomic(self.filename, self.snapshot())
+            self.seen = self.signature()
+            self.pending = []
+
+    def close(self):
+        self.file_lock.close()
+
+# Inherits the in-memory behaviour of JsonStorage and only changes how changes reach the disk
+class JournalStorage(JsonStorage):
+    """JSON storage that appends each change to a log instead of rewriting the whole file."""
+
+    def __init__(self, filename='flashcards.json', journal_limit=1024 * 1024):
+        super().__init__(filename)
+        self.journal_filename = filename + '.log'
+        # Minimum log size (bytes) before it is folded back into the snapshot
+        self.journal_limit = journal_limit
+        # Sequence number of the last change written to disk, by any process
+        self.sequence = 0
+        self.journal_file = None
+        # How much of the log has been read; other processes' changes are read from here on
+        self.journal_offset = 0
+
+    def read_file(self):
+        super().read_file()
+        self.replay_journal()
+
+    def read_snapshot(self, data):
+        super().read_snapshot(data)
+        # Journal snapshots carry the sequence number of the last change they include
+        self.sequence = data.get('seq', 0)
+
+    def snapshot(self):
+        data = super().snapshot()
+        data['seq'] = self.sequence
+        return data
+
+    def merge(self, unsaved):
+        # A new snapshot means another process compacted the log, so everything is read again
+        if self.signature() != self.seen:
+            super().merge(unsaved)
+            return
+        if self.journal_size() <= self.journal_offset:
+            return
+        # Otherwise only the records other processes have appended since are read
+        old_cards = {}
+        for change in read_log(self.journal_filename, self.journal_offset):
+            card_id = change['id']
+            if card_id not in old_cards:
+                old = self.get(card_id)
+                # Edits change cards in place, so keep a copy of how it was
+                old_cards[card_id] = old and EditableFlashcard(old.get_question(), old.get_answer(), old.get_tag(), card_id)
+            self.apply_change(change)
+            self.sequence = max(self.sequence, change['seq'])
+        self.journal_offset = self.journal_size()
+        # Our own changes come after theirs
+        for change in unsaved:
+            self.apply_change(change)
+        self.external.extend(card_changes(old_cards, {card_id: self.get(card_id) for card_id in old_cards}))
+
+    def refresh(self):
+        with self.lock:
+            if self.signature() != self.seen or self.journal_size() > self.journal_offset:
+                with self.file_lock:
+                    self.merge(self.pending)
+            changes, self.external = self.external, []
+        return changes
+
+    def write_changes(self, changes):
+        with self.lock, self.file_lock:
+            self.merge(changes + self.pending)
+            # Sequence numbers are given out under the lock, so they are in log order across processes
+            for change in changes:
+                self.sequence += 1
+                change['seq'] = self.sequence
+            if self.journal_file is None:
+                self.journal_file = open(self.journal_filename, 'a', encoding='utf-8')
+            append_log(self.journal_file, *changes)
+            self.journal_offset = self.journal_size()
+            # Compact once the log outgrows the snapshot, keeping rewrites amortised O(1) per change
+            if self.journal_offset > max(self.journal_limit, self.snapshot_size()):
+                self.save()
+
+    def journal_size(self):
+        """Return the size in bytes of the log file."""
+        try:
+            return os.path.getsize(self.journal_filename)
+        except OSError:
+            return 0
+
+    def snapshot_size(self):
+        """Return the size in bytes of the snapshot file."""
+        try:
+            return os.path.getsize(self.filename)
+        except OSError:
+            return 0
+
+    def save(self):
+        """Write a fresh snapshot and empty the journal."""
+        with self.lock, self.file_lock:
+            self.merge(self.pending)
+            write_atomic(self.filename, self.snapshot())
+            self.seen = self.signature()
+            # Records up to self.sequence are now in the snapshot and are skipped on replay,
+            # so a crash before the truncate below is harmless
+            self.pending = []
+            self.close_journal()
+            open(self.journal_filename, 'w').close()
+            self.journal_offset = 0
+
+    def replay_journal(self):
+        """Apply journal records newer than the snapshot."""
+        for change in read_log(self.journal_filename):
+            if change['seq'] > self.sequence:
+                self.apply_change(change)
+                self.sequence = change['seq']
+        self.journal_offset = self.journal_size()
+
+    def close_journal(self):
+        if self.journal_file is not None:
+            self.journal_file.close()
+            self.journal_file = None
+
+    def close(self):
+        self.close_journal()
+        super().close()
+
+class SQLiteStorage(FlashcardStorage):
+    """Keeps flashcards in a SQLite database and only loads the cards that are asked for."""
+    has_question_index = True
+    has_tag_index = True
+
+    def __init__(self, filename='flashcards.db'):
+        super().__init__()
+        self.filename = filename
+        self.connection = None
+        # Bumped by SQLite whenever another connection commits
+        self.data_version = None
+        # Number of cards, counted once and then kept up to date; None until it is needed
+        self.card_count = None
+
+    def load(self):
+        # The background writer commits from its own thread; self.lock keeps the two apart.
+        # Other processes are kept apart by SQLite's own locking, waiting while one of them writes
+        self.connection = sqlite3.connect(self.filename, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        # AUTOINCREMENT stops ids of deleted cards being handed out again
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS flashcards (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                tags TEXT NOT NULL DEFAULT ''
+            );
+            CREATE TABLE IF NOT EXISTS flashcard_tags (
+                tag TEXT NOT NULL,
+                card_id INTEGER NOT NULL REFERENCES flashcards (id) ON DELETE CASCADE,
+                PRIMARY KEY (tag, card_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS flashcard_tags_card ON flashcard_tags (card_id);
+        """)
+        self.add_question_key()
+        self.data_version = self.query_one("PRAGMA data_version")[0]
+
+    def add_question_key(self):
+        """Give the cards a column of normalised questions, indexed for spotting duplicates."""
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(flashcards)")]
+        if 'question_key' not in columns:
+            # A database from before the column: fill it in once, in SQL
+            self.connection.create_function('normalize_question', 1, normalize_question, deterministic=True)
+            with self.connection:
+                self.connection.execute("ALTER TABLE flashcards ADD COLUMN question_key TEXT NOT NULL DEFAULT ''")
+                self.connection.execute("UPDATE flashcards SET question_key = normalize_question(question)")
+                # Duplicates are found through the new column, so the index on the raw question is not used
+                self.connection.execute("DROP INDEX IF EXISTS flashcards_question")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS flashcards_question_key ON flashcards (question_key)")
+
+    def refresh(self):
+        # SQLite does not say which rows another process changed, only that something did
+        data_version = self.query_one("PRAGMA data_version")[0]
+        if data_version == self.data_version:
+            return []
+        self.data_version = data_version
+        self.card_count = None
+        return None
+
+    def make_flashcard(self, row):
+        """Turn a (id, question, answer, tags) row into a flashcard."""
+        if row is None:
+            return None
+        return EditableFlashcard(row[1], row[2], row[3], row[0])
+
+    def query(self, sql, params=()):
+        """Run a query and return all of its rows."""
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        """Run a query and return its first row, or None."""
+        with self.lock:
+            return self.connection.execute(sql, params).fetchone()
+
+    def add(self, question, answer, tags):
+        with self.lock, self.rollback_on_error():
+            cursor = self.connection.execute(
+                "INSERT INTO flashcards (question, answer, tags, question_key) VALUES (?, ?, ?, ?)",
+                (question, answer, tags, normalize_question(question)))
+            card_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO flashcard_tags (tag, card_id) VALUES (?, ?)", [(tag, card_id) for tag in split_tags(tags)])
+            if self.card_count is not None:
+                self.card_count += 1
+            self.changed({'op': 'add', 'id': card_id})
+        return EditableFlashcard(question, answer, tags, card_id)
+
+    def update(self, card_id, question, answer, tags):
+        with self.lock, self.rollback_on_error():
+            cursor = self.connection.execute(
+                "UPDATE flashcards SET question = ?, answer = ?, tags = ?, question_key = ? WHERE id = ?",
+                (question, answer, tags, normalize_question(question), card_id))
+            if cursor.rowcount == 0:
+                return False
+            self.connection.execute("DELETE FROM flashcard_tags WHERE card_id = ?", (card_id,))
+            self.connection.executemany(
+                "INSERT INTO flashcard_tags (tag, card_id) VALUES (?, ?)", [(tag, card_id) for tag in split_tags(tags)])
+            self.changed({'op': 'edit', 'id': card_id})
+        return True
+
+    def delete(self, card_id):
+        # The tag rows go with it through ON DELETE CASCADE
+        with self.lock, self.rollback_on_error():
+            cursor = self.connection.execute("DELETE FROM flashcards WHERE id = ?", (card_id,))
+            if cursor.rowcount == 0:
+                return False
+            if self.card_count is not None:
+                self.card_count -= 1
+            self.changed({'op': 'delete', 'id': card_id})
+        return True
+
+    @contextlib.contextmanager
+    def rollback_on_error(self):
+        """Undo the statements of a change that failed part way through."""
+        # Changes are committed later by write_changes, so a failed one must not be left behind for it
+        try:
+            yield
+        except sqlite3.Error:
+            self.connection.rollback()
+            # The rollback may have undone earlier adds and deletes too
+            self.card_count = None
+            raise
+
+    def write_changes(self, changes):
+        with self.lock, stats.measure('io.commit'):
+            self.connection.commit()
+
+    def get(self, card_id):
+        return self.make_flashcard(self.query_one(
+            "SELECT id, question, answer, tags FROM flashcards WHERE id = ?", (card_id,)))
+
+    def iter_tags(self):
+        # Read straight from the tag table without touching the card text
+        return iter(self.query("SELECT card_id, tag FROM flashcard_tags"))
+
+    def find_question(self, question):
+        return {row[0] for row in self.query(
+            "SELECT id FROM flashcards WHERE question_key = ?", (normalize_question(question),))}
+
+    def find_tags(self, tags, match_all=False):
+        if not tags:
+            return set()
+        placeholders = ", ".join("?" * len(tags))
+        if match_all:
+            # Each (tag, card id) pair is stored once, so a card has all the tags when it is counted once per tag
+            sql = (f"SELECT card_id FROM flashcard_tags WHERE tag IN ({placeholders}) "
+                   f"GROUP BY card_id HAVING COUNT(*) = {len(tags)}")
+        else:
+            sql = f"SELECT DISTINCT card_id FROM flashcard_tags WHERE tag IN ({placeholders})"
+        return {row[0] for row in self.query(sql, tags)}
+
+    def get_tags(self):
+        # The tag table's primary key starts with the tag, so this walks the index in order
+        return [row[0] for row in self.query("SELECT DISTINCT tag FROM flashcard_tags ORDER BY tag")]
+
+    def random(self):
+        # Two subqueries, so each end is read straight off the primary key instead of scanning the table
+        low, high = self.query_one("SELECT (SELECT MIN(id) FROM flashcards), (SELECT MAX(id) FROM flashcards)")
+        if low is None:
+            return None
+        # Probing random ids is an index lookup each time and stays uniform over the existing cards
+        for _ in range(10):
+            flashcard = self.get(random.randint(low, high))
+            if flashcard is not None:
+                return flashcard
+        # Lots of deleted ids: fall back to skipping a random number of rows
+        offset = random.randrange(self.count())
+        return self.make_flashcard(self.query_one(
+            "SELECT id, question, answer, tags FROM flashcards ORDER BY id LIMIT 1 OFFSET ?", (offset,)))
+
+    def count(self):
+        # COUNT(*) reads the whole table, so it is only run again after another process changed the deck
+        with self.lock:
+            if self.card_count is None:
+                self.card_count = self.connection.execute("SELECT COUNT(*) FROM flashcards").fetchone()[0]
+            return self.card_count
+
+    def iter_ids(self):
+        return (row[0] for row in self.query("SELECT id FROM flashcards ORDER BY id"))
+
+    def __iter__(self):
+        # Read a page at a time, so the lock is never held between pages
+        last_id = 0
+        while True:
+            rows = self.query("SELECT id, question, answer, tags FROM flashcards WHERE id > ? ORDER BY id LIMIT 1000", (last_id,))
+            if not rows:
+                return
+            for row in rows:
+                yield self.make_flashcard(row)
+            last_id = rows[-1][0]
+
+    def save(self):
+        self.flush()
+        self.write_changes([])
+
+    def close(self):
+        if self.connection is not None:
+            self.save()
+            self.connection.close()
+            self.connection = None
+
+class LazyJsonlStorage(FlashcardStorage):
+    """One line per card, memory-mapped, with cards only read when they are asked for.
+
+    The data file starts with a header line and holds one JSON line per card;
+    edits and deletes append a new line for the card. A binary index of
+    (id, offset) pairs, written whenever the file is compacted, is memory-mapped
+    too, so opening a deck does not depend on its size; only lines added since
+    the index was written are read on load.
+    """
+    FORMAT = 'flashcards-jsonl-1'
+    # Index file: generation, card count and indexed data size, then an (id, offset) pair per card, all 8 byte ints
+    INDEX_HEADER = 3 * 8
+    INDEX_RECORD = 2 * 8
+
+    def __init__(self, filename='flashcards.jsonl', compact_limit=10000):
+        super().__init__()
+        self.filename = filename
+        self.index_filename = filename + '.idx'
+        # Minimum number of appended lines before the file is compacted
+        self.compact_limit = compact_limit
+        self.data_file = None
+        self.data_map = None
+        self.data_size = 0
+        self.index_file = None
+        self.index_map = None
+        self.index_views = []
+        # Ids and line offsets from the index file, ascending by id
+        self.index_ids = ()
+        self.index_offsets = ()
+        # Lines appended since the index was written: card id -> offset of its latest line, or None if deleted
+        self.changes = {}
+        # Ids of cards added since the index was written, in order
+        self.new_ids = []
+        self.tail_lines = 0
+        self.live = 0
+        self.next_id = 1
+        # Other processes append and compact under this lock too
+        self.file_lock = FileLock(filename + '.lock')
+        # Changes read from lines other processes appended, for refresh(); None once the file was rewritten
+        self.external = []
+
+    def load(self):
+        with self.lock, self.file_lock:
+            self.close_files()
+            if not os.path.exists(self.filename):
+                self.migrate()
+            self.data_file = open(self.filename, 'ab')
+            self.data_size = self.data_file.tell()
+            self.map_data()
+            header_end = self.data_map.find(b'\n') + 1
+            header = json.loads(self.data_map[:header_end])
+            self.next_id = header['next_id']
+            self.changes = {}
+            self.new_ids = []
+            self.tail_lines = 0
+            # A missing or out of date index means every line has to be read, once
+            indexed_size = self.map_index(header['generation'])
+            rebuild = indexed_size is None
+            if rebuild:
+                indexed_size = header_end
+                self.live = 0
+            self.read_tail(indexed_size)
+            if rebuild or self.tail_lines > max(self.compact_limit, self.live):
+                self.compact()
+
+    def merge(self):
+        """Catch up with lines other processes have appended, or reload if one of them compacted the file."""
+        stat = os.stat(self.filename)
+        if stat.st_ino != os.fstat(self.data_file.fileno()).st_ino:
+            self.load()
+            # Every offset changed, so callers have to start again from the new file
+            self.external = None
+        elif stat.st_size > self.data_size:
+            offset = self.data_size
+            self.data_size = stat.st_size
+            self.map_data()
+            self.read_tail(offset, self.external)
+
+    def refresh(self):
+        with self.lock:
+            # Nothing to do if the file is the same one, at the size this process left it
+            stat = os.stat(self.filename)
+            if (self.external == [] and stat.st_size == self.data_size
+                    and stat.st_ino == os.fstat(self.data_file.fileno()).st_ino):
+                return []
+            with self.file_lock:
+                self.merge()
+            changes, self.external = self.external, []
+        return changes
+
+    def migrate(self):
+        """Create the data file, carrying over an old flashcards.json (and its journal) if there is one."""
+        legacy_filename = os.path.splitext(self.filename)[0] + '.json'
+        if not os.path.exists(legacy_filename) and not os.path.exists(legacy_filename + '.log'):
+            self.write_files([], 1)
+            return
+        legacy = JournalStorage(legacy_filename)
+        legacy.load()
+        # The old file keeps cards in the order they were added, which need not be id order
+        lines = ((fc.card_id, self.encode(fc.card_id, fc.get_question(), fc.get_answer(), fc.get_tag()))
+                 for fc in sorted(legacy, key=lambda fc: fc.card_id))
+        self.write_files(lines, legacy.next_id)
+        legacy.close()
+        if os.path.exists(legacy.file_lock.filename):
+            os.remove(legacy.file_lock.filename)
+        # Keep the old files as backups, and move the schedule and test session across
+        if os.path.exists(legacy_filename):
+            os.replace(legacy_filename, legacy_filename + '.bak')
+        if os.path.exists(legacy.journal_filename):
+            os.replace(legacy.journal_filename, legacy.journal_filename + '.bak')
+        for suffix in ('.schedule', '.session'):
+            if os.path.exists(legacy_filename + suffix) and not os.path.exists(self.filename + suffix):
+                os.replace(legacy_filename + suffix, self.filename + suffix)
+
+    def encode(self, card_id, question, answer, tags):
+        """Return the line for a card."""
+        return (json.dumps({'id': card_id, 'question': question, 'answer': answer, 'tags': tags}) + '\n').encode('utf-8')
+
+    def write_files(self, lines, next_id):
+        """Write a new data file and index from (card id, line) pairs in id order."""
+        generation = random.getrandbits(62)
+        header = (json.dumps({'format': self.FORMAT, 'generation': generation, 'next_id': next_id}) + '\n').encode('utf-8')
+        pairs = array.array('q')
+        offset = len(header)
+        with open(self.filename + '.tmp', 'wb') as f:
+            f.write(header)
+            for card_id, line in lines:
+                f.write(line)
+                pairs.append(card_id)
+                pairs.append(offset)
+                offset += len(line)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.index_filename + '.tmp', 'wb') as f:
+            array.array('q', [generation, len(pairs) // 2, offset]).tofile(f)
+            pairs.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # Files cannot be replaced while they are mapped on every platform
+        self.close_files()
+        # If a crash comes between these two, the generations differ and the index is rebuilt
+        os.replace(self.filename + '.tmp', self.filename)
+        os.replace(self.index_filename + '.tmp', self.index_filename)
+
+    def map_data(self):
+        """Memory-map the data file as it is now."""
+        if self.data_map is not None:
+            self.data_map.close()
+        with open(self.filename, 'rb') as f:
+            self.data_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def map_index(self, generation):
+        """Memory-map the index file. Returns the data size it covers, or None if it does not match."""
+        if not os.path.exists(self.index_filename):
+            return None
+        self.index_file = open(self.index_filename, 'rb')
+        # A file cut short by a crash or a full disk is rebuilt like an out of date one
+        size = os.fstat(self.index_file.fileno()).st_size
+        if size < self.INDEX_HEADER or (size - self.INDEX_HEADER) % self.INDEX_RECORD:
+            self.close_index()
+            return None
+        self.index_map = mmap.mmap(self.index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        numbers = memoryview(self.index_map).cast('q')
+        pairs = numbers[3:]
+        self.index_views = [numbers, pairs]
+        if (numbers[0] != generation or numbers[2] > self.data_size
+                or numbers[1] != (size - self.INDEX_HEADER) // self.INDEX_RECORD):
+            self.close_index()
+            return None
+        # Strided views over the index, so bisect can search the ids without copying them
+        self.index_ids = pairs[0::2]
+        self.index_offsets = pairs[1::2]
+        self.index_views += [self.index_ids, self.index_offsets]
+        self.live = numbers[1]
+        return numbers[2]
+
+    def read_tail(self, offset, changes=None):
+        """Apply the lines appended after the index was written, adding (id, old, new) to changes if given."""
+        while offset < len(self.data_map):
+            end = self.data_map.find(b'\n', offset)
+            # A crash mid-write leaves a partial last line, which is discarded
+            if end == -1:
+                break
+            try:
+                record = json.loads(self.data_map[offset:end])
+            except ValueError:
+                break
+            if changes is not None:
+                card_id = record['id']
+                new = None if record.get('deleted') else EditableFlashcard(
+                    record['question'], record['answer'], record['tags'], card_id)
+                changes.append((card_id, self.get(card_id), new))
+            self.apply(record, offset)
+            offset = end + 1
+        if offset != self.data_size:
+            self.data_file.truncate(offset)
+            self.data_size = offset
+            self.map_data()
+
+    def apply(self, record, offset):
+        """Record where a card's latest line is."""
+        card_id = record['id']
+        existed = self.locate(card_id) is not None
+        if record.get('deleted'):
+            self.changes[card_id] = None
+            if existed:
+                self.live -= 1
+        else:
+            # Ids are never reused, so an id seen for the first time is a new card
+            if card_id not in self.changes and self.in_index(card_id) is None:
+                self.new_ids.append(card_id)
+            self.changes[card_id] = offset
+            if not existed:
+                self.live += 1
+        self.next_id = max(self.next_id, card_id + 1)
+        self.tail_lines += 1
+
+    def in_index(self, card_id):
+        """Return the position of a card in the index file, or None."""
+        index = bisect.bisect_left(self.index_ids, card_id)
+        if index < len(self.index_ids) and self.index_ids[index] == card_id:
+            return index
+        return None
+
+    def locate(self, card_id):
+        """Return the offset of a card's latest line, or None if there is no such card."""
+        if card_id in self.changes:
+            return self.changes[card_id]
+        index = self.in_index(card_id)
+        return None if index is None else self.index_offsets[index]
+
+    def read(self, offset):
+        """Read and decode the line at an offset."""
+        # Lines appended since the file was mapped need a fresh map
+        if offset >= len(self.data_map):
+            self.map_data()
+        end = self.data_map.find(b'\n', offset)
+        with stats.measure('deserialize'):
+            return json.loads(self.data_map[offset:end])
+
+    def append(self, record):
+        """Append a line for a card; it is forced to disk by write_changes."""
+        offset = self.data_size
+        with stats.measure('serialize'):
+            line = (json.dumps(record) + '\n').encode('utf-8')
+        with stats.measure('io.write'):
+            self.data_file.write(line)
+            # Flushed so the line can be mapped and read back straight away
+            self.data_file.flush()
+        self.data_size += len(line)
+        self.apply(record, offset)
+        self.changed(record)
+
+    def write_changes(self, changes):
+        # One fsync covers every line appended since the last one
+        with stats.measure('io.fsync'):
+            os.fsync(self.data_file.fileno())
+        if self.tail_lines > max(self.compact_limit, self.live):
+            self.compact()
+
+    def add(self, question, answer, tags):
+        with self.lock, self.file_lock:
+            # Lines are appended under the file lock, so after catching up next_id is free in every process
+            self.merge()
+            card_id = self.next_id
+            self.append({'id': card_id, 'question': question, 'answer': answer, 'tags': tags})
+        return EditableFlashcard(question, answer, tags, card_id)
+
+    def update(self, card_id, question, answer, tags):
+        with self.lock, self.file_lock:
+            self.merge()
+            if self.locate(card_id) is None:
+                return False
+            self.append({'id': card_id, 'question': question, 'answer': answer, 'tags': tags})
+        return True
+
+    def delete(self, card_id):
+        with self.lock, self.file_lock:
+            self.merge()
+            if self.locate(card_id) is None:
+                return False
+            self.append({'id': card_id, 'deleted': True})
+        return True
+
+    def get(self, card_id):
+        # The background writer may be compacting, which swaps the maps underneath
+        with self.lock:
+            offset = self.locate(card_id)
+            if offset is None:
+                return None
+            item = self.read(offset)
+        return EditableFlashcard(item['question'], item['answer'], item['tags'], card_id)
+
+    def iter_tags(self):
+        for flashcard in self:
+            for tag in flashcard.get_tags():
+                yield flashcard.card_id, tag
+
+    def random(self):
+        with self.lock:
+            if not self.live:
+                return None
+            # Pick random slots until one holds a card that has not been deleted
+            slots = len(self.index_ids) + len(self.new_ids)
+            for _ in range(20):
+                slot = random.randrange(slots)
+                card_id = self.index_ids[slot] if slot < len(self.index_ids) else self.new_ids[slot - len(self.index_ids)]
+                flashcard = self.get(card_id)
+                if flashcard is not None:
+                    return flashcard
+            return self.get(random.choice(list(self.iter_ids())))
+
+    def count(self):
+        return self.live
+
+    def iter_ids(self):
+        # Listed under the lock, as a compaction would replace the index part way through
+        with self.lock:
+            changes = self.changes
+            card_ids = [card_id for card_id in self.index_ids
+                        if card_id not in changes or changes[card_id] is not None]
+            card_ids.extend(card_id for card_id in self.new_ids if changes.get(card_id) is not None)
+        return iter(card_ids)
+
+    def __iter__(self):
+        return (self.get(card_id) for card_id in self.iter_ids())
+
+    @instrument('io.compact')
+    def compact(self):
+        """Rewrite the file with only the latest line of each card, and a fresh index."""
+        def lines():
+            for card_id in self.iter_ids():
+                offset = self.locate(card_id)
+                if offset >= len(self.data_map):
+                    self.map_data()
+                # Copy the raw line, there is no need to decode it
+                yield card_id, self.data_map[offset:self.data_map.find(b'\n', offset) + 1]
+        with self.lock, self.file_lock:
+            self.merge()
+            self.write_files(lines(), self.next_id)
+            # Everything waiting to be written is in the new file, which has been forced to disk
+            self.pending = []
+            self.load()
+
+    def save(self):
+        self.compact()
+
+    def close_index(self):
+        """Release the memory-mapped index."""
+        for view in reversed(self.index_views):
+            view.release()
+        self.index_views = []
+        self.index_ids = ()
+        self.index_offsets = ()
+        if self.index_map is not None:
+            self.index_map.close()
+            self.index_map = None
+        if self.index_file is not None:
+            self.index_file.close()
+            self.index_file = None
+
+    def close_files(self):
+        """Release the data file and index, so they can be replaced."""
+        self.close_index()
+        if self.data_map is not None:
+            self.data_map.close()
+            self.data_map = None
+        if self.data_file is not None:
+            self.data_file.close()
+            self.data_file = None
+
+    def close(self):
+        self.close_files()
+        self.file_lock.close()
+
+def open_storage(filename, journal=False):
+    """Pick a storage backend from the file extension."""
+    if filename.endswith(('.db', '.sqlite', '.sqlite3')):
+        return SQLiteStorage(filename)
+    if filename.endswith('.jsonl'):
+        return LazyJsonlStorage(filename)
+    if journal:
+        return JournalStorage(filename)
+    return JsonStorage(filename)
+
+class BackgroundWriter:
+    """Saves a storage backend on a worker thread, a short while after the last change."""
+
+    def __init__(self, storage, delay=0.5, max_delay=5.0):
+        self.storage = storage
+        # Seconds to wait for more changes before saving, and the longest a change can wait
+        self.delay = delay
+        self.max_delay = max_delay
+        self.condition = threading.Condition()
+        # Time of the first and latest change since the last save, or None when nothing is waiting
+        self.first_change = None
+        self.last_change = None
+        self.saving = False
+        self.stopped = False
+        # The last error from a save, kept so it can be shown rather than lost on the worker thread
+        self.error = None
+        storage.writer = self
+        self.thread = threading.Thread(target=self.run, name='flashcard-writer', daemon=True)
+        self.thread.start()
+
+    def notify(self):
+        """Note that the storage has a change waiting to be written."""
+        with self.condition:
+            now = time.monotonic()
+            if self.first_change is None:
+                self.first_change = now
+            self.last_change = now
+            self.condition.notify()
+
+    def is_pending(self):
+        """Return True if there are changes not yet on disk."""
+        with self.condition:
+            return self.first_change is not None or self.saving
+
+    def run(self):
+        with self.condition:
+            while not self.stopped:
+                if self.first_change is None:
+                    self.condition.wait()
+                    continue
+                # Debounce: keep waiting while changes keep coming, but not past max_delay
+                due = min(self.last_change + self.delay, self.first_change + self.max_delay)
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                self.first_change = self.last_change = None
+                # A batch still under way notifies again when it ends, and is written in one go then
+                if self.storage.batching:
+                    continue
+                self.saving = True
+                self.condition.release()
+                try:
+                    self.storage.flush()
+                    self.error = None
+                except Exception as error:
+                    self.error = error
+                finally:
+                    self.condition.acquire()
+                    self.saving = False
+
+    def flush(self):
+        """Write everything now, on the calling thread."""
+        with self.condition:
+            self.first_change = self.last_change = None
+        self.storage.flush()
+
+    def close(self):
+        """Stop the worker thread and write anything still waiting."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.thread.join()
+        self.storage.writer = None
+        self.flush()
+
+class TagIndex:
+    """Inverted index from each tag to the ids of the flashcards carrying it."""
+
+    def __init__(self):
+        # Dictionary of tag -> set of card ids
+        self.index = {}
+
+    def add(self, card_id, tags):
+        """Index a flashcard under each of its tags."""
+        for tag in split_tags(tags):
+            self.add_tag(card_id, tag)
+
+    def add_tag(self, card_id, tag):
+        """Index a flashcard under a single, already normalised tag."""
+        self.index.setdefault(tag, set()).add(card_id)
+
+    def remove(self, card_id, tags):
+        """Remove a flashcard from each of its tags."""
+        for tag in split_tags(tags):
+            card_ids = self.index.get(tag)
+            if card_ids is not None:
+                card_ids.discard(card_id)
+                # Drop empty tags so get_tags only lists categories that are in use
+                if not card_ids:
+                    del self.index[tag]
+
+    def update(self, card_id, old_tags, new_tags):
+        """Move a flashcard from its old tags to its new ones."""
+        self.remove(card_id, old_tags)
+        self.add(card_id, new_tags)
+
+    def get_tags(self):
+        """Return every tag in use, sorted."""
+        return sorted(self.index)
+
+    def find(self, tags, match_all=False):
+        """Return the ids of flashcards with any (or all) of the given tags."""
+        tags = normalize_tags(tags)
+        sets = [self.index.get(tag, set()) for tag in tags]
+        if not sets:
+            return set()
+        if match_all:
+            # Start from the smallest set so the intersection does the least work
+            sets.sort(key=len)
+            return sets[0].intersection(*sets[1:])
+        return set().union(*sets)
+
+def split_words(text):
+    """Split text into lower case words for searching."""
+    return re.findall(r"\w+", text.lower())
+
+def normalize_question(question):
+    """Return the form of a question used to spot duplicates: case and spacing do not count."""
+    return " ".join(question.casefold().split())
+
+class QuestionIndex:
+    """Hash index from each normalised question to the ids of the flashcards asking it."""
+
+    def __init__(self):
+        # Dictionary of normalised question -> set of card ids
+        self.index = {}
+
+    def add(self, card_id, question):
+        self.index.setdefault(normalize_question(question), set()).add(card_id)
+
+    def remove(self, card_id, question):
+        key = normalize_question(question)
+        card_ids = self.index.get(key)
+        if card_ids is not None:
+            card_ids.discard(card_id)
+            if not card_ids:
+                del self.index[key]
+
+    def update(self, card_id, old_question, new_question):
+        self.remove(card_id, old_question)
+        self.add(card_id, new_question)
+
+    def find(self, question):
+        """Return the ids of the flashcards with the same question."""
+        return self.index.get(normalize_question(question), set())
+
+def apply_index_change(card_id, old, new, question_index, search_index):
+    """Bring a duplicate index and a search index, either of which may be None, up to date with a change.
+
+    old is None for a card that was added, and new is None for one that was deleted.
+    """
+    if question_index is not None:
+        if old is not None:
+            question_index.remove(card_id, old.get_question())
+        if new is not None:
+            question_index.add(card_id, new.get_question())
+    if search_index is not None:
+        if old is not None:
+            search_index.remove(card_id, old.get_question(), old.get_answer())
+        if new is not None:
+            search_index.add(card_id, new.get_question(), new.get_answer())
+
+class SearchIndex:
+    """Full-text index from each word to the ids of the flashcards containing it."""
+    # Shorter prefixes expand to a large share of a big deck's words, so they only match whole words
+    MIN_PREFIX = 3
+
+    def __init__(self):
+        # Dictionary of word -> set of card ids
+        self.index = {}
+        # Sorted list of indexed words for prefix searches, built on first use
+        self.words = None
+
+    def add(self, card_id, *texts):
+        """Index a flashcard under every word of the given texts."""
+        for word in set(split_words(" ".join(texts))):
+            card_ids = self.index.get(word)
+            if card_ids is None:
+                card_ids = self.index[word] = set()
+                if self.words is not None:
+                    bisect.insort(self.words, word)
+            card_ids.add(card_id)
+
+    def remove(self, card_id, *texts):
+        """Remove a flashcard from every word of the given texts."""
+        for word in set(split_words(" ".join(texts))):
+            card_ids = self.index.get(word)
+            if card_ids is None:
+                continue
+            card_ids.discard(card_id)
+            if not card_ids:
+                del self.index[word]
+                if self.words is not None:
+                    del self.words[bisect.bisect_left(self.words, word)]
+
+    def update(self, card_id, old_texts, new_texts):
+        """Re-index a flashcard after its text changed."""
+        self.remove(card_id, *old_texts)
+        self.add(card_id, *new_texts)
+
+    def prefix_matches(self, prefix):
+        """Return the ids of flashcards with a word starting with prefix."""
+        if self.words is None:
+            self.words = sorted(self.index)
+        start = bisect.bisect_left(self.words, prefix)
+        end = bisect.bisect_left(self.words, prefix + '\U0010ffff')
+        return set().union(*(self.index[word] for word in self.words[start:end]))
+
+    @staticmethod
+    def matches(query, *texts, prefix=True):
+        """Return True if a flashcard with these texts would be found by search(query)."""
+        words = split_words(query)
+        card_words = set(split_words(" ".join(texts)))
+        if not words or not card_words.issuperset(words[:-1]):
+            return False
+        if prefix and len(words[-1]) >= SearchIndex.MIN_PREFIX:
+            return any(word.startswith(words[-1]) for word in card_words)
+        return words[-1] in card_words
+
+    def search(self, query, prefix=True):
+        """Return the ids of flashcards containing every word of the query.
+
+        The last word also matches longer words starting with it (once it is
+        MIN_PREFIX letters long), so results narrow down as the query is typed.
+        """
+        words = split_words(query)
+        if not words:
+            return set()
+        sets = [self.index.get(word, set()) for word in words[:-1]]
+        if prefix and len(words[-1]) >= self.MIN_PREFIX:
+            sets.append(self.prefix_matches(words[-1]))
+        else:
+            sets.append(self.index.get(words[-1], set()))
+        # Start from the smallest set so the intersection does the least work
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+class StudySession:
+    """Hands out each flashcard of a deck or category exactly once, in random order."""
+
+    def __init__(self, manager, card_ids, tags=None, match_all=False, drawn=()):
+        self.manager = manager
+        # Categories the session covers; None means the whole deck
+        self.tags = split_tags(tags) if isinstance(tags, str) else tags
+        self.match_all = match_all
+        # Cards still to come, plus each one's position so it can be removed in O(1)
+        self.remaining = list(card_ids)
+        self.positions = {card_id: index for index, card_id in enumerate(self.remaining)}
+        # Cards already handed out
+        self.drawn = set(drawn)
+
+    def __len__(self):
+        """Return how many flashcards are left."""
+        return len(self.remaining)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """Return the next flashcard, chosen at random from those not yet shown."""
+        while self.remaining:
+            # Swap a random remaining id to the end and pop it
+            index = random.randrange(len(self.remaining))
+            card_id = self.remaining[index]
+            self.discard(card_id)
+            self.drawn.add(card_id)
+            flashcard = self.manager.get_flashcard(card_id)
+            if flashcard is not None:
+                return flashcard
+        raise StopIteration
+
+    def matches(self, tags):
+        """Return True if a flashcard with these tags belongs in the session."""
+        if not self.tags:
+            return True
+        card_tags = set(split_tags(tags))
+        if self.match_all:
+            return card_tags.issuperset(self.tags)
+        return not card_tags.isdisjoint(self.tags)
+
+    def discard(self, card_id):
+        """Take a card out of the remaining cards, if it is there."""
+        index = self.positions.pop(card_id, None)
+        if index is None:
+            return
+        last = self.remaining.pop()
+        if last != card_id:
+            self.remaining[index] = last
+            self.positions[last] = index
+
+    def card_added(self, card_id, tags):
+        """Include a new (or newly matching) flashcard in the session."""
+        if card_id not in self.positions and card_id not in self.drawn and self.matches(tags):
+            self.positions[card_id] = len(self.remaining)
+            self.remaining.append(card_id)
+
+    def card_changed(self, card_id, tags):
+        """Follow a flashcard into or out of the session's categories."""
+        if self.matches(tags):
+            self.card_added(card_id, tags)
+        else:
+            self.discard(card_id)
+
+    def card_deleted(self, card_id):
+        """Forget a deleted flashcard."""
+        self.discard(card_id)
+        self.drawn.discard(card_id)
+
+    def get_state(self):
+        """Return the session as JSON-ready data, for resuming later."""
+        return {'tags': self.tags, 'match_all': self.match_all,
+                'remaining': self.remaining, 'drawn': sorted(self.drawn)}
+
+class ReviewScheduler:
+    """SM-2 style spaced repetition: works out when each flashcard is next due for review."""
+    # Seconds in a day, the unit of review intervals
+    DAY = 24 * 60 * 60
+    # A card answered wrongly comes back after ten minutes
+    RELEARN_DELAY = 10 * 60
+
+    def __init__(self, filename, log_limit=1000):
+        # Log file of review results, one line per review
+        self.filename = filename
+        # Dictionary of card id -> (ease, interval in days, right answers in a row, due time)
+        self.states = {}
+        # Heap of (due time, card id) for reviewed cards; entries from older reviews are skipped
+        self.due_heap = []
+        # Cards never reviewed yet, oldest first, with a set for fast membership checks
+        self.new_ids = collections.deque()
+        self.new_set = set()
+        self.log_file = None
+        self.log_records = 0
+        # Minimum number of log records before the log is compacted
+        self.log_limit = log_limit
+
+    def load(self, card_ids):
+        """Read saved review states and queue every other card as new."""
+        saved = {}
+        self.log_records = 0
+        for record in read_log(self.filename):
+            # Later records replace earlier ones for the same card
+            saved[record[0]] = tuple(record[1:])
+            self.log_records += 1
+        self.states = {}
+        self.new_ids = collections.deque()
+        self.new_set = set()
+        for card_id in card_ids:
+            state = saved.get(card_id)
+            if state is None:
+                self.new_ids.append(card_id)
+                self.new_set.add(card_id)
+            else:
+                self.states[card_id] = state
+        self.rebuild_heap()
+
+    def rebuild_heap(self):
+        """Rebuild the due heap from the current states, dropping stale entries."""
+        self.due_heap = [(state[3], card_id) for card_id, state in self.states.items()]
+        heapq.heapify(self.due_heap)
+
+    def add_card(self, card_id):
+        """Queue a new flashcard for its first review."""
+        self.new_ids.append(card_id)
+        self.new_set.add(card_id)
+
+    def remove_card(self, card_id):
+        """Forget a deleted flashcard. Its heap entry is skipped when it reaches the top."""
+        self.states.pop(card_id, None)
+        self.new_set.discard(card_id)
+
+    def get_state(self, card_id):
+        """Return (ease, interval, streak, due time) for a card, or None if it is new."""
+        return self.states.get(card_id)
+
+    def review(self, card_id, correct, now=None):
+        """Record an answer and schedule the card's next review."""
+        now = time.time() if now is None else now
+        ease, interval, streak, _ = self.states.get(card_id, (2.5, 0, 0, 0))
+        if correct:
+            # SM-2 intervals: 1 day, then 6 days, then growing by the ease factor
+            interval = 1 if streak == 0 else 6 if streak == 1 else round(interval * ease)
+            streak += 1
+            due = now + interval * self.DAY
+        else:
+            # Start over and make the card a little harder to space out
+            ease = max(1.3, ease - 0.2)
+            interval = 0
+            streak = 0
+            due = now + self.RELEARN_DELAY
+        state = (ease, interval, streak, due)
+        self.states[card_id] = state
+        self.new_set.discard(card_id)
+        heapq.heappush(self.due_heap, (due, card_id))
+        self.save_state(card_id, state)
+        return state
+
+    def next_due(self, now=None):
+        """Return the id of the next card to review, or None if nothing is due."""
+        now = time.time() if now is None else now
+        while self.due_heap:
+            due, card_id = self.due_heap[0]
+            state = self.states.get(card_id)
+            # Skip entries for deleted cards or superseded by a later review
+            if state is None or state[3] != due:
+                heapq.heappop(self.due_heap)
+                continue
+            if due <= now:
+                return card_id
+            break
+        # Nothing reviewed is due, so introduce a new card
+        while self.new_ids:
+            card_id = self.new_ids[0]
+            if card_id in self.new_set:
+                return card_id
+            self.new_ids.popleft()
+        return None
+
+    def save_state(self, card_id, state):
+        """Append a card's new state to the log, compacting it once it gets long."""
+        if self.log_file is None:
+            self.log_file = open(self.filename, 'a', encoding='utf-8')
+        append_log(self.log_file, [card_id, *state])
+        self.log_records += 1
+        if self.log_records > max(self.log_limit, 2 * len(self.states)):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the log with one record per reviewed card."""
+        self.close()
+        temp_filename = self.filename + '.tmp'
+        with open(temp_filename, 'w', encoding='utf-8') as f:
+            for card_id, state in self.states.items():
+                f.write(json.dumps([card_id, *state]) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, self.filename)
+        self.log_records = len(self.states)
+        self.rebuild_heap()
+
+    def close(self):
+        """Close the log file."""
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+class FlashcardManager:
+    """Class to manage a collection of flashcards."""
+    
+    def __init__(self, filename='flashcards.json', journal=False, storage=None, save_delay=None):
+        # Storage backend that holds the flashcards
+        if storage is None:
+            storage = open_storage(filename, journal)
+        self.storage = storage
+        # With a save delay, changes are written by a background thread instead of before each call returns
+        self.writer = None if save_delay is None else BackgroundWriter(storage, save_delay)
+        # Filename for saving/loading
+        self.filename = storage.filename
+        # Index of tag -> card ids and index of word -> card ids over questions and answers.
+        # Both are built the first time they are needed (the word index maybe ahead of it, by
+        # build_indexes), then kept up to date on every change
+        self.tag_index = None
+        self.search_index = None
+        # Index of normalised question -> card ids, for spotting duplicates; also built on first use,
+        # or ahead of it by build_indexes, unless the storage finds duplicates itself
+        self.question_index = None
+        # Guards the duplicate and search indexes, which a worker thread may be building
+        self.index_lock = threading.Lock()
+        self.index_builder = None
+        # Changes made while each build reads the cards, applied to its indexes before they are used
+        self.index_logs = []
+        # Bumped when the indexes are thrown away, so a build started before then is not used
+        self.index_generation = 0
+        self.closing = False
+        # Study sessions to keep in step with changes; dropped once nothing else uses them
+        self.sessions = weakref.WeakSet()
+        # Anything else told about changes, such as the app's lists: objects with the same
+        # card_added, card_changed and card_deleted methods as a session, plus cards_reset
+        self.listeners = weakref.WeakSet()
+        # Spaced repetition schedule, saved next to the deck and loaded on first use
+        self.scheduler = None
+        # Load flashcards when manager is initialized
+        self.load_flashcards()
+
+    @instrument('manager.add_flashcard')
+    def add_flashcard(self, question, answer, tags, allow_duplicate=False):
+        """Add a tagged flashcard to the collection and return its id, or None if the question is already in the deck."""
+        self.sync()
+        if not allow_duplicate and self.find_duplicates(question):
+            return None
+        flashcard = self.storage.add(question, answer, tags)
+        self.card_added(flashcard)
+        return flashcard.card_id
+
+    @instrument('manager.add_flashcards')
+    def add_flashcards(self, cards, allow_duplicate=False):
+        """Add (question, answer, tags) flashcards with a single save at the end, and return the ids of those added."""
+        with self.storage.batch():
+            card_ids = (self.add_flashcard(question, answer, tags, allow_duplicate) for question, answer, tags in cards)
+            return [card_id for card_id in card_ids if card_id is not None]
+
+    @instrument('manager.edit_flashcard')
+    def edit_flashcard(self, card_id, new_question, new_answer, new_tags):
+        """Edit the flashcard with the given id."""
+        self.sync()
+        flashcard = self.storage.get(card_id)
+        if flashcard is None:
+            return False
+        # Some backends hand out the stored card itself, which the update changes
+        old = EditableFlashcard(flashcard.get_question(), flashcard.get_answer(), flashcard.get_tag(), card_id)
+        if not self.storage.update(card_id, new_question, new_answer, new_tags):
+            return False
+        self.card_edited(old, EditableFlashcard(new_question, new_answer, new_tags, card_id))
+        return True
+
+    @instrument('manager.delete_flashcard')
+    def delete_flashcard(self, card_id):
+        """Delete the flashcard with the given id."""
+        self.sync()
+        flashcard = self.storage.get(card_id)
+        if flashcard is None or not self.storage.delete(card_id):
+            return False
+        self.card_deleted(flashcard)
+        return True
+
+    @instrument('manager.edit_many')
+    def edit_many(self, edits):
+        """Apply (id, question, answer, tags) edits with a single save at the end, and return the ids edited."""
+        with self.storage.batch():
+            return [card_id for card_id, question, answer, tags in edits
+                    if self.edit_flashcard(card_id, question, answer, tags)]
+
+    @instrument('manager.retag_many')
+    def retag_many(self, card_ids, add='', remove=''):
+        """Add and remove categories on several flashcards with a single save, and return the ids changed."""
+        add = [tag.strip() for tag in add.split(',') if tag.strip()]
+        remove = set(split_tags(remove))
+        edits = []
+        for card_id in card_ids:
+            flashcard = self.storage.get(card_id)
+            if flashcard is None:
+                continue
+            # Tags compare case-insensitively, but the ones kept are written as they were
+            tags = [tag.strip() for tag in flashcard.get_tag().split(',')
+                    if tag.strip() and tag.strip().lower() not in remove]
+            present = {tag.lower() for tag in tags}
+            for tag in add:
+                if tag.lower() not in present:
+                    tags.append(tag)
+                    present.add(tag.lower())
+            if split_tags(", ".join(tags)) != flashcard.get_tags():
+                edits.append((card_id, flashcard.get_question(), flashcard.get_answer(), ", ".join(tags)))
+        return self.edit_many(edits)
+
+    @instrument('manager.delete_many')
+    def delete_many(self, card_ids):
+        """Delete several flashcards with a single save at the end, and return the ids deleted."""
+        with self.storage.batch():
+            return [card_id for card_id in card_ids if self.delete_flashcard(card_id)]
+
+    def card_added(self, flashcard):
+        """Bring the indexes, schedule and sessions up to date with a new card."""
+        card_id = flashcard.card_id
+        self.index_change(card_id, None, flashcard)
+        if self.tag_index is not None:
+            self.tag_index.add(card_id, flashcard.get_tag())
+        if self.scheduler is not None:
+            self.scheduler.add_card(card_id)
+        for listener in itertools.chain(self.sessions, self.listeners):
+            listener.card_added(card_id, flashcard.get_tag())
+
+    def card_edited(self, old, new):
+        """Bring the indexes and sessions up to date with a changed card."""
+        card_id = new.card_id
+        self.index_change(card_id, old, new)
+        if self.tag_index is not None:
+            self.tag_index.update(card_id, old.get_tag(), new.get_tag())
+        for listener in itertools.chain(self.sessions, self.listeners):
+            listener.card_changed(card_id, new.get_tag())
+
+    def card_deleted(self, flashcard):
+        """Bring the indexes, schedule and sessions up to date with a deleted card."""
+        card_id = flashcard.card_id
+        self.index_change(card_id, flashcard, None)
+        if self.tag_index is not None:
+            self.tag_index.remove(card_id, flashcard.get_tag())
+        if self.scheduler is not None:
+            self.scheduler.remove_card(card_id)
+        for listener in itertools.chain(self.sessions, self.listeners):
+            listener.card_deleted(card_id)
+
+    def index_change(self, card_id, old, new):
+        """Apply a change to the duplicate and search indexes, and log it for any build under way."""
+        with self.index_lock:
+            apply_index_change(card_id, old, new, self.question_index, self.search_index)
+            for changes in self.index_logs:
+                changes.append((card_id, old, new))
+
+    @instrument('manager.sync')
+    def sync(self):
+        """Pick up changes other programs have saved to the deck. Returns True if there were any."""
+        changes = self.storage.refresh()
+        if changes is None:
+            # The file was rewritten, so the indexes are rebuilt from it when next needed
+            self.tag_index = None
+            with self.index_lock:
+                self.search_index = None
+                self.question_index = None
+                self.index_generation += 1
+            if self.scheduler is not None:
+                self.scheduler.close()
+                self.scheduler = None
+            # Sessions skip cards that have gone when they are drawn; listeners start again
+            for listener in list(self.listeners):
+                listener.cards_reset()
+            return True
+        for card_id, old, new in changes:
+            if old is None and new is not None:
+                self.card_added(new)
+            elif new is None and old is not None:
+                self.card_deleted(old)
+            elif old is not None:
+                self.card_edited(old, new)
+        return bool(changes)
+
+    @instrument('manager.get_flashcard')
+    def get_flashcard(self, card_id):
+        """Return the flashcard with the given id, or None."""
+        return self.storage.get(card_id)
+
+    @instrument('manager.find_flashcard')
+    def find_flashcard(self, question):
+        """Return the first flashcard with the given question, or None."""
+        # Only cards with the same normalised question can match, so check just those
+        candidates = (self.storage.get(card_id) for card_id in sorted(self.find_duplicates(question)))
+        return next((fc for fc in candidates if fc.get_question() == question), None)
+
+    def find_duplicates(self, question):
+        """Return the ids of flashcards asking the same question, ignoring case and spacing."""
+        if self.storage.has_question_index:
+            return self.storage.find_question(question)
+        return self.get_question_index().find(question)
+
+    @instrument('manager.search_flashcards')
+    def search_flashcards(self, query):
+        """Return the ids, in order, of flashcards whose question or answer contains the query words."""
+        return sorted(self.get_search_index().search(query))
+
+    def matches_search(self, card_id, query):
+        """Return True if search_flashcards(query) would include the flashcard, without searching the deck."""
+        flashcard = self.storage.get(card_id)
+        return flashcard is not None and SearchIndex.matches(query, flashcard.get_question(), flashcard.get_answer())
+
+    def get_flashcards(self):
+        """Return an iterator over all flashcards."""
+        return iter(self.storage)
+
+    @instrument('manager.get_flashcard_ids')
+    def get_flashcard_ids(self):
+        """Return the ids of all flashcards, in ascending order."""
+        return sorted(self.storage.iter_ids())
+
+    @instrument('manager.find_flashcard_ids')
+    def find_flashcard_ids(self, tags, match_all=False):
+        """Return the ids of flashcards in any (or all) of the given categories."""
+        if self.storage.has_tag_index:
+            return self.storage.find_tags(normalize_tags(tags), match_all)
+        return self.get_tag_index().find(tags, match_all)
+
+    @instrument('manager.get_flashcards_by_tag')
+    def get_flashcards_by_tag(self, tags, match_all=False):
+        """Return the flashcards in any (or all) of the given categories."""
+        return [self.storage.get(card_id) for card_id in sorted(self.find_flashcard_ids(tags, match_all))]
+
+    @instrument('manager.get_tags')
+    def get_tags(self):
+        """Return every category in use."""
+        if self.storage.has_tag_index:
+            return self.storage.get_tags()
+        return self.get_tag_index().get_tags()
+
+    def get_flashcard_count(self):
+        """Return the number of flashcards."""
+        return self.storage.count()
+
+    @instrument('manager.get_flashcard_list')
+    def get_flashcard_list(self):
+        """Return a list of flashcards as strings."""
+        # Polymorphism 
+        return [str(flashcard) for flashcard in self.storage]
+
+    @instrument('manager.get_random_flashcard')
+    def get_random_flashcard(self):
+        """Return a random flashcard."""
+        return self.storage.random()
+
+    @instrument('manager.start_session')
+    def start_session(self, tags=None, match_all=False):
+        """Start a study session over the whole deck, or over the given categories."""
+        if tags:
+            card_ids = self.find_flashcard_ids(tags, match_all)
+        else:
+            card_ids = self.storage.iter_ids()
+        session = StudySession(self, card_ids, tags or None, match_all)
+        self.sessions.add(session)
+        return session
+
+    @instrument('manager.resume_session')
+    def resume_session(self, state):
+        """Rebuild a study session from StudySession.get_state(), allowing for changes since."""
+        if state['tags']:
+            card_ids = self.find_flashcard_ids(state['tags'], state['match_all'])
+        else:
+            card_ids = set(self.storage.iter_ids())
+        # Keep only cards that still exist; cards added since then join the remaining ones
+        drawn = card_ids.intersection(state['drawn'])
+        remaining = [card_id for card_id in state['remaining'] if card_id in card_ids]
+        remaining.extend(card_ids.difference(drawn, remaining))
+        session = StudySession(self, remaining, state['tags'], state['match_all'], drawn)
+        self.sessions.add(session)
+        return session
+
+    @instrument('manager.review_flashcard')
+    def review_flashcard(self, card_id, correct):
+        """Record a right or wrong answer and reschedule the flashcard."""
+        return self.get_scheduler().review(card_id, correct)
+
+    @instrument('manager.get_next_due_flashcard')
+    def get_next_due_flashcard(self):
+        """Return the flashcard most in need of review, or None if nothing is due."""
+        card_id = self.get_scheduler().next_due()
+        if card_id is None:
+            return None
+        return self.storage.get(card_id)
+
+    @instrument('manager.save_flashcards')
+    def save_flashcards(self):
+        """Save flashcards to file."""
+        self.storage.save()
+
+    @instrument('manager.load_flashcards')
+    def load_flashcards(self):
+        """Load flashcards from file."""
+        self.storage.load()
+        # Indexes are rebuilt from the loaded cards when next needed
+        self.tag_index = None
+        with self.index_lock:
+            self.search_index = None
+            self.question_index = None
+            self.index_generation += 1
+        if self.scheduler is not None:
+            self.scheduler.close()
+            self.scheduler = None
+
+    def get_tag_index(self):
+        """Return the tag index, building it on first use."""
+        if self.tag_index is None:
+            self.tag_index = TagIndex()
+            for card_id, tag in self.storage.iter_tags():
+                self.tag_index.add_tag(card_id, tag)
+        return self.tag_index
+
+    def build_indexes(self):
+        """Start building the duplicate and search indexes on a worker thread, so the first add or search does not wait for them."""
+        if self.index_builder is None or not self.index_builder.is_alive():
+            # A storage that finds duplicates itself needs only the search index
+            self.index_builder = threading.Thread(target=self.fill_indexes, name='flashcard-indexer', daemon=True,
+                                                  args=(not self.storage.has_question_index,))
+            self.index_builder.start()
+
+    def fill_indexes(self, question=True, search=True):
+        """Build whichever of the duplicate and search indexes are missing, reading the cards once for both.
+
+        The cards are read without holding index_lock, so changes are never held up by
+        a build; the changes made meanwhile are applied to the new indexes before they
+        are swapped in.
+        """
+        builder = self.index_builder
+        if builder is not None and builder is not threading.current_thread():
+            # The worker may be reading the cards already; waiting for it beats reading them twice
+            builder.join()
+        with self.index_lock:
+            question_index = QuestionIndex() if question and self.question_index is None else None
+            search_index = SearchIndex() if search and self.search_index is None else None
+            if question_index is None and search_index is None:
+                return
+            generation = self.index_generation
+            changes = []
+            self.index_logs.append(changes)
+        try:
+            for flashcard in self.storage:
+                # Cards deleted since the build started come back as None; close() stops a build part way
+                if self.closing:
+                    return
+                if flashcard is None:
+                    continue
+                apply_index_change(flashcard.card_id, None, flashcard, question_index, search_index)
+            if search_index is not None:
+                # Sort the words for prefix searches now too, rather than on the first keystroke
+                search_index.words = sorted(search_index.index)
+            with self.index_lock:
+                # Thrown away if the deck was reloaded while the cards were read
+                if generation != self.index_generation:
+                    return
+                for card_id, old, new in changes:
+                    apply_index_change(card_id, old, new, question_index, search_index)
+                if question_index is not None and self.question_index is None:
+                    self.question_index = question_index
+                if search_index is not None and self.search_index is None:
+                    self.search_index = search_index
+        finally:
+            with self.index_lock:
+                self.index_logs.remove(changes)
+
+    def get_question_index(self):
+        """Return the duplicate question index, building it on first use."""
+        self.fill_indexes(search=False)
+        return self.question_index
+
+    def get_search_index(self):
+        """Return the search index, building it on first use."""
+        self.fill_indexes(question=False)
+        return self.search_index
+
+    def get_scheduler(self):
+        """Return the review scheduler, loading it on first use."""
+        if self.scheduler is None:
+            self.scheduler = ReviewScheduler(self.filename + '.schedule')
+            self.scheduler.load(self.storage.iter_ids())
+        return self.scheduler
+
+    def is_saving(self):
+        """Return True if the background writer still has changes to write."""
+        return self.writer is not None and self.writer.is_pending()
+
+    @instrument('manager.flush')
+    def flush(self):
+        """Write any changes the background writer has not got to yet."""
+        if self.writer is not None:
+            self.writer.flush()
+        else:
+            self.storage.flush()
+
+    @instrument('manager.close')
+    def close(self):
+        """Close the storage backend."""
+        # Stop an index build, and wait for it to let go of the storage
+        self.closing = True
+        if self.index_builder is not None:
+            self.index_builder.join()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.storage.close()
+        if self.scheduler is not None:
+            self.scheduler.close()
+
+class DeckCatalog:
+    """Many decks, each in its own file, listed in a catalog file; only recently used decks are kept open."""
+
+    def __init__(self, filename='decks.json', directory='decks', cache_size=8, save_delay=None):
+        # Catalog of deck metadata; deck filenames in it are relative to the catalog's folder
+        self.filename = filename
+        self.base = os.path.dirname(os.path.abspath(filename))
+        # Folder new decks are created in
+        self.directory = directory
+        # Number of decks kept open at once, and the save delay each open deck gets
+        self.cache_size = max(1, cache_size)
+        self.save_delay = save_delay
+        # Deck metadata by name, read from the catalog without opening any deck
+        self.decks = {}
+        self.next_id = 1
+        # Name of the last deck opened, so the app can start on it
+        self.current = None
+        # Open decks: name -> FlashcardManager, least recently used first
+        self.open_decks = collections.OrderedDict()
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.filename):
+            with open(self.filename, 'r') as f:
+                data = json.load(f)
+            self.decks = {deck['name']: deck for deck in data['decks']}
+            self.next_id = data['next_id']
+            self.current = data.get('current')
+
+    def save(self):
+        """Write the catalog, with up to date card counts for the open decks."""
+        for name, manager in self.open_decks.items():
+            self.decks[name]['cards'] = manager.get_flashcard_count()
+        write_atomic(self.filename, {'next_id': self.next_id, 'current': self.current,
+                                     'decks': list(self.decks.values())})
+
+    def list_decks(self):
+        """Return the metadata of every deck, by name, without opening any of them."""
+        return [self.decks[name] for name in sorted(self.decks, key=str.casefold)]
+
+    def add_deck(self, name, filename=None, description=''):
+        """Add a deck to the catalog, in a new file or an existing one, and return its metadata."""
+        name = name.strip()
+        if not name:
+            raise ValueError("A deck needs a name")
+        if name in self.decks:
+            raise ValueError(f"There is already a deck called {name}")
+        if filename is None:
+            # Never take over a file left behind by a deck that is no longer in the catalog
+            while os.path.exists(self.path(os.path.join(self.directory, f"deck{self.next_id}.jsonl"))):
+                self.next_id += 1
+            filename = os.path.join(self.directory, f"deck{self.next_id}.jsonl")
+        os.makedirs(os.path.dirname(self.path(filename)), exist_ok=True)
+        self.decks[name] = {'id': self.next_id, 'name': name, 'filename': filename, 'description': description,
+                            'cards': 0, 'created': time.time(), 'opened': None}
+        self.next_id += 1
+        self.save()
+        return self.decks[name]
+
+    def path(self, filename):
+        """Return where a deck file is, relative to the catalog."""
+        return os.path.join(self.base, filename)
+
+    def open_deck(self, name):
+        """Return the manager for a deck, opening it (and closing the least recently used) if need be."""
+        if name in self.open_decks:
+            self.open_decks.move_to_end(name)
+        else:
+            deck = self.decks[name]
+            self.open_decks[name] = FlashcardManager(self.path(deck['filename']), save_delay=self.save_delay)
+            deck['opened'] = time.time()
+            while len(self.open_decks) > self.cache_size:
+                self.close_deck(next(iter(self.open_decks)))
+        self.current = name
+        return self.open_decks[name]
+
+    def close_deck(self, name):
+        """Save and close a deck if it is open, keeping its card count in the catalog."""
+        manager = self.open_decks.pop(name, None)
+        if manager is not None:
+            self.decks[name]['cards'] = manager.get_flashcard_count()
+            manager.close()
+            self.save()
+
+    def rename_deck(self, name, new_name):
+        """Rename a deck; its file keeps its name."""
+        new_name = new_name.strip()
+        if not new_name or new_name in self.decks:
+            raise ValueError(f"There is already a deck called {new_name}" if new_name else "A deck needs a name")
+        deck = self.decks.pop(name)
+        deck['name'] = new_name
+        self.decks[new_name] = deck
+        if name in self.open_decks:
+            self.open_decks[new_name] = self.open_decks.pop(name)
+        if self.current == name:
+            self.current = new_name
+        self.save()
+
+    def delete_deck(self, name):
+        """Remove a deck and its files."""
+        self.close_deck(name)
+        deck = self.decks.pop(name)
+        path = self.path(deck['filename'])
+        # The deck file and everything kept next to it: index, journal, schedule, session
+        folder = os.path.dirname(path)
+        for filename in os.listdir(folder):
+            if filename == os.path.basename(path) or filename.startswith(os.path.basename(path) + '.'):
+                os.remove(os.path.join(folder, filename))
+        if self.current == name:
+            self.current = None
+        self.save()
+
+    def close(self):
+        """Save and close every open deck."""
+        for name in list(self.open_decks):
+            manager = self.open_decks.pop(name)
+            self.decks[name]['cards'] = manager.get_flashcard_count()
+            manager.close()
+        self.save()
+
+# Formats the command line tool can read and write, by file extension
+CARD_FORMATS = {'.csv': 'csv', '.tsv': 'tsv', '.jsonl': 'jsonl'}
+CARD_FIELDS = ['question', 'answer', 'tags']
+
+def card_format(filename, format=None):
+    """Return the format to use for a file: the one given, or the one its extension implies."""
+    if format is None:
+        format = CARD_FORMATS.get(os.path.splitext(filename)[1].lower())
+    if format not in CARD_FORMATS.values():
+        raise ValueError(f"Unknown format for {filename}; use --format csv, tsv or jsonl")
+    return format
+
+def read_cards(filename, format=None):
+    """Yield (question, answer, tags) from a CSV, TSV or JSONL file, one line at a time."""
+    format = card_format(filename, format)
+    with open(filename, 'r', encoding='utf-8-sig', newline='') as f:
+        if format == 'jsonl':
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    yield item['question'], item['answer'], item.get('tags', '')
+            return
+        rows = csv.reader(f, delimiter='\t' if format == 'tsv' else ',')
+        for row in rows:
+            # A header row is optional
+            if rows.line_num == 1 and [field.strip().lower() for field in row] == CARD_FIELDS[:len(row)]:
+                continue
+            if len(row) >= 2:
+                yield row[0], row[1], row[2] if len(row) > 2 else ''
+
+def write_cards(filename, flashcards, format=None):
+    """Write flashcards to a CSV, TSV or JSONL file as they come, returning how many were written."""
+    format = card_format(filename, format)
+    count = 0
+    with open(filename, 'w', encoding='utf-8', newline='') as f:
+        if format == 'jsonl':
+            for flashcard in flashcards:
+                f.write(json.dumps({'question': flashcard.get_question(), 'answer': flashcard.get_answer(),
+                                    'tags': flashcard.get_tag()}) + '\n')
+                count += 1
+            return count
+        writer = csv.writer(f, delimiter='\t' if format == 'tsv' else ',')
+        writer.writerow(CARD_FIELDS)
+        for flashcard in flashcards:
+            writer.writerow([flashcard.get_question(), flashcard.get_answer(), flashcard.get_tag()])
+            count += 1
+    return count
+
+def import_cards(manager, filename, format=None, batch_size=10000, allow_duplicate=False):
+    """Stream cards from a file into the deck, saving once per batch. Returns (added, skipped)."""
+    added = skipped = 0
+    cards = read_cards(filename, format)
+    while True:
+        # Only one batch of cards is held in memory at a time
+        batch = []
+        rows = 0
+        for question, answer, tags in itertools.islice(cards, batch_size):
+            rows += 1
+            question, answer, tags = question.strip(), answer.strip(), tags.strip()
+            # Same rule as the create screen: both sides of the card are needed
+            if question and answer:
+                batch.append((question, answer, tags))
+            else:
+                skipped += 1
+        if not rows:
+            return added, skipped
+        batch_added = len(manager.add_flashcards(batch, allow_duplicate))
+        # Questions already in the deck (or earlier in the file) are not added twice
+        skipped += len(batch) - batch_added
+        added += batch_added
+
+def main(argv=None):
+    """Command line entry point for importing and exporting decks without the window."""
+    parser = argparse.ArgumentParser(description="Import or export flashcards without opening the app.")
+    parser.add_argument('--deck', default='flashcards.jsonl', help="deck file to use (default: flashcards.jsonl)")
+    parser.add_argument('--stats', help="save operation latency statistics to this JSON file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help="add the cards in a CSV, TSV or JSONL file to the deck")
+    import_parser.add_argument('filename')
+    import_parser.add_argument('--format', choices=sorted(CARD_FORMATS.values()))
+    import_parser.add_argument('--batch-size', type=int, default=10000, help="cards saved at a time")
+    import_parser.add_argument('--allow-duplicates', action='store_true', help="add cards whose question is already in the deck")
+    export_parser = commands.add_parser('export', help="write the deck to a CSV, TSV or JSONL file")
+    export_parser.add_argument('filename')
+    export_parser.add_argument('--format', choices=sorted(CARD_FORMATS.values()))
+    args = parser.parse_args(argv)
+
+    stats.enabled = args.stats is not None
+    manager = FlashcardManager(args.deck)
+    start = time.perf_counter()
+    try:
+        if args.command == 'import':
+            count, skipped = import_cards(manager, args.filename, args.format, args.batch_size, args.allow_duplicates)
+            # Leaves a compact file (and a fresh index) behind, so the next start is quick
+            manager.save_flashcards()
+            action = "Imported"
+            if skipped:
+                print(f"Skipped {skipped} rows that were blank or already in the deck.", file=sys.stderr)
+        else:
+            count = write_cards(args.filename, manager.get_flashcards(), args.format)
+            action = "Exported"
+    except (OSError, ValueError, KeyError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    finally:
+        manager.close()
+        if args.stats:
+            stats.dump(args.stats)
+    elapsed = time.perf_counter() - start
+    print(f"{action} {count} flashcards in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} cards/s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())